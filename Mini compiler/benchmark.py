@@ -0,0 +1,710 @@
+# benchmark.py - Wall-time benchmarks for the compiler phases
+
+import operator
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from lexer import KEYWORDS, stream_tokens, token_specification, tokenize
+from dfa_lexer import DFALexer, build_tables
+from cparser import FunctionDef, parse
+from cfg import CFG
+from codegen import StackFrame, assembly_for_tac, memory_operands
+from dataflow import ReachingDefinitions, eliminate_dead_code, live_variables
+from ir import (BINARY_OPS, CONST, GLOBAL, LOCAL, OP_ADD, OP_CALL, OP_COPY, OP_DIV, OP_EQ, OP_GE, OP_GT, OP_IFFALSE,
+                OP_JUMP, OP_LABEL, OP_LE, OP_LT, OP_MUL, OP_NE, OP_NEG, OP_NOT, OP_PARAM, OP_RETURN, OP_SUB, TEMP,
+                is_float, quad_def, quad_uses)
+from main import CompilationUnit, build_symbol_table, compile_unit, generate_tac, optimize_tac, syntax_analysis
+from optimizer import optimize
+from peephole import peephole
+from pycode import PythonProgram
+from regalloc import allocate_registers, argument_registers, liveness, memory_allocation
+from tac import TACGenerator
+from vm import Program, convert as vm_convert, initial_value as vm_initial_value, kind_of as vm_kind_of
+
+PYTHON_OPERATORS = {OP_ADD: operator.add, OP_SUB: operator.sub, OP_MUL: operator.mul, OP_DIV: operator.truediv,
+                    OP_EQ: operator.eq, OP_NE: operator.ne, OP_LT: operator.lt, OP_GT: operator.gt,
+                    OP_LE: operator.le, OP_GE: operator.ge}
+
+
+def make_source(n_functions=2000):
+    """Builds a synthetic C source with n_functions small functions."""
+    parts = ["// Generated source for benchmarking", "int x = 10;", "float y;"]
+    for i in range(n_functions):
+        parts.append(f"""int calculate_{i}(int a, int b) {{
+    float temp_val = a * 2.0 + {i};
+    int sum = temp_val + b * (a - {i % 7});
+    if (sum > 10) {{
+        sum = sum - 1;
+    }}
+    return sum;
+}}""")
+    return "\n".join(parts) + "\n"
+
+
+def write_source(c_code):
+    """Writes c_code to a temporary file and returns its path."""
+    fd, path = tempfile.mkstemp(suffix=".c")
+    with os.fdopen(fd, 'w') as file:
+        file.write(c_code)
+    return path
+
+
+def best_of(func, *args, repeat=5):
+    """Returns the best wall time in seconds over repeat runs of func(*args)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# --- 1. Front End: three reads/scans vs one compilation unit ---
+
+def _legacy_front_end(file_path):
+    """The pre-unit pipeline: each phase re-reads and re-tokenizes the file."""
+    tok_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
+
+    with open(file_path, 'r') as file:
+        c_code = file.read()
+    tokens_list = []
+    for mo in re.finditer(tok_regex, c_code):
+        kind = mo.lastgroup
+        if kind != 'SKIP' and kind != 'COMMENT':
+            tokens_list.append((kind, mo.group(kind)))
+
+    with open(file_path, 'r') as file:
+        c_code = file.read()
+    all_tokens = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*|\d+\.\d+|\d+|[+\-*/=;,(){}]', c_code)
+
+    with open(file_path, 'r') as file:
+        c_code = file.read().strip()
+    match = re.search(r'(\w+)\s*=\s*(.*);', c_code)
+    return tokens_list, all_tokens, match
+
+
+def _unit_front_end(file_path):
+    """The shared pipeline: one read and one token stream for every phase."""
+    return CompilationUnit.from_file(file_path)
+
+
+def bench_front_end(n_functions=20000):
+    path = write_source(make_source(n_functions))
+    try:
+        size_mb = os.path.getsize(path) / 1e6
+        legacy = best_of(_legacy_front_end, path)
+        shared = best_of(_unit_front_end, path)
+    finally:
+        os.remove(path)
+
+    print(f"Front end on {size_mb:.1f} MB of source")
+    print(f"  legacy (3 reads, 3 scans): {legacy * 1000:8.1f} ms")
+    print(f"  compilation unit (1 + 1):  {shared * 1000:8.1f} ms")
+    print(f"  speedup:                   {legacy / shared:8.2f}x")
+
+
+# --- 2. Lexer Memory: token list vs streaming over mmap ---
+
+def _peak_memory(func, *args):
+    """Returns (result, peak traced bytes) for func(*args)."""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _count_list(file_path):
+    with open(file_path, 'r') as file:
+        return len(tokenize(file.read()))
+
+
+def _count_stream(file_path):
+    return sum(1 for _ in stream_tokens(file_path))
+
+
+def bench_stream_memory(n_functions=20000):
+    path = write_source(make_source(n_functions))
+    try:
+        size_mb = os.path.getsize(path) / 1e6
+        count, listed = _peak_memory(_count_list, path)
+        _, streamed = _peak_memory(_count_stream, path)
+    finally:
+        os.remove(path)
+
+    print(f"Lexer peak memory on {size_mb:.1f} MB of source ({count} tokens)")
+    print(f"  token list:       {listed / 1e6:8.1f} MB")
+    print(f"  streaming (mmap): {streamed / 1e6:8.3f} MB")
+
+
+# --- 3. Lexer Throughput: re.finditer vs table-driven DFA ---
+
+def _legacy_tokenize(c_code):
+    """The original loop: KEYWORD_R is tried before IDENTIFIER."""
+    tok_regex = re.compile('|'.join('(?P<%s>%s)' % pair for pair in token_specification))
+    tokens_list = []
+    for mo in tok_regex.finditer(c_code):
+        kind = mo.lastgroup
+        value = mo.group(kind)
+        if kind == 'SKIP' or kind == 'COMMENT':
+            continue
+        elif kind == 'KEYWORD_R':
+            tokens_list.append(('KEYWORD', value))
+        elif kind == 'IDENTIFIER':
+            tokens_list.append(('KEYWORD', value) if value in KEYWORDS else ('ID', value))
+        elif kind.startswith('LITERAL'):
+            tokens_list.append(('LITERAL', value))
+        else:
+            tokens_list.append((kind, value))
+    return tokens_list
+
+
+def bench_lexer(n_functions=20000):
+    c_code = make_source(n_functions)
+    count = len(tokenize(c_code))
+
+    start = time.perf_counter()
+    build_tables()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    dfa = DFALexer()
+    load = time.perf_counter() - start
+
+    print(f"Lexer throughput on {count} tokens")
+    print(f"  DFA table build: {build * 1000:.2f} ms, cached load: {load * 1000:.2f} ms")
+    for label, func in (("re.finditer, KEYWORD_R first", _legacy_tokenize),
+                        ("re.finditer, keyword lookup", tokenize),
+                        ("table-driven DFA", dfa.tokenize)):
+        seconds = best_of(func, c_code, repeat=3)
+        print(f"  {label:<30} {count / seconds / 1e6:6.2f} M tokens/s")
+
+
+# --- 4. Token Store: list of (kind, value) tuples vs TokenBuffer ---
+
+def bench_token_store(n_functions=20000):
+    c_code = make_source(n_functions)
+    tuples, tuple_peak = _peak_memory(_legacy_tokenize, c_code)
+    tokens, buffer_peak = _peak_memory(tokenize, c_code)
+    count = len(tokens)
+
+    print(f"Token store for {count} tokens (source text excluded)")
+    print(f"  list of tuples: {tuple_peak / 1e6:8.1f} MB peak, {tuple_peak / count:6.1f} B/token")
+    print(f"  TokenBuffer:    {buffer_peak / 1e6:8.1f} MB peak, {buffer_peak / count:6.1f} B/token"
+          f" ({tokens.nbytes() / count:.0f} B/token retained)")
+
+
+# --- 5. Parser: time per token as the program grows ---
+
+def bench_parser(n_functions=20000):
+    print("Parser (Pratt expressions) on growing sources")
+    print("{:>10} {:>10} {:>12}".format("functions", "tokens", "ns/token"))
+    for n in (n_functions // 8, n_functions // 4, n_functions // 2, n_functions):
+        tokens = tokenize(make_source(n))
+        seconds = best_of(parse, tokens, repeat=3)
+        print(f"{n:>10} {len(tokens):>10} {seconds * 1e9 / len(tokens):>12.0f}")
+
+
+# --- 6. Back End: regex re-parsing of TAC strings vs quadruple IR ---
+
+def make_straight_line(n_statements):
+    """One function with n_statements arithmetic assignments."""
+    body = "\n".join(f"    s = s + a * {i} - b / (a + {i % 5});" for i in range(n_statements))
+    return f"int big(int a, int b) {{\n    int s = 0;\n{body}\n    return s;\n}}\n"
+
+
+def _legacy_assembly(tac_instructions):
+    """The string back end: two re.match calls and a re.findall per instruction."""
+    target_var_match = re.match(r'(\w+)\s*=\s*(\w+)', tac_instructions[-1])
+    target_var = target_var_match.group(1) if target_var_match else "result"
+    assembly_code = []
+    variables = set()
+    for tac in tac_instructions:
+        match_op = re.match(r'(t\d+|\w+)\s*=\s*(\w+|\d+)\s*([+\-*/])\s*(\w+|\d+)', tac)
+        match_assign = re.match(r'(\w+)\s*=\s*(\w+)', tac)
+        for token in re.findall(r'\b[a-zA-Z_]\w*\b', tac):
+            if not token.startswith('t') and token not in ['dd']:
+                variables.add(token)
+        if match_op:
+            result_var, op1, operator, op2 = match_op.groups()
+            assembly_code.append(f"  MOV EAX, [{op1}]   ; Load {op1} into EAX")
+            if operator == '+':
+                assembly_code.append(f"  ADD EAX, [{op2}]   ; EAX = EAX + {op2}")
+            elif operator == '-':
+                assembly_code.append(f"  SUB EAX, [{op2}]   ; EAX = EAX - {op2}")
+            elif operator == '*':
+                assembly_code.append(f"  MOV EBX, [{op2}]   ; Load {op2} into EBX")
+                assembly_code.append("  IMUL EAX, EBX   ; EAX = EAX * EBX")
+            elif operator == '/':
+                assembly_code.append(f"  IDIV EAX, [{op2}]   ; EAX = EAX / {op2} (simplified)")
+            assembly_code.append(f"  MOV [{result_var}], EAX ; Store result in {result_var}")
+        elif match_assign and match_assign.group(1) == target_var:
+            assembly_code.append(f"  MOV EAX, [{match_assign.group(2)}] ; Load final result")
+            assembly_code.append(f"  MOV [{target_var}], EAX  ; Store final EAX value in {target_var}")
+    return variables, assembly_code
+
+
+def bench_ir(n_statements=50000):
+    unit = compile_unit(CompilationUnit("<bench>", make_straight_line(n_statements)))
+    function = unit.items[0]['function']
+    tac_strings = function.dump()
+    legacy = best_of(_legacy_assembly, tac_strings, repeat=3)
+    # Every value in memory, as in the legacy pass: allocation is measured by bench_regalloc
+    quads = best_of(assembly_for_tac, function, False, repeat=3)
+
+    print(f"Back end on {len(function.quads)} quads")
+    print(f"  TAC strings + regex:   {legacy * 1000:8.1f} ms")
+    print(f"  quadruple IR:          {quads * 1000:8.1f} ms")
+    print(f"  speedup:               {legacy / quads:8.2f}x")
+
+
+# --- 7. Local Optimizer: code size before and after ---
+
+def bench_optimizer(n_functions=5000):
+    unit = CompilationUnit("<bench>", make_source(n_functions))
+    syntax_analysis(unit)
+    build_symbol_table(unit)
+    generate_tac(unit)
+    functions = [item['function'] for item in unit.items if item['function'] is not None]
+
+    quads_before = sum(len(function.quads) for function in functions)
+    asm_before = sum(len(assembly_for_tac(function)['text']) for function in functions)
+    start = time.perf_counter()
+    for function in functions:
+        optimize(function)
+    seconds = time.perf_counter() - start
+    quads_after = sum(len(function.quads) for function in functions)
+    asm_after = sum(len(assembly_for_tac(function)['text']) for function in functions)
+
+    print(f"Local optimizer on {len(functions)} functions ({seconds * 1000:.1f} ms)")
+    print(f"  TAC instructions:      {quads_before:>8} -> {quads_after:>8} "
+          f"({100.0 * (quads_before - quads_after) / quads_before:.1f}% fewer)")
+    print(f"  assembly instructions: {asm_before:>8} -> {asm_after:>8} "
+          f"({100.0 * (asm_before - asm_after) / asm_before:.1f}% fewer)")
+
+
+# --- 8. Register Allocation: memory traffic with and without ---
+
+def bench_regalloc(n_functions=5000, n_statements=5000):
+    unit = compile_unit(CompilationUnit("<bench>", make_source(n_functions) + make_straight_line(n_statements)))
+    functions = [item['function'] for item in unit.items if item['function'] is not None]
+
+    print(f"Register allocation on {len(functions)} functions")
+    for label, group in (("small functions:", functions[:-1]), ("straight-line code:", functions[-1:])):
+        memory = [assembly_for_tac(function, allocate=False)['text'] for function in group]
+        start = time.perf_counter()
+        registers = [assembly_for_tac(function)['text'] for function in group]
+        seconds = time.perf_counter() - start
+        before = sum(memory_operands(text) for text in memory)
+        after = sum(memory_operands(text) for text in registers)
+        print(f"  {label}")
+        print(f"    memory operands:     {before:>8} -> {after:>8} ({100.0 * after / before:.1f}% of before)")
+        print(f"    instructions:        {sum(map(len, memory)):>8} -> {sum(map(len, registers)):>8}")
+        print(f"    allocation + emit:   {seconds * 1000:8.1f} ms")
+
+
+# --- 9. Peephole Optimizer: which rules pay off ---
+
+def bench_peephole(n_functions=5000):
+    unit = compile_unit(CompilationUnit("<bench>", make_source(n_functions)))
+    functions = [item['function'] for item in unit.items if item['function'] is not None]
+
+    for label, allocate in (("registers", True), ("memory only", False)):
+        texts = [assembly_for_tac(function, allocate)['text'] for function in functions]
+        start = time.perf_counter()
+        results = [peephole(text) for text in texts]
+        seconds = time.perf_counter() - start
+        before = sum(map(len, texts))
+        after = sum(len(text) for text, _ in results)
+        print(f"Peephole on {len(functions)} functions, {label} ({seconds * 1000:.1f} ms)")
+        print(f"  instructions:          {before:>8} -> {after:>8} ({100.0 * (before - after) / before:.1f}% fewer)")
+        fired = sum((counts for _, counts in results), Counter())
+        for name, count in fired.most_common():
+            print(f"  {name + ':':<22} {count:>8}")
+
+
+# --- 10. Dataflow: bitset worklist solver on large functions ---
+
+def make_branchy(n_statements):
+    """One function with n_statements statements in nested ifs and loops."""
+    lines = ["int big(int a, int b) {", "    int s = 0, t = 1, u = 2;"]
+    for i in range(0, n_statements, 4):
+        lines.append(f"    if (s > {i}) {{ t = s + a * {i}; }} else {{ u = t - b; }}")
+        lines.append(f"    while (u < {i % 9}) {{ u = u + t; s = s - {i % 5}; }}")
+    lines.append("    return s + t + u;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _set_liveness(function):
+    """Block liveness with Python sets, iterated round-robin to a fixed point."""
+    cfg = CFG(function.quads)
+    tracked = [value.kind == LOCAL or value.kind == TEMP for value in function.values]
+    uses, defs = [], []
+    for first, last in cfg.blocks:
+        used, defined = set(), set()
+        for quad in function.quads[first:last]:
+            used.update(v for v in quad_uses(quad) if tracked[v] and v not in defined)
+            if quad_def(quad) >= 0 and tracked[quad_def(quad)]:
+                defined.add(quad_def(quad))
+        uses.append(used)
+        defs.append(defined)
+    live_in = [set() for _ in cfg.blocks]
+    changed = True
+    while changed:
+        changed = False
+        for index in range(len(cfg.blocks)):
+            out = set()
+            for successor in cfg.successors[index]:
+                out |= live_in[successor]
+            new_in = uses[index] | (out - defs[index])
+            if new_in != live_in[index]:
+                live_in[index] = new_in
+                changed = True
+    return live_in
+
+
+def bench_dataflow(sizes=(2000, 10000, 40000)):
+    print(f"{'statements':>10} {'quads':>8} {'blocks':>7} {'sets':>9} {'liveness':>9} "
+          f"{'reaching':>9} {'dead code':>9}   (ms)")
+    for n in sizes:
+        unit = CompilationUnit("<bench>", make_branchy(n))
+        syntax_analysis(unit)
+        build_symbol_table(unit)
+        generate_tac(unit)
+        function = unit.items[0]['function']
+        blocks = len(CFG(function.quads).blocks)
+        sets = best_of(_set_liveness, function, repeat=1)
+        live = best_of(live_variables, function, repeat=3)
+        reaching = best_of(ReachingDefinitions, function, repeat=3)
+        quads = len(function.quads)
+        start = time.perf_counter()
+        eliminate_dead_code(function)
+        dead = time.perf_counter() - start
+        print(f"{n:>10} {quads:>8} {blocks:>7} {sets * 1000:>9.1f} {live * 1000:>9.1f} "
+              f"{reaching * 1000:>9.1f} {dead * 1000:>9.1f}")
+
+
+# --- 11. Bytecode VM: running compiled programs in-process ---
+
+def make_program(iterations, depth):
+    """A program with an int loop, float calls and a recursive function."""
+    return f"""int total = 0;
+float acc = 0.0;
+int fib(int n) {{
+    if (n < 2) {{ return n; }}
+    return fib(n - 1) + fib(n - 2);
+}}
+float scale(float x, int k) {{
+    return x * k + 0.5;
+}}
+int main() {{
+    for (int i = 0; i < {iterations}; i++) {{
+        total = total + i * 3 - total / 7;
+        if (total > 100000) {{ total = total - 100000; }}
+        acc = scale(acc, 3) / 4.0;
+    }}
+    return total + fib({depth});
+}}
+"""
+
+
+def _walk_quads(unit, entry='main'):
+    """Runs the quads directly: a dict per call, label lookups, dispatch on quad.op."""
+    functions = {item['function'].name: item['function'] for item in unit.items if item['function'] is not None}
+    glob = {symbol.name: vm_initial_value(symbol.initial_value, symbol.type)
+            for item in unit.items for symbol in item['globals']}
+    count = [0]
+
+    def call(function, args):
+        values = function.values
+        env = dict(zip(function.params, args))
+        labels = {quad.dest: i for i, quad in enumerate(function.quads) if quad.op == OP_LABEL}
+        params = []
+
+        def get(value_id):
+            value = values[value_id]
+            if value.kind == CONST:
+                return float(value.name) if '.' in value.name else int(value.name)
+            if value.kind == GLOBAL:
+                return glob[value.name]
+            return env.get(value_id, 0)
+
+        def put(value_id, number):
+            value = values[value_id]
+            number = vm_convert(number, vm_kind_of(value.ctype))
+            if value.kind == GLOBAL:
+                glob[value.name] = number
+            else:
+                env[value_id] = number
+
+        pc = 0
+        while True:
+            quad = function.quads[pc]
+            count[0] += 1
+            pc += 1
+            op = quad.op
+            if op == OP_JUMP:
+                pc = labels[quad.dest]
+            elif op == OP_IFFALSE:
+                if get(quad.src1) == 0:
+                    pc = labels[quad.dest]
+            elif op == OP_COPY:
+                put(quad.dest, get(quad.src1))
+            elif op in BINARY_OPS:
+                left, right = get(quad.src1), get(quad.src2)
+                if op == OP_DIV and not is_float(values[quad.dest].ctype):
+                    put(quad.dest, int(left / right))
+                else:
+                    put(quad.dest, PYTHON_OPERATORS[op](left, right))
+            elif op == OP_NEG:
+                put(quad.dest, -get(quad.src1))
+            elif op == OP_NOT:
+                put(quad.dest, int(get(quad.src1) == 0))
+            elif op == OP_PARAM:
+                params.append(get(quad.src1))
+            elif op == OP_CALL:
+                args = params[len(params) - quad.src2:]
+                del params[len(params) - quad.src2:]
+                result = call(functions[values[quad.src1].name], args)
+                if quad.dest >= 0:
+                    put(quad.dest, result)
+            elif op == OP_RETURN:
+                return get(quad.src1) if quad.src1 >= 0 else 0
+
+    return call(functions[entry], ()), count[0]
+
+
+def bench_vm(iterations=200000, depth=20):
+    unit = compile_unit(CompilationUnit("<bench>", make_program(iterations, depth)))
+    start = time.perf_counter()
+    program = Program.from_unit(unit)
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = program.run()
+    seconds = time.perf_counter() - start
+    steps = program.steps
+
+    start = time.perf_counter()
+    expected, quads = _walk_quads(unit)
+    walk = time.perf_counter() - start
+    assert result == expected, (result, expected)
+
+    print(f"Bytecode VM on fib({depth}) and a {iterations}-iteration loop (result {result})")
+    print(f"  encoding:              {encode * 1000:>8.2f} ms, "
+          f"{sum(len(f.code) // 4 for f in program.functions)} instructions")
+    print(f"  VM:                    {seconds:>8.2f} s, {steps:>10} instructions "
+          f"({steps / seconds / 1e6:.2f} M instructions/s)")
+    print(f"  quad walker:           {walk:>8.2f} s, {quads:>10} quads "
+          f"({quads / walk / 1e6:.2f} M quads/s)")
+    print(f"  speedup:               {walk / seconds:>8.1f}x")
+
+
+# --- 12. Python back end: compiled functions against the interpreters ---
+
+def bench_python(iterations=200000, depth=20):
+    unit = compile_unit(CompilationUnit("<bench>", make_program(iterations, depth)))
+    start = time.perf_counter()
+    program = PythonProgram.from_unit(unit)
+    translate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = program.run()
+    seconds = time.perf_counter() - start
+
+    vm = Program.from_unit(unit)
+    start = time.perf_counter()
+    expected = vm.run()
+    interpreted = time.perf_counter() - start
+    assert result == expected, (result, expected)
+
+    start = time.perf_counter()
+    _walk_quads(unit)
+    walk = time.perf_counter() - start
+
+    print(f"Python back end on fib({depth}) and a {iterations}-iteration loop (result {result})")
+    print(f"  translation:           {translate * 1000:>8.2f} ms, {program.source.count(chr(10))} lines")
+    print(f"  Python functions:      {seconds:>8.2f} s "
+          f"({vm.steps / seconds / 1e6:.2f} M VM-instruction equivalents/s)")
+    print(f"  bytecode VM:           {interpreted:>8.2f} s ({interpreted / seconds:.1f}x slower)")
+    print(f"  quad walker:           {walk:>8.2f} s ({walk / seconds:.1f}x slower)")
+
+
+# --- 13. Expression Order: left to right vs Sethi-Ullman over DAGs ---
+
+def make_expressions(n_statements, depth=10, seed=1):
+    """One function of deep, unbalanced arithmetic expressions over four locals.
+
+    Now and then a subexpression built earlier in the same statement is
+    repeated, as in hand-expanded formulas.
+    """
+    rng = random.Random(seed)
+    leaves = ('a', 'b', 'c', 'd', '3', '7')
+    built = {}
+
+    def expression(level):
+        if level == 0:
+            return rng.choice(leaves)
+        if level in built and rng.random() < 0.2:
+            return built[level]
+        deep, shallow = expression(level - 1), expression(rng.randrange(level))
+        op = rng.choice('+-*')
+        built[level] = f"({shallow} {op} {deep})" if rng.random() < 0.7 else f"({deep} {op} {shallow})"
+        return built[level]
+
+    lines = ["int kernel(int a, int b, int c, int d) {", "    int r = 0;"]
+    for _ in range(n_statements):
+        built.clear()
+        lines.append(f"    r = r + {expression(depth)};")
+    lines.append("    return r;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def bench_expressions(n_statements=200, depth=10):
+    unit = CompilationUnit("<bench>", make_expressions(n_statements, depth))
+    syntax_analysis(unit)
+    build_symbol_table(unit)
+    node = next(item for item in unit.program.items if isinstance(item, FunctionDef))
+
+    print(f"Expression order on {n_statements} expressions of depth {depth}")
+    print(f"  {'':<14} {'temps':>8} {'peak live':>10} {'spilled':>8} {'memory ops':>11} {'ms':>8}")
+    for label, ordered in (("left to right", False), ("Sethi-Ullman", True)):
+        start = time.perf_counter()
+        function = TACGenerator(unit.symbol_table, ordered).function(node)
+        seconds = time.perf_counter() - start
+        peak = max(len(live) for live in liveness(function))
+        spilled = allocate_registers(function).spilled
+        memory = memory_operands(assembly_for_tac(function)['text'])
+        print(f"  {label:<14} {function.temp_count:>8} {peak:>10} {spilled:>8} {memory:>11} "
+              f"{seconds * 1000:>8.1f}")
+
+
+# --- 14. Inlining: small helpers called from a hot loop ---
+
+def make_helpers(iterations):
+    """A loop calling small helpers, some of which call each other."""
+    return f"""int total = 0;
+int clamp(int v, int low, int high) {{
+    if (v < low) {{ return low; }}
+    if (v > high) {{ return high; }}
+    return v;
+}}
+int mix(int a, int b) {{
+    return a * 3 + b;
+}}
+int step(int i) {{
+    return clamp(mix(i, total), 0, 1000);
+}}
+int main() {{
+    for (int i = 0; i < {iterations}; i++) {{
+        total = total / 2 + step(i) + mix(i, 1);
+    }}
+    return total;
+}}
+"""
+
+
+def bench_inline(iterations=100000):
+    print(f"Inlining on a {iterations}-iteration loop of helper calls")
+    results = []
+    for label, inline in (("calls", False), ("inlined", True)):
+        unit = CompilationUnit("<bench>", make_helpers(iterations))
+        syntax_analysis(unit)
+        build_symbol_table(unit)
+        generate_tac(unit)
+        start = time.perf_counter()
+        optimize_tac(unit, inline)
+        optimized = time.perf_counter() - start
+        program = Program.from_unit(unit)
+        start = time.perf_counter()
+        results.append(program.run())
+        seconds = time.perf_counter() - start
+        sites = [site for item in unit.items for site in item['inlined_sites']]
+        print(f"  {label + ':':<10} optimize {optimized * 1000:>7.2f} ms, {len(sites)} site(s) inlined, "
+              f"VM {seconds:.2f} s for {program.steps} instructions")
+        for site in sites:
+            print(f"    {site.callee} into {site.caller} at call {site.site} ({site.quads} quads)")
+    assert results[0] == results[1], results
+
+
+# --- 15. Calling Convention: register arguments, frames and shared slots ---
+
+def make_blocks(n_functions):
+    """Functions declaring their locals in sibling blocks, each called from main."""
+    parts = []
+    for i in range(n_functions):
+        parts.append(f"""int blocks_{i}(int a, int b, int c) {{
+    int r = a;
+    if (a > b) {{ int x = a * {i}; int y = x - c; r = r + y; }}
+    else {{ int u = b * {i}; int v = u + c; r = r - v; }}
+    for (int k = 0; k < c; k++) {{ int w = k * b; r = r + w; }}
+    return r;
+}}""")
+    calls = "".join(f"    total = total + blocks_{i}(total, {i}, 3);\n" for i in range(n_functions))
+    parts.append(f"int main() {{\n    int total = 1;\n{calls}    return total;\n}}")
+    return "\n".join(parts) + "\n"
+
+
+def bench_frames(n_functions=2000):
+    unit = CompilationUnit("<bench>", make_source(n_functions) + make_blocks(n_functions))
+    syntax_analysis(unit)
+    build_symbol_table(unit)
+    generate_tac(unit)
+    optimize_tac(unit, inline=False)
+    functions = [item['function'] for item in unit.items if item['function'] is not None]
+
+    print(f"Calling convention on {len(functions)} functions")
+    for label, allocate in (("registers", True), ("memory only", False)):
+        start = time.perf_counter()
+        texts = [assembly_for_tac(function, allocate, unit.symbol_table)['text'] for function in functions]
+        seconds = time.perf_counter() - start
+        frameless = sum(1 for text in texts if text[1].strip() != "PUSH EBP")
+        print(f"  {label + ':':<13} {frameless:>6} of {len(functions)} without a frame, "
+              f"{sum(map(len, texts)):>8} instructions, {seconds * 1000:8.1f} ms")
+
+    passed = Counter()
+    for function in functions:
+        locations = argument_registers([function.values[param].ctype for param in function.params])
+        passed['in registers'] += sum(1 for register in locations if register is not None)
+        passed['parameters'] += len(locations)
+    print(f"  parameters in registers: {passed['in registers']} of {passed['parameters']}")
+
+    flat = scoped = 0
+    for function in functions:
+        registers = memory_allocation(function).registers
+        flat += StackFrame(function, registers).size
+        scoped += StackFrame(function, registers, unit.symbol_table).size
+    print(f"  frame bytes, memory only: {flat:>8} one slot per value -> {scoped:>8} sibling blocks shared "
+          f"({100.0 * (flat - scoped) / flat:.1f}% less)")
+
+
+BENCHMARKS = {
+    'front_end': bench_front_end,
+    'stream_memory': bench_stream_memory,
+    'lexer': bench_lexer,
+    'token_store': bench_token_store,
+    'parser': bench_parser,
+    'ir': bench_ir,
+    'optimizer': bench_optimizer,
+    'regalloc': bench_regalloc,
+    'peephole': bench_peephole,
+    'dataflow': bench_dataflow,
+    'vm': bench_vm,
+    'python': bench_python,
+    'expressions': bench_expressions,
+    'inline': bench_inline,
+    'frames': bench_frames,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,120 @@
+# cache.py - Content-addressed on-disk cache for compiled units
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+COMPILER_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = '.compile_cache'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_compiler_version = None
+
+
+def compiler_version():
+    """Fingerprint of the compiler's own modules.
+
+    Any edit to a compiler module changes every cache key, so a stale
+    entry can never be served by a newer compiler.
+    """
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(COMPILER_DIR)):
+            if name.endswith('.py'):
+                digest.update(name.encode('utf-8'))
+                with open(os.path.join(COMPILER_DIR, name), 'rb') as file:
+                    digest.update(file.read())
+        _compiler_version = digest.hexdigest()[:16]
+    return _compiler_version
+
+
+class CompileCache:
+    """Maps a hash of (compiler version, source text) to pickled phase results.
+
+    Entries live in cache_dir/<key[:2]>/<key>.pickle. A hit touches the
+    entry's mtime, so prune() can evict least-recently-used entries first
+    until the directory fits in max_bytes. Writes go through a temporary
+    file and os.replace, so concurrent workers never see partial entries.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, c_code):
+        digest = hashlib.sha256(compiler_version().encode('ascii'))
+        digest.update(c_code.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pickle')
+
+    def load(self, key):
+        """Returns the cached payload for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                payload = pickle.load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            # A damaged entry is dropped and recomputed.
+            self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return payload
+
+    def store(self, key, payload):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Caching is best-effort; a failed write only costs a later miss.
+            pass
+
+    def prune(self):
+        """Evicts least-recently-used entries beyond max_bytes; returns the count removed."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+        return removed
@@ -0,0 +1,209 @@
+# cfg.py - Control-flow graph over basic blocks, and the block-level passes that use it
+
+from ir import OP_IFFALSE, OP_JUMP, OP_LABEL, OP_RETURN, Quad, basic_blocks
+
+
+class CFG:
+    """The basic blocks of a quad list and the edges between them.
+
+    blocks[b] is the (first, last) quad range of block b, last exclusive;
+    block 0 is the entry. successors[b] and predecessors[b] are tuples of
+    block numbers. A block ending in IFFALSE lists its branch target first
+    and the block it falls through to second.
+    """
+
+    __slots__ = ('quads', 'blocks', 'successors', 'predecessors', 'label_block')
+
+    def __init__(self, quads):
+        self.quads = quads
+        self.blocks = blocks = basic_blocks(quads)
+        self.label_block = label_block = {}
+        for index, (first, _) in enumerate(blocks):
+            if quads[first].op == OP_LABEL:       # a label always starts a block
+                label_block[quads[first].dest] = index
+
+        self.successors = successors = []
+        predecessors = [[] for _ in blocks]
+        for index, (_, last) in enumerate(blocks):
+            end = quads[last - 1]
+            if end.op == OP_JUMP:
+                edges = (label_block[end.dest],)
+            elif end.op == OP_RETURN:
+                edges = ()
+            elif index + 1 == len(blocks):
+                edges = (label_block[end.dest],) if end.op == OP_IFFALSE else ()
+            elif end.op == OP_IFFALSE:
+                edges = (label_block[end.dest], index + 1)
+            else:
+                edges = (index + 1,)
+            successors.append(edges)
+            for successor in edges:
+                predecessors[successor].append(index)
+        self.predecessors = [tuple(edges) for edges in predecessors]
+
+    def falls_through(self, index):
+        """Whether control can run off the end of block index into the next one."""
+        end = self.quads[self.blocks[index][1] - 1].op
+        return end != OP_JUMP and end != OP_RETURN
+
+    def reachable(self):
+        """One flag per block: whether the entry reaches it."""
+        seen = [False] * len(self.blocks)
+        if not self.blocks:
+            return seen
+        seen[0] = True
+        stack = [0]
+        while stack:
+            for successor in self.successors[stack.pop()]:
+                if not seen[successor]:
+                    seen[successor] = True
+                    stack.append(successor)
+        return seen
+
+    def postorder(self):
+        """Every block in depth-first postorder from the entry; unreachable blocks come last."""
+        count = len(self.blocks)
+        visited = [False] * count
+        order = []
+        for root in range(count):
+            if visited[root]:
+                continue
+            visited[root] = True
+            stack = [(root, iter(self.successors[root]))]
+            while stack:
+                index, successors = stack[-1]
+                for successor in successors:
+                    if not visited[successor]:
+                        visited[successor] = True
+                        stack.append((successor, iter(self.successors[successor])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(index)
+        return order
+
+
+# --- Block Passes ---
+
+def remove_unreachable_blocks(function):
+    """Deletes the blocks the entry cannot reach; returns the number of quads removed."""
+    cfg = CFG(function.quads)
+    reachable = cfg.reachable()
+    if all(reachable):
+        return 0
+    quads = []
+    for (first, last), keep in zip(cfg.blocks, reachable):
+        if keep:
+            quads.extend(function.quads[first:last])
+    removed = len(function.quads) - len(quads)
+    function.quads = quads
+    return removed
+
+
+def thread_jumps(function):
+    """Retargets jumps and branches that land on an unconditional jump.
+
+    A label followed directly by 'goto L' (or by another label) forwards
+    to L, so a branch to it can go to L instead. Chains are followed to
+    their end; a cycle of such labels is an infinite loop and is left
+    alone. Returns the number of quads retargeted.
+    """
+    quads = function.quads
+    forward = {}
+    for quad, following in zip(quads, quads[1:]):
+        if quad.op == OP_LABEL and following.op in (OP_JUMP, OP_LABEL):
+            forward[quad.dest] = following.dest
+
+    def final(label):
+        seen = {label}
+        while label in forward and forward[label] not in seen:
+            label = forward[label]
+            seen.add(label)
+        return label
+
+    threaded = 0
+    for quad in quads:
+        if quad.op == OP_JUMP or quad.op == OP_IFFALSE:
+            target = final(quad.dest)
+            if target != quad.dest:
+                quad.dest = target
+                threaded += 1
+    return threaded
+
+
+def layout_blocks(function):
+    """Reorders the blocks so that jumps become fall-throughs where possible.
+
+    Blocks are placed in chains starting from the entry. After a block
+    comes the block it falls through to, or the target of its closing
+    jump, unless some other block falls through to that target already.
+    A jump or branch to the block placed right after it is deleted; a
+    block whose fall-through successor ended up elsewhere gets an explicit
+    jump. Returns the change in the number of quads (negative if fewer).
+    """
+    quads = function.quads
+    cfg = CFG(quads)
+    blocks = cfg.blocks
+    count = len(blocks)
+    fall_into = [index > 0 and cfg.falls_through(index - 1) for index in range(count)]
+
+    placed = [False] * count
+    order = []
+    for seed in range(count):
+        index = seed
+        while index is not None and not placed[index]:
+            placed[index] = True
+            order.append(index)
+            end = quads[blocks[index][1] - 1]
+            if end.op == OP_JUMP:
+                target = cfg.label_block[end.dest]
+                index = None if fall_into[target] else target
+            elif end.op == OP_RETURN or index + 1 == count:
+                index = None
+            else:
+                index = index + 1
+
+    # Blocks that need a label for a new jump to them
+    labels = {}
+    for position, index in enumerate(order):
+        following = order[position + 1] if position + 1 < count else None
+        if cfg.falls_through(index) and index + 1 < count and following != index + 1:
+            first = blocks[index + 1][0]
+            labels[index + 1] = quads[first].dest if quads[first].op == OP_LABEL else function.new_label()
+
+    laid_out = []
+    for position, index in enumerate(order):
+        first, last = blocks[index]
+        body = quads[first:last]
+        if index in labels and body[0].op != OP_LABEL:
+            body.insert(0, Quad(OP_LABEL, labels[index]))
+        following = order[position + 1] if position + 1 < count else None
+        end = body[-1]
+        if (end.op == OP_JUMP or end.op == OP_IFFALSE) and cfg.label_block[end.dest] == following \
+                and (end.op == OP_JUMP or index + 1 == following):
+            body.pop()              # the jump goes where control falls anyway
+        elif index + 1 in labels and index + 1 != following and cfg.falls_through(index):
+            body.append(Quad(OP_JUMP, labels[index + 1]))
+        laid_out.extend(body)
+    change = len(laid_out) - len(quads)
+    function.quads = laid_out
+    return change
+
+
+def remove_unused_labels(function):
+    """Deletes labels no jump refers to, so their blocks merge with the one before."""
+    targets = {quad.dest for quad in function.quads if quad.op == OP_JUMP or quad.op == OP_IFFALSE}
+    quads = [quad for quad in function.quads if quad.op != OP_LABEL or quad.dest in targets]
+    removed = len(function.quads) - len(quads)
+    function.quads = quads
+    return removed
+
+
+def simplify_cfg(function):
+    """Runs the block passes over function in place; returns the number of quads removed."""
+    before = len(function.quads)
+    thread_jumps(function)
+    remove_unreachable_blocks(function)
+    layout_blocks(function)
+    remove_unused_labels(function)
+    return before - len(function.quads)
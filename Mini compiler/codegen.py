@@ -0,0 +1,825 @@
+# codegen.py - x86 assembly generation from the quadruple IR
+
+import struct
+
+from ir import (BINARY_OPS, CONST, GLOBAL, OP_ADD, OP_CALL, OP_COPY, OP_DIV, OP_EQ, OP_GE, OP_GT, OP_IFFALSE,
+                OP_JUMP, OP_LABEL, OP_LE, OP_LT, OP_MUL, OP_NE, OP_NEG, OP_NOT, OP_PARAM, OP_RETURN, OP_SUB,
+                OPERATOR_TEXT, is_float, quad_def, quad_uses)
+from regalloc import (BYTE_REGISTERS, CALLEE_SAVED, XMM_REGISTERS, allocate_registers, argument_registers,
+                      build_intervals, liveness, memory_allocation)
+
+SET_CONDITION = {OP_EQ: 'SETE', OP_NE: 'SETNE', OP_LT: 'SETL', OP_GT: 'SETG', OP_LE: 'SETLE', OP_GE: 'SETGE'}
+ARITHMETIC_MNEMONIC = {OP_ADD: 'ADD', OP_SUB: 'SUB', OP_MUL: 'IMUL'}
+LOW_BYTE = {'EAX': 'AL', 'EBX': 'BL', 'ECX': 'CL', 'EDX': 'DL'}
+# Scratch preference: caller-saved registers first
+SCRATCH_ORDER = ('EAX', 'ECX', 'EDX', 'EBX', 'ESI', 'EDI')
+BYTE_SCRATCH_ORDER = tuple(register for register in SCRATCH_ORDER if register in BYTE_REGISTERS)
+# Floating-point type -> (size in bytes, data directive, struct format of its bits)
+FLOAT_FORMATS = {'float': (4, 'dd', ('<f', '<I')), 'double': (8, 'dq', ('<d', '<Q'))}
+# C type -> (size in bytes, data directive); other types are laid out as int
+TYPE_LAYOUT = {'char': (1, 'db'), 'int': (4, 'dd'), 'float': (4, 'dd'), 'double': (8, 'dq')}
+DIRECTIVE_SIZE = {'db': 1, 'dw': 2, 'dd': 4, 'dq': 8}
+
+# SSE scalar instructions: float uses the SS forms, double the SD forms
+SSE_SUFFIX = {'float': 'SS', 'double': 'SD'}
+SSE_ARITHMETIC = {OP_ADD: 'ADD', OP_SUB: 'SUB', OP_MUL: 'MUL', OP_DIV: 'DIV'}
+# UCOMISS sets the flags like an unsigned compare. a < b is tested as b > a,
+# so an unordered (NaN) operand makes every ordering false.
+SSE_SET_CONDITION = {OP_EQ: 'SETE', OP_NE: 'SETNE', OP_GT: 'SETA', OP_GE: 'SETAE', OP_LT: 'SETA', OP_LE: 'SETAE'}
+SSE_SWAPPED = frozenset((OP_LT, OP_LE))
+# Unordered also sets ZF, so equality needs PF too: a == b is ZF and not
+# PF, a != b is not ZF or PF. (second SETcc, instruction combining the two)
+SSE_PARITY = {OP_EQ: ('SETNP', 'AND'), OP_NE: ('SETP', 'OR')}
+
+
+# Multipliers a single LEA computes: x * m = x + x * (m - 1)
+LEA_MULTIPLIERS = (3, 5, 9)
+
+
+def pool_constant(text, ctype):
+    """(label, data line) of the read-only constant for literal text as a ctype.
+
+    The label is derived from the constant's bit pattern, so equal
+    constants share one entry across functions and cached items, and '@'
+    keeps it apart from every C identifier.
+    """
+    size, directive, (float_format, bits_format) = FLOAT_FORMATS[ctype]
+    value = float(text)
+    bits = struct.unpack(bits_format, struct.pack(float_format, value))[0]
+    label = f"{ctype}@{bits:0{2 * size}X}"
+    return label, f"  {label} {directive} 0x{bits:0{2 * size}X}   ; {value!r}"
+
+
+def aligned_section(lines):
+    """Data lines, largest first behind one align, so every entry is naturally aligned."""
+    def size(line):
+        return DIRECTIVE_SIZE[line.split()[1]]
+    lines = sorted(lines, key=size, reverse=True)
+    return [f"  align {size(lines[0])}"] + lines if lines else []
+
+
+def constant_pool(pool):
+    """The rodata section for pool, a dict of label -> line gathered from all functions.
+
+    Each label gets one line. Its comment shows the literal it was first
+    written as; the same bits written another way (0.1 and the folded
+    0.10000000149011612) have the same label.
+    """
+    return aligned_section(list(pool.values()))
+
+
+def data_definition(name, ctype, initial_value=None):
+    """A data line for a variable, sized by its type; float values get a float literal."""
+    directive = TYPE_LAYOUT.get(ctype, TYPE_LAYOUT['int'])[1]
+    if not is_float(ctype):
+        value = str(int(float(initial_value))) if initial_value is not None else '0'
+    else:
+        value = repr(float(initial_value or 0))
+        if '.' not in value:
+            value = value.replace('e', '.0e')   # NASM needs the point: 1e+20 -> 1.0e+20
+    return f"  {name} {directive} {value}"
+
+
+def assembly_for_globals(symbols):
+    """Data definitions for global variables, sized by their declared types."""
+    return {'data': [data_definition(symbol.name, symbol.type, symbol.initial_value) for symbol in symbols],
+            'rodata': [], 'text': []}
+
+
+# --- Stack Frame ---
+
+def slot_size(ctype):
+    """Bytes a value of ctype takes on the stack: its size, but at least a dword."""
+    return max(TYPE_LAYOUT.get(ctype, TYPE_LAYOUT['int'])[0], 4)
+
+
+class StackFrame:
+    """Where a function's arguments arrive and where its values in memory live.
+
+    The calling convention: the first two int or char arguments are passed
+    in ECX and EDX (see argument_registers); the others are pushed right
+    to left, each in a slot of slot_size, and the caller pops them. The
+    result comes back in EAX, or XMM0 for a float. A callee preserves
+    EBX, ESI, EDI and EBP and may overwrite the rest.
+
+    A function whose values all live in registers has no frame: it loads
+    its stack arguments relative to ESP in the prologue and leaves EBP
+    alone. Otherwise EBP holds the frame pointer, a stack argument kept
+    in memory is used where the caller put it, at [EBP+8] and up, and
+    every other value in memory gets a slot below EBP.
+
+    The slots follow the scope tree of the symbol table: a block's locals
+    come after those of the blocks around it, and sibling blocks start at
+    the same offset, so they share the space. If optimization has
+    stretched values of two siblings into each other's live ranges, the
+    later sibling goes after the earlier one instead. Temps, and locals
+    inlined from other functions, belong to the function's outermost
+    scope. Without a symbol table every value gets a slot of its own.
+    """
+
+    def __init__(self, function, registers, symbol_table=None):
+        values = function.values
+        self.arguments = []         # (parameter, register) of the register arguments
+        self.incoming = []          # (parameter, offset past the return address) of the stack arguments
+        self.operands = {}          # value ID -> memory operand of its slot
+        offset = 0
+        for param, register in zip(function.params, argument_registers([values[p].ctype for p in function.params])):
+            if register is not None:
+                self.arguments.append((param, register))
+            else:
+                self.incoming.append((param, offset))
+                offset += slot_size(values[param].ctype)
+
+        referenced = set(function.params)
+        for quad in function.quads:
+            referenced.update(quad_uses(quad))
+            referenced.add(quad_def(quad))
+        in_memory = [value for value in values if value.kind not in (CONST, GLOBAL)
+                     and registers[value.id] is None and value.id in referenced]
+        self.framed = bool(in_memory)
+        for param, offset in self.incoming:
+            if registers[param] is None:
+                self.operands[param] = f"[EBP+{offset + 8}]"
+        self.size = self.layout(function, [value for value in in_memory if value.id not in self.operands],
+                                symbol_table)
+
+    def layout(self, function, slotted, symbol_table):
+        """Gives each value in slotted an [EBP-n] operand; returns the bytes the slots take."""
+        if not slotted:
+            return 0
+        members = {}                # scope (None: the outermost) -> its values in memory
+        parents = {}
+        for value in slotted:
+            scope = self.home_scope(function, value, symbol_table)
+            members.setdefault(scope, []).append(value)
+            while scope is not None and scope not in parents:
+                parents[scope] = scope.parent if scope.parent.parent.parent is not None else None
+                scope = parents[scope]
+        children = {None: []}
+        for scope, parent in parents.items():
+            children.setdefault(scope, [])
+            children.setdefault(parent, []).append(scope)
+
+        intervals = {}
+        if len(children) > 1:
+            intervals = {interval.value: (interval.start, interval.end)
+                         for interval in build_intervals(function, liveness(function))}
+        everywhere = (0, len(function.quads))
+        extents = {}
+
+        def extent(scope):
+            """The quads over which any value of scope or a block inside it is live."""
+            if scope not in extents:
+                spans = [intervals.get(value.id, everywhere) for value in members.get(scope, ())]
+                spans += [extent(child) for child in children[scope]]
+                extents[scope] = (min(span[0] for span in spans), max(span[1] for span in spans))
+            return extents[scope]
+
+        def place(scope, top):
+            for value in sorted(members.get(scope, ()), key=lambda value: (-slot_size(value.ctype), value.id)):
+                size = slot_size(value.ctype)
+                top = (top + 2 * size - 1) // size * size
+                self.operands[value.id] = f"[EBP-{top}]"
+            end = top
+            placed = []             # (extent, end) of the siblings laid out so far
+            for child in sorted(children[scope], key=extent):
+                start, stop = extent(child)
+                base = max([top] + [below for (first, last), below in placed if first <= stop and start <= last])
+                below = place(child, base)
+                placed.append(((start, stop), below))
+                end = max(end, below)
+            return end
+
+        return (place(None, 0) + 3) // 4 * 4
+
+    @staticmethod
+    def home_scope(function, value, symbol_table):
+        """The block a local was declared in, or None for the function's outermost scope."""
+        if symbol_table is None or value.symbol < 0 or value.symbol >= len(symbol_table.symbols):
+            return None
+        symbol = symbol_table.symbols[value.symbol]
+        if value.name.split('.')[0] != symbol.name:
+            return None             # inlined from another function
+        scope = symbol_table.scopes[symbol.scope]
+        top = scope
+        while top.parent is not None and top.parent.parent is not None:
+            top = top.parent
+        if top.name != function.name or scope is top:
+            return None
+        return scope
+
+
+# --- Strength Reduction ---
+
+def power_of_two(n):
+    """k if n == 2**k for k >= 1, else None."""
+    return n.bit_length() - 1 if n > 1 and n & (n - 1) == 0 else None
+
+
+def magic_number(divisor):
+    """(multiplier, shift) for signed 32-bit division by a constant.
+
+    n / divisor is the high half of multiplier * n (plus n if divisor > 0
+    and the multiplier is negative, minus n in the opposite case), shifted
+    right arithmetically by shift and rounded toward zero by adding its
+    sign bit. This is the algorithm from Warren, Hacker's Delight, 10-1;
+    it needs abs(divisor) >= 2.
+    """
+    two31 = 1 << 31
+    ad = abs(divisor)
+    t = two31 + (divisor < 0)
+    anc = t - 1 - t % ad                    # |nc|, the largest n with n mod ad == ad - 1
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, ad)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= ad:
+            q2, r2 = q2 + 1, r2 - ad
+        delta = ad - r2
+        if not (q1 < delta or q1 == delta and r1 == 0):
+            break
+    multiplier = (q2 + 1) & 0xFFFFFFFF
+    if multiplier & 0x80000000:
+        multiplier -= 1 << 32
+    return (-multiplier if divisor < 0 else multiplier), p - 32
+
+
+class FunctionEmitter:
+    """Emits the instructions for one IRFunction under a register Allocation.
+
+    Values in registers are used in place; values in memory are addressed
+    directly where x86 allows a memory operand and go through a scratch
+    register where it does not. A scratch register is one no live value
+    occupies at that quad; if all are occupied, one is saved on the stack
+    around the instruction.
+
+    Constants in an integer operation are immediates. In a float or double
+    operation they are read from the constant pool, at the width of the
+    type the quad computes in.
+
+    Float and double values are computed with scalar SSE instructions in
+    the XMM registers; an int operand of a float operation is converted
+    with CVTSI2SS first. Float results are returned in XMM0.
+
+    Calls, the prologue and the epilogues follow the convention and frame
+    layout described at StackFrame.
+    """
+
+    def __init__(self, function, allocation, symbol_table=None):
+        self.function = function
+        self.allocation = allocation
+        self.registers = allocation.registers
+        self.frame = StackFrame(function, allocation.registers, symbol_table)
+        self.names = [value.name for value in function.values]
+        self.text = []
+        self.saves = []
+        self.saved = set(allocation.saved)
+        self.returns = []
+        self.context = 'int'        # the type the current quad computes in
+        self.rodata = {}
+
+    # --- Operands ---
+
+    def loc(self, value_id):
+        """Register name, immediate or memory operand for a value."""
+        register = self.registers[value_id]
+        if register is not None:
+            return register
+        value = self.function.values[value_id]
+        if value.kind == CONST:
+            if self.context in FLOAT_FORMATS:
+                return self.pooled(value.name, self.context)
+            # An integer operation: float literals are truncated
+            return str(int(float(value.name))) if '.' in value.name else value.name
+        if value.kind == GLOBAL:
+            return f"[{value.name}]"
+        return self.frame.operands[value_id]
+
+    def pooled(self, text, ctype):
+        """Memory operand for literal text as a ctype constant in the pool."""
+        label, line = pool_constant(text, ctype)
+        self.rodata[label] = line
+        return f"[{label}]"
+
+    def is_register(self, value_id):
+        return self.registers[value_id] is not None
+
+    def is_memory(self, value_id):
+        return self.registers[value_id] is None and not self.is_immediate(value_id)
+
+    def is_constant(self, value_id):
+        return self.function.values[value_id].kind == CONST
+
+    def is_immediate(self, value_id):
+        """A constant encoded in the instruction rather than loaded from the pool."""
+        return self.is_constant(value_id) and self.context not in FLOAT_FORMATS
+
+    def ctype(self, value_id):
+        return self.function.values[value_id].ctype
+
+    def operation_type(self, quad):
+        """The type quad computes in, which decides how its constants are encoded."""
+        values = self.function.values
+        op = quad.op
+        if op == OP_COPY or op in ARITHMETIC_MNEMONIC or op == OP_DIV or op == OP_NEG:
+            return values[quad.dest].ctype
+        if op in BINARY_OPS:
+            types = (values[quad.src1].ctype, values[quad.src2].ctype)
+            return 'double' if 'double' in types else 'float' if 'float' in types else 'int'
+        if quad_uses(quad):
+            return values[quad.src1].ctype
+        return 'int'
+
+    def sized(self, operand):
+        """Adds the DWORD size a memory operand needs when no register fixes the size."""
+        return f"DWORD {operand}" if operand.startswith('[') else operand
+
+    def scratch(self, i, quad, choices=SCRATCH_ORDER, exclude=()):
+        """A register from choices that is free at quad i, saved on the stack if none is."""
+        taken = {self.registers[v] for v in quad_uses(quad)}
+        taken.update(exclude)
+        dest = quad_def(quad)
+        if dest >= 0:
+            taken.add(self.registers[dest])
+        for register in choices:
+            if register not in self.allocation.busy[i] and register not in taken and register not in self.saves:
+                if register in CALLEE_SAVED:
+                    self.saved.add(register)
+                return register
+        register = next(r for r in choices if r not in taken and r not in self.saves)
+        if register in XMM_REGISTERS:
+            self.emit("SUB ESP, 8", "no free register: save one")
+            self.emit(f"MOVSD [ESP], {register}")
+        else:
+            self.emit(f"PUSH {register}", "no free register: save one")
+        self.saves.append(register)
+        return register
+
+    def restore(self):
+        """Undoes the saves scratch made, leaving the flags alone (LEA, not ADD)."""
+        while self.saves:
+            register = self.saves.pop()
+            if register in XMM_REGISTERS:
+                self.emit(f"MOVSD {register}, [ESP]")
+                self.emit("LEA ESP, [ESP+8]")
+            else:
+                self.emit(f"POP {register}")
+
+    def emit(self, instruction, comment=None):
+        self.text.append(f"  {instruction}   ; {comment}" if comment else f"  {instruction}")
+
+    def move(self, ctype):
+        """The move instruction for a value of ctype."""
+        return 'MOV' + SSE_SUFFIX[ctype] if is_float(ctype) else 'MOV'
+
+    def store(self, dest, register):
+        """Moves a result computed in register into dest's location."""
+        if self.loc(dest) != register:
+            self.emit(f"{self.move(self.ctype(dest))} {self.loc(dest)}, {register}",
+                      f"Store result in {self.names[dest]}")
+
+    # --- Function ---
+
+    def run(self):
+        function = self.function
+        pending_params = []
+        for i, quad in enumerate(function.quads):
+            op = quad.op
+            self.context = self.operation_type(quad)
+            if op == OP_PARAM:
+                pending_params.append(quad.src1)
+            elif op == OP_CALL:
+                self.call(quad, pending_params)
+                pending_params = []
+            else:
+                self.quad(i, quad)
+            self.restore()
+        body = self.text
+
+        # The callee-saved registers are known only now: the allocation's
+        # plus any taken as scratch registers.
+        saved = [register for register in CALLEE_SAVED if register in self.saved]
+        frame = self.frame
+        self.text = [f"{function.name}:"]
+        if frame.framed:
+            self.emit("PUSH EBP")
+            self.emit("MOV EBP, ESP")
+            if frame.size:
+                self.emit(f"SUB ESP, {frame.size}", "Slots for locals and temps")
+        for register in saved:
+            self.emit(f"PUSH {register}", "callee-saved")
+
+        # Register arguments move to their homes before any stack argument
+        # is loaded, since that may be loaded into ECX or EDX
+        self.parallel_move([(self.loc(param), register, f"Argument {self.names[param]}")
+                            for param, register in frame.arguments])
+        base = 8 if frame.framed else 4 * (len(saved) + 1)
+        pointer = 'EBP' if frame.framed else 'ESP'
+        for param, offset in frame.incoming:
+            if self.is_register(param):
+                self.emit(f"{self.move(self.ctype(param))} {self.loc(param)}, [{pointer}+{base + offset}]",
+                          f"Load argument {self.names[param]}")
+
+        returns = set(self.returns)
+        for index, line in enumerate(body):
+            if index in returns:
+                for register in reversed(saved):
+                    self.emit(f"POP {register}")
+                if frame.framed:
+                    self.emit("LEAVE")
+            self.text.append(line)
+        return {'data': [], 'rodata': [self.rodata[label] for label in sorted(self.rodata)], 'text': self.text}
+
+    def parallel_move(self, moves):
+        """Emits (dest, source, comment) moves so that every source is read before it is overwritten.
+
+        A move goes once no other pending move still reads its dest; two
+        registers that each need the other's value are swapped.
+        """
+        moves = [move for move in moves if move[0] != move[1]]
+        while moves:
+            for index, (dest, source, comment) in enumerate(moves):
+                if all(other != dest for _, other, _ in moves):
+                    self.emit(f"MOV {dest}, {source}", comment)
+                    del moves[index]
+                    break
+            else:
+                dest, source, comment = moves.pop(0)
+                self.emit(f"XCHG {dest}, {source}", comment)
+                swapped = {dest: source, source: dest}
+                moves = [(d, swapped.get(s, s), c) for d, s, c in moves if d != swapped.get(s, s)]
+
+    # --- Instructions ---
+
+    def quad(self, i, quad):
+        op = quad.op
+        loc = self.loc
+
+        if op == OP_LABEL:
+            self.text.append(f".L{quad.dest}:")
+        elif op == OP_JUMP:
+            self.emit(f"JMP .L{quad.dest}")
+        elif op == OP_IFFALSE and self.is_constant(quad.src1):
+            if float(self.function.values[quad.src1].name) == 0:
+                self.emit(f"JMP .L{quad.dest}")
+        elif op == OP_COPY:
+            self.copy(i, quad)
+        elif is_float(self.context):
+            self.float_quad(i, quad)
+        elif op == OP_IFFALSE:
+            self.emit(f"CMP {self.sized(loc(quad.src1))}, 0")
+            self.emit(f"JE .L{quad.dest}", f"Branch if {self.names[quad.src1]} is false")
+        elif op == OP_RETURN:
+            if quad.src1 >= 0 and loc(quad.src1) != 'EAX':
+                self.emit(f"MOV EAX, {loc(quad.src1)}", "Return value in EAX")
+            self.returns.append(len(self.text))     # the epilogue goes here
+            self.emit("RET")
+        elif op == OP_NEG:
+            register = loc(quad.dest) if self.is_register(quad.dest) else self.scratch(i, quad)
+            if loc(quad.src1) != register:
+                self.emit(f"MOV {register}, {loc(quad.src1)}")
+            self.emit(f"NEG {register}")
+            self.store(quad.dest, register)
+        elif op == OP_NOT:
+            left = loc(quad.src1)
+            if self.is_immediate(quad.src1):
+                left = self.scratch(i, quad)
+                self.emit(f"MOV {left}, {loc(quad.src1)}")
+            self.emit(f"CMP {self.sized(left)}, 0")
+            self.set_condition(i, quad, 'SETE')
+        elif op == OP_DIV:
+            self.divide(i, quad)
+        elif op == OP_MUL:
+            self.multiply(i, quad)
+        elif op in ARITHMETIC_MNEMONIC:
+            self.arithmetic(i, quad)
+        elif op in BINARY_OPS:
+            self.compare(i, quad)
+
+    def copy(self, i, quad):
+        dest_type, source_type = self.ctype(quad.dest), self.ctype(quad.src1)
+        if is_float(dest_type):
+            register = self.loc(quad.dest) if self.is_register(quad.dest) else None
+            if register is None and self.loc(quad.src1) in XMM_REGISTERS and source_type == dest_type:
+                register = self.loc(quad.src1)
+            elif register is None:
+                register = self.scratch(i, quad, XMM_REGISTERS)
+            self.load_float(i, quad, register, quad.src1)
+            self.store(quad.dest, register)
+            return
+        if is_float(source_type):
+            # Float to int truncates toward zero, as C requires
+            self.context = source_type
+            register = self.result_register(i, quad)
+            self.emit(f"CVTT{SSE_SUFFIX[source_type]}2SI {register}, {self.loc(quad.src1)}",
+                      f"{self.names[quad.dest]} = (int) {self.names[quad.src1]}")
+            self.store(quad.dest, register)
+            return
+
+        dest, source = self.loc(quad.dest), self.loc(quad.src1)
+        if dest == source:
+            return
+        if self.is_register(quad.dest) or self.is_register(quad.src1):
+            self.emit(f"MOV {dest}, {source}")
+        elif self.is_immediate(quad.src1):
+            self.emit(f"MOV DWORD {dest}, {source}")
+        else:
+            register = self.scratch(i, quad)
+            self.emit(f"MOV {register}, {source}")
+            self.emit(f"MOV {dest}, {register}", f"Store result in {self.names[quad.dest]}")
+
+    def arithmetic(self, i, quad):
+        op = quad.op
+        mnemonic = ARITHMETIC_MNEMONIC[op]
+        dest, left, right = self.loc(quad.dest), self.loc(quad.src1), self.loc(quad.src2)
+        comment = f"{self.names[quad.dest]} = {self.names[quad.src1]} {OPERATOR_TEXT[op]} {self.names[quad.src2]}"
+
+        if self.is_register(quad.dest):
+            if dest == left:
+                self.emit(f"{mnemonic} {dest}, {right}", comment)
+            elif dest == right:
+                if op == OP_SUB:
+                    # d = a - d  ==>  d = -d + a
+                    self.emit(f"NEG {dest}")
+                    self.emit(f"ADD {dest}, {left}", comment)
+                else:
+                    self.emit(f"{mnemonic} {dest}, {left}", comment)
+            else:
+                self.emit(f"MOV {dest}, {left}")
+                self.emit(f"{mnemonic} {dest}, {right}", comment)
+            return
+
+        register = self.scratch(i, quad)
+        self.emit(f"MOV {register}, {left}")
+        self.emit(f"{mnemonic} {register}, {right}", comment)
+        self.store(quad.dest, register)
+
+    def result_register(self, i, quad):
+        """quad's destination register, or a scratch register to compute it in."""
+        return self.loc(quad.dest) if self.is_register(quad.dest) else self.scratch(i, quad)
+
+    def multiply(self, i, quad):
+        """x * c as shifts and LEA where c allows, else a three-operand IMUL."""
+        source, constant = quad.src1, quad.src2
+        if self.is_immediate(source):
+            source, constant = constant, source
+        if not self.is_immediate(constant):
+            self.arithmetic(i, quad)
+            return
+        factor = int(self.loc(constant))
+        comment = f"{self.names[quad.dest]} = {self.names[quad.src1]} * {self.names[quad.src2]}"
+        register = self.result_register(i, quad)
+        operand = self.loc(source)
+        if self.is_immediate(source):
+            self.emit(f"MOV {register}, {operand}")
+            operand = register
+
+        magnitude = abs(factor)
+        lea = next((m for m in LEA_MULTIPLIERS
+                    if magnitude % m == 0 and (magnitude == m or power_of_two(magnitude // m))), None)
+        shift = power_of_two(magnitude // lea if lea else magnitude)
+        if lea is None and shift is None and magnitude != 1:
+            self.emit(f"IMUL {register}, {self.sized(operand)}, {factor}", comment)
+        else:
+            steps = [] if operand == register else [f"MOV {register}, {operand}"]
+            if lea is not None:
+                steps.append(f"LEA {register}, [{register}+{register}*{lea - 1}]")
+            if shift is not None:
+                steps.append(f"SHL {register}, {shift}")
+            if factor < 0:
+                steps.append(f"NEG {register}")
+            for step in steps:
+                self.emit(step, comment if step is steps[-1] else None)
+        self.store(quad.dest, register)
+
+    def divide(self, i, quad):
+        if self.is_immediate(quad.src2):
+            divisor = int(self.loc(quad.src2))
+            if divisor == -1:
+                register = self.result_register(i, quad)
+                if self.loc(quad.src1) != register:
+                    self.emit(f"MOV {register}, {self.loc(quad.src1)}")
+                self.emit(f"NEG {register}", f"{self.names[quad.dest]} = {self.names[quad.src1]} / -1")
+                self.store(quad.dest, register)
+                return
+            if power_of_two(abs(divisor)) is not None:
+                self.divide_by_power_of_two(i, quad, divisor)
+                return
+            if divisor not in (0, 1):
+                self.divide_by_magic(i, quad, divisor)
+                return
+
+        # IDIV divides EDX:EAX by a register or memory operand. Values that
+        # survive this quad are never allocated to EAX or EDX.
+        divisor = self.loc(quad.src2)
+        if self.is_immediate(quad.src2) or divisor in ('EAX', 'EDX'):
+            register = self.scratch(i, quad, ('ECX', 'EBX', 'ESI', 'EDI'))
+            self.emit(f"MOV {register}, {divisor}")
+            divisor = register
+        if self.loc(quad.src1) != 'EAX':
+            self.emit(f"MOV EAX, {self.loc(quad.src1)}", f"Load {self.names[quad.src1]} into EAX")
+        self.emit("CDQ", "Sign-extend EAX into EDX:EAX")
+        self.emit(f"IDIV {self.sized(divisor)}", "EAX = EDX:EAX / divisor")
+        self.store(quad.dest, 'EAX')
+
+    def divide_by_power_of_two(self, i, quad, divisor):
+        """n / 2**k: add 2**k - 1 to a negative n so the shift rounds toward zero."""
+        shift = power_of_two(abs(divisor))
+        register = self.result_register(i, quad)
+        bias = self.scratch(i, quad, exclude=(register,))
+        if self.loc(quad.src1) != register:
+            self.emit(f"MOV {register}, {self.loc(quad.src1)}")
+        self.emit(f"MOV {bias}, {register}")
+        if shift > 1:
+            self.emit(f"SAR {bias}, 31")
+        self.emit(f"SHR {bias}, {32 - shift}", "2**k - 1 if negative, else 0")
+        self.emit(f"ADD {register}, {bias}")
+        self.emit(f"SAR {register}, {shift}", f"{self.names[quad.dest]} = {self.names[quad.src1]} / {divisor}")
+        if divisor < 0:
+            self.emit(f"NEG {register}")
+        self.store(quad.dest, register)
+
+    def divide_by_magic(self, i, quad, divisor):
+        """n / d as a multiply by a magic number; EDX gets the high half of the product."""
+        multiplier, shift = magic_number(divisor)
+        dividend = self.loc(quad.src1)
+        if self.is_immediate(quad.src1) or dividend in ('EAX', 'EDX'):
+            register = self.scratch(i, quad, ('ECX', 'EBX', 'ESI', 'EDI'))
+            self.emit(f"MOV {register}, {dividend}")
+            dividend = register
+        self.emit(f"MOV EAX, {multiplier}", f"Magic number for / {divisor}")
+        self.emit(f"IMUL {self.sized(dividend)}", "EDX = high half of EAX * n")
+        if divisor > 0 and multiplier < 0:
+            self.emit(f"ADD EDX, {dividend}")
+        elif divisor < 0 and multiplier > 0:
+            self.emit(f"SUB EDX, {dividend}")
+        if shift:
+            self.emit(f"SAR EDX, {shift}")
+        self.emit("MOV EAX, EDX")
+        self.emit("SHR EAX, 31", "1 if the quotient is negative")
+        self.emit("ADD EDX, EAX", f"{self.names[quad.dest]} = {self.names[quad.src1]} / {divisor}")
+        self.store(quad.dest, 'EDX')
+
+    def compare(self, i, quad):
+        left, right = self.loc(quad.src1), self.loc(quad.src2)
+        if self.is_immediate(quad.src1) or self.is_memory(quad.src1) and self.is_memory(quad.src2):
+            register = self.scratch(i, quad)
+            self.emit(f"MOV {register}, {left}")
+            left = register
+        elif not self.is_register(quad.src1) and self.is_immediate(quad.src2):
+            left = self.sized(left)
+        self.emit(f"CMP {left}, {right}")
+        self.set_condition(i, quad, SET_CONDITION[quad.op])
+
+    def set_condition(self, i, quad, mnemonic, parity=None):
+        """Materializes the flags as 0/1 in quad's destination.
+
+        parity is an SSE_PARITY entry: the parity flag is set as well and
+        combined with the first condition.
+        """
+        dest = self.loc(quad.dest)
+        register = dest if dest in BYTE_REGISTERS else self.scratch(i, quad, BYTE_REGISTERS)
+        self.emit(f"{mnemonic} {LOW_BYTE[register]}")
+        if parity is not None:
+            other = self.scratch(i, quad, BYTE_SCRATCH_ORDER, (register,))
+            self.emit(f"{parity[0]} {LOW_BYTE[other]}")
+            self.emit(f"{parity[1]} {LOW_BYTE[register]}, {LOW_BYTE[other]}", "NaN compares unordered")
+        self.emit(f"MOVZX {register}, {LOW_BYTE[register]}")
+        self.store(quad.dest, register)
+
+    def call(self, quad, args):
+        registers = argument_registers([self.ctype(arg) for arg in args])
+        size = 0
+        for arg, register in reversed(list(zip(args, registers))):
+            if register is not None:
+                continue
+            ctype = self.context = self.ctype(arg)
+            operand = self.loc(arg)
+            if operand in XMM_REGISTERS:
+                width = TYPE_LAYOUT[ctype][0]
+                self.emit(f"SUB ESP, {width}")
+                self.emit(f"{self.move(ctype)} [ESP], {operand}")
+                size += width
+            elif is_float(ctype):
+                # A float in memory is pushed as its bits, high dword first
+                width = TYPE_LAYOUT[ctype][0]
+                for word in range(width - 4, -1, -4):
+                    self.emit(f"PUSH DWORD {operand[:-1]}+{word}]" if word else f"PUSH DWORD {operand}")
+                size += width
+            else:
+                self.emit(f"PUSH {self.sized(operand)}")
+                size += 4
+        self.context = 'int'
+        self.parallel_move([(register, self.loc(arg), f"Argument {self.names[arg]}")
+                            for arg, register in zip(args, registers) if register is not None])
+        self.emit(f"CALL {self.names[quad.src1]}")
+        if size:
+            self.emit(f"ADD ESP, {size}", f"Pop {registers.count(None)} argument(s)")
+        if quad.dest >= 0:
+            self.store(quad.dest, 'XMM0' if is_float(self.ctype(quad.dest)) else 'EAX')
+
+    # --- Floating Point ---
+
+    def load_float(self, i, quad, register, value_id):
+        """Loads value_id into XMM register as the current float type, converting it if needed."""
+        suffix = SSE_SUFFIX[self.context]
+        source_type = self.ctype(value_id)
+        operand = self.loc(value_id)
+        if self.is_constant(value_id) or source_type == self.context:
+            if operand != register:
+                self.emit(f"MOV{suffix} {register}, {operand}")
+        elif is_float(source_type):
+            self.emit(f"CVT{SSE_SUFFIX[source_type]}2{suffix} {register}, {operand}")
+        else:
+            self.emit(f"CVTSI2{suffix} {register}, {self.sized(operand)}", f"(float) {self.names[value_id]}")
+
+    def float_operand(self, i, quad, value_id, exclude=()):
+        """An XMM register or memory operand holding value_id as the current float type."""
+        if self.is_constant(value_id) or self.ctype(value_id) == self.context:
+            return self.loc(value_id)
+        register = self.scratch(i, quad, XMM_REGISTERS, exclude)
+        self.load_float(i, quad, register, value_id)
+        return register
+
+    def float_quad(self, i, quad):
+        op = quad.op
+        suffix = SSE_SUFFIX[self.context]
+        if op == OP_RETURN:
+            self.load_float(i, quad, 'XMM0', quad.src1)
+            self.returns.append(len(self.text))     # the epilogue goes here
+            self.emit("RET")
+        elif op in SSE_ARITHMETIC:
+            self.float_arithmetic(i, quad)
+        elif op == OP_NEG:
+            # Flip the sign bit; XORPS needs the mask in a register
+            register = self.loc(quad.dest) if self.is_register(quad.dest) else self.scratch(i, quad, XMM_REGISTERS)
+            self.load_float(i, quad, register, quad.src1)
+            mask = self.scratch(i, quad, XMM_REGISTERS, (register,))
+            self.emit(f"MOV{suffix} {mask}, {self.pooled('-0.0', self.context)}")
+            self.emit(f"XORPS {register}, {mask}", f"{self.names[quad.dest]} = -{self.names[quad.src1]}")
+            self.store(quad.dest, register)
+        elif op == OP_NOT or op == OP_IFFALSE:
+            zero = self.scratch(i, quad, XMM_REGISTERS)
+            self.emit(f"XORPS {zero}, {zero}")
+            self.emit(f"UCOMI{suffix} {zero}, {self.float_operand(i, quad, quad.src1, (zero,))}")
+            if op == OP_NOT:
+                self.set_condition(i, quad, 'SETE', SSE_PARITY[OP_EQ])
+            else:
+                self.restore()      # before the branch, which would skip it
+                self.emit(f"JP .Lnan{i}", "NaN is true")
+                self.emit(f"JE .L{quad.dest}", f"Branch if {self.names[quad.src1]} is false")
+                self.text.append(f".Lnan{i}:")
+        elif op in BINARY_OPS:
+            left, right = quad.src1, quad.src2
+            if op in SSE_SWAPPED:
+                left, right = right, left
+            operand = self.loc(left)
+            if operand not in XMM_REGISTERS or self.ctype(left) != self.context:
+                operand = self.scratch(i, quad, XMM_REGISTERS)
+                self.load_float(i, quad, operand, left)
+            self.emit(f"UCOMI{suffix} {operand}, {self.float_operand(i, quad, right, (operand,))}")
+            self.set_condition(i, quad, SSE_SET_CONDITION[op], SSE_PARITY.get(op))
+
+    def float_arithmetic(self, i, quad):
+        op = quad.op
+        mnemonic = SSE_ARITHMETIC[op] + SSE_SUFFIX[self.context]
+        comment = f"{self.names[quad.dest]} = {self.names[quad.src1]} {OPERATOR_TEXT[op]} {self.names[quad.src2]}"
+        register = self.loc(quad.dest) if self.is_register(quad.dest) else self.scratch(i, quad, XMM_REGISTERS)
+
+        if register == self.loc(quad.src2) and register != self.loc(quad.src1):
+            if op == OP_ADD or op == OP_MUL:
+                self.emit(f"{mnemonic} {register}, {self.float_operand(i, quad, quad.src1, (register,))}", comment)
+            else:
+                # d = a - d: compute in another register, then move back
+                other = self.scratch(i, quad, XMM_REGISTERS, (register,))
+                self.load_float(i, quad, other, quad.src1)
+                self.emit(f"{mnemonic} {other}, {register}", comment)
+                self.emit(f"MOV{SSE_SUFFIX[self.context]} {register}, {other}")
+        else:
+            self.load_float(i, quad, register, quad.src1)
+            self.emit(f"{mnemonic} {register}, {self.float_operand(i, quad, quad.src2, (register,))}", comment)
+        self.store(quad.dest, register)
+
+
+def assembly_for_tac(function, allocate=True, symbol_table=None):
+    """Generates x86 assembly for one IRFunction.
+
+    With allocate, locals and temps are assigned registers by linear scan;
+    otherwise every value lives in memory. Memory values live in the
+    function's stack frame, laid out by StackFrame along the scopes of
+    symbol_table, and TAC labels become NASM local labels (.L1, ...).
+    Returns {'data': [...], 'rodata': [...], 'text': [...]}; a function
+    has no data of its own.
+    """
+    allocation = allocate_registers(function) if allocate else memory_allocation(function)
+    return FunctionEmitter(function, allocation, symbol_table).run()
+
+
+def memory_operands(text):
+    """Number of instructions in text with an explicit memory operand."""
+    return sum(1 for line in text if '[' in line.split(';', 1)[0])
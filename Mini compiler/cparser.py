@@ -0,0 +1,502 @@
+# cparser.py - Recursive-descent parser with Pratt expressions, building a compact AST
+
+from lexer import TK_ID, TK_KEYWORD, TK_LITERAL, TK_OPERATOR, TK_SEPARATOR
+from symtab import DATA_TYPES
+
+
+class ParseError(Exception):
+    """A syntax error, with the 1-based line and column where it was found."""
+
+    def __init__(self, message, line, column):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.line = line
+        self.column = column
+
+
+# --- 1. AST Nodes ---
+# Every node keeps pos, the index of its first token in the TokenBuffer.
+# Expressions carry ctype, filled in by the symbol table phase.
+
+class Node:
+    __slots__ = ('pos',)
+
+
+class Program(Node):
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.pos = 0
+        self.items = items
+
+
+class FunctionDef(Node):
+    """A function definition, or a prototype when body is None.
+
+    first/last delimit its tokens (last exclusive) for incremental builds.
+    """
+    __slots__ = ('type', 'name', 'params', 'body', 'first', 'last', 'symbol')
+
+    def __init__(self, pos, type, name, params, body, first, last):
+        self.pos = pos
+        self.type = type
+        self.name = name
+        self.params = params
+        self.body = body
+        self.first = first
+        self.last = last
+        self.symbol = -1
+
+
+class Param(Node):
+    __slots__ = ('type', 'name', 'symbol')
+
+    def __init__(self, pos, type, name):
+        self.pos = pos
+        self.type = type
+        self.name = name
+        self.symbol = -1
+
+
+class Decl(Node):
+    """One declarator of a declaration: type name [= init]."""
+    __slots__ = ('type', 'name', 'init', 'symbol')
+
+    def __init__(self, pos, type, name, init):
+        self.pos = pos
+        self.type = type
+        self.name = name
+        self.init = init
+        self.symbol = -1
+
+
+class DeclStmt(Node):
+    """A declaration statement; at top level first/last delimit its tokens."""
+    __slots__ = ('decls', 'first', 'last')
+
+    def __init__(self, pos, decls, first=None, last=None):
+        self.pos = pos
+        self.decls = decls
+        self.first = first
+        self.last = last
+
+
+class Block(Node):
+    __slots__ = ('stmts', 'scope')
+
+    def __init__(self, pos, stmts):
+        self.pos = pos
+        self.stmts = stmts
+        self.scope = -1
+
+
+class ExprStmt(Node):
+    __slots__ = ('expr',)
+
+    def __init__(self, pos, expr):
+        self.pos = pos
+        self.expr = expr
+
+
+class Return(Node):
+    __slots__ = ('value',)
+
+    def __init__(self, pos, value):
+        self.pos = pos
+        self.value = value
+
+
+class If(Node):
+    __slots__ = ('cond', 'then', 'orelse')
+
+    def __init__(self, pos, cond, then, orelse):
+        self.pos = pos
+        self.cond = cond
+        self.then = then
+        self.orelse = orelse
+
+
+class While(Node):
+    __slots__ = ('cond', 'body')
+
+    def __init__(self, pos, cond, body):
+        self.pos = pos
+        self.cond = cond
+        self.body = body
+
+
+class For(Node):
+    """for (init; cond; step) body. init is a DeclStmt, an ExprStmt or None."""
+    __slots__ = ('init', 'cond', 'step', 'body', 'scope')
+
+    def __init__(self, pos, init, cond, step, body):
+        self.pos = pos
+        self.init = init
+        self.cond = cond
+        self.step = step
+        self.body = body
+        self.scope = -1
+
+
+class Num(Node):
+    __slots__ = ('value', 'ctype')
+
+    def __init__(self, pos, value):
+        self.pos = pos
+        self.value = value
+        self.ctype = 'float' if '.' in value else 'int'
+
+
+class Name(Node):
+    __slots__ = ('name', 'symbol', 'ctype')
+
+    def __init__(self, pos, name):
+        self.pos = pos
+        self.name = name
+        self.symbol = -1
+        self.ctype = None
+
+
+class Unary(Node):
+    __slots__ = ('op', 'operand', 'ctype')
+
+    def __init__(self, pos, op, operand):
+        self.pos = pos
+        self.op = op
+        self.operand = operand
+        self.ctype = None
+
+
+class Binary(Node):
+    __slots__ = ('op', 'left', 'right', 'ctype')
+
+    def __init__(self, pos, op, left, right):
+        self.pos = pos
+        self.op = op
+        self.left = left
+        self.right = right
+        self.ctype = None
+
+
+class Assign(Node):
+    __slots__ = ('target', 'value', 'ctype')
+
+    def __init__(self, pos, target, value):
+        self.pos = pos
+        self.target = target
+        self.value = value
+        self.ctype = None
+
+
+class IncDec(Node):
+    """++x, --x, x++ or x--; op is '+' or '-'."""
+    __slots__ = ('op', 'target', 'prefix', 'ctype')
+
+    def __init__(self, pos, op, target, prefix):
+        self.pos = pos
+        self.op = op
+        self.target = target
+        self.prefix = prefix
+        self.ctype = None
+
+
+class Call(Node):
+    __slots__ = ('name', 'args', 'symbol', 'ctype')
+
+    def __init__(self, pos, name, args):
+        self.pos = pos
+        self.name = name
+        self.args = args
+        self.symbol = -1
+        self.ctype = None
+
+
+# --- 2. Pratt Expression Tables ---
+
+# Infix operator -> (left binding power, right binding power).
+# Assignment binds loosest and associates to the right.
+INFIX_BP = {
+    '=': (2, 1), '+=': (2, 1), '-=': (2, 1), '*=': (2, 1), '/=': (2, 1),
+    '==': (3, 4), '!=': (3, 4),
+    '<': (5, 6), '>': (5, 6), '<=': (5, 6), '>=': (5, 6),
+    '+': (7, 8), '-': (7, 8),
+    '*': (9, 10), '/': (9, 10),
+}
+RELATIONAL_OPS = ('==', '!=', '<', '>', '<=', '>=')
+PREFIX_BP = 11
+POSTFIX_BP = 13
+ASSIGN_OPS = {'=', '+=', '-=', '*=', '/='}
+
+
+# --- 3. Parser ---
+
+class Parser:
+    """Single-pass, linear-time parser over a TokenBuffer.
+
+    Statements are parsed by recursive descent; expressions by a Pratt
+    loop driven by INFIX_BP. Each token is looked at a constant number of
+    times, so parsing is linear in the number of tokens.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.kinds = tokens.kinds
+        self.n = len(tokens)
+        self.i = 0
+
+    # --- Token Helpers ---
+
+    def error(self, message, i=None):
+        i = self.i if i is None else i
+        source = self.tokens.source
+        if i < self.n:
+            offset = self.tokens.starts[i]
+            found = f"'{self.tokens.value(i)}'"
+        else:
+            offset = len(source)
+            found = "end of input"
+        line = source.count('\n', 0, offset) + 1
+        column = offset - (source.rfind('\n', 0, offset) + 1) + 1
+        return ParseError(f"{message}, found {found}", line, column)
+
+    def at(self, kind, value):
+        return self.i < self.n and self.tokens.match(self.i, kind, value)
+
+    def at_type(self):
+        return (self.i < self.n and self.kinds[self.i] == TK_KEYWORD
+                and self.tokens.value(self.i) in DATA_TYPES)
+
+    def accept(self, kind, value):
+        if self.at(kind, value):
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, kind, value):
+        if not self.at(kind, value):
+            raise self.error(f"Expected '{value}'")
+        self.i += 1
+
+    def expect_id(self):
+        if self.i >= self.n or self.kinds[self.i] != TK_ID:
+            raise self.error("Expected an identifier")
+        self.i += 1
+        return self.tokens.value(self.i - 1)
+
+    def expect_type(self):
+        if not self.at_type():
+            raise self.error("Expected a type")
+        self.i += 1
+        return self.tokens.value(self.i - 1)
+
+    # --- Declarations ---
+
+    def parse_program(self):
+        items = []
+        while self.i < self.n:
+            items.append(self.parse_top_level())
+        return Program(items)
+
+    def parse_top_level(self):
+        first = self.i
+        type = self.expect_type()
+        name_pos = self.i
+        name = self.expect_id()
+
+        if self.accept(TK_SEPARATOR, '('):
+            params = self.parse_params()
+            body = None if self.accept(TK_SEPARATOR, ';') else self.parse_block()
+            return FunctionDef(name_pos, type, name, params, body, first, self.i)
+
+        decls = self.parse_declarators(type, name_pos, name)
+        return DeclStmt(first, decls, first, self.i)
+
+    def parse_params(self):
+        params = []
+        if self.at(TK_KEYWORD, 'void') and self.i + 1 < self.n and self.tokens.match(self.i + 1, TK_SEPARATOR, ')'):
+            self.i += 1
+        if not self.accept(TK_SEPARATOR, ')'):
+            while True:
+                type = self.expect_type()
+                pos = self.i
+                params.append(Param(pos, type, self.expect_id()))
+                if self.accept(TK_SEPARATOR, ')'):
+                    break
+                self.expect(TK_SEPARATOR, ',')
+        return params
+
+    def parse_declarators(self, type, pos, name):
+        """Parses '[= init] {, name [= init]} ;' after the first name."""
+        decls = []
+        while True:
+            init = self.parse_expression(2) if self.accept(TK_OPERATOR, '=') else None
+            decls.append(Decl(pos, type, name, init))
+            if not self.accept(TK_SEPARATOR, ','):
+                break
+            pos = self.i
+            name = self.expect_id()
+        self.expect(TK_SEPARATOR, ';')
+        return decls
+
+    def parse_declaration(self):
+        first = self.i
+        type = self.expect_type()
+        pos = self.i
+        name = self.expect_id()
+        return DeclStmt(first, self.parse_declarators(type, pos, name))
+
+    # --- Statements ---
+
+    def parse_block(self):
+        pos = self.i
+        self.expect(TK_SEPARATOR, '{')
+        stmts = []
+        while not self.at(TK_SEPARATOR, '}'):
+            if self.i >= self.n:
+                raise self.error("Expected '}'")
+            stmt = self.parse_statement()
+            if stmt is not None:
+                stmts.append(stmt)
+        self.i += 1
+        return Block(pos, stmts)
+
+    def parse_statement(self):
+        pos = self.i
+        if pos >= self.n:
+            raise self.error("Expected a statement")
+        if self.kinds[pos] == TK_KEYWORD:
+            word = self.tokens.value(pos)
+            if word in DATA_TYPES:
+                return self.parse_declaration()
+            if word == 'if':
+                self.i += 1
+                cond = self.parse_condition()
+                then = self.parse_statement()
+                orelse = self.parse_statement() if self.accept(TK_KEYWORD, 'else') else None
+                return If(pos, cond, then, orelse)
+            if word == 'while':
+                self.i += 1
+                cond = self.parse_condition()
+                return While(pos, cond, self.parse_statement())
+            if word == 'for':
+                return self.parse_for()
+            if word == 'return':
+                self.i += 1
+                value = None if self.at(TK_SEPARATOR, ';') else self.parse_expression()
+                self.expect(TK_SEPARATOR, ';')
+                return Return(pos, value)
+            raise self.error("Unexpected keyword")
+
+        if self.at(TK_SEPARATOR, '{'):
+            return self.parse_block()
+        if self.accept(TK_SEPARATOR, ';'):
+            return None
+        expr = self.parse_expression()
+        self.expect(TK_SEPARATOR, ';')
+        return ExprStmt(pos, expr)
+
+    def parse_condition(self):
+        self.expect(TK_SEPARATOR, '(')
+        cond = self.parse_expression()
+        self.expect(TK_SEPARATOR, ')')
+        return cond
+
+    def parse_for(self):
+        pos = self.i
+        self.i += 1
+        self.expect(TK_SEPARATOR, '(')
+        if self.at_type():
+            init = self.parse_declaration()
+        elif self.accept(TK_SEPARATOR, ';'):
+            init = None
+        else:
+            init_pos = self.i
+            init = ExprStmt(init_pos, self.parse_expression())
+            self.expect(TK_SEPARATOR, ';')
+        cond = None if self.at(TK_SEPARATOR, ';') else self.parse_expression()
+        self.expect(TK_SEPARATOR, ';')
+        step = None if self.at(TK_SEPARATOR, ')') else self.parse_expression()
+        self.expect(TK_SEPARATOR, ')')
+        return For(pos, init, cond, step, self.parse_statement())
+
+    # --- Expressions (Pratt) ---
+
+    def parse_expression(self, min_bp=0):
+        left = self.parse_prefix()
+        while self.i < self.n and self.kinds[self.i] == TK_OPERATOR:
+            pos = self.i
+            op = self.tokens.value(pos)
+
+            if op in ('++', '--'):
+                if POSTFIX_BP < min_bp:
+                    break
+                if not isinstance(left, Name):
+                    raise self.error(f"Operand of '{op}' must be a variable", pos)
+                self.i += 1
+                left = IncDec(pos, op[0], left, False)
+                continue
+
+            bp = INFIX_BP.get(op)
+            if bp is None or bp[0] < min_bp:
+                break
+            self.i += 1
+            right = self.parse_expression(bp[1])
+
+            if op in ASSIGN_OPS:
+                if not isinstance(left, Name):
+                    raise self.error("Left side of assignment must be a variable", pos)
+                if op != '=':
+                    # x op= e is x = x op e
+                    right = Binary(pos, op[0], Name(left.pos, left.name), right)
+                left = Assign(pos, left, right)
+            else:
+                left = Binary(pos, op, left, right)
+        return left
+
+    def parse_prefix(self):
+        pos = self.i
+        if pos >= self.n:
+            raise self.error("Expected an expression")
+        kind = self.kinds[pos]
+
+        if kind == TK_LITERAL:
+            self.i += 1
+            return Num(pos, self.tokens.value(pos))
+
+        if kind == TK_ID:
+            self.i += 1
+            name = self.tokens.value(pos)
+            if self.accept(TK_SEPARATOR, '('):
+                args = []
+                if not self.accept(TK_SEPARATOR, ')'):
+                    while True:
+                        args.append(self.parse_expression(2))
+                        if self.accept(TK_SEPARATOR, ')'):
+                            break
+                        self.expect(TK_SEPARATOR, ',')
+                return Call(pos, name, args)
+            return Name(pos, name)
+
+        if self.accept(TK_SEPARATOR, '('):
+            expr = self.parse_expression()
+            self.expect(TK_SEPARATOR, ')')
+            return expr
+
+        if kind == TK_OPERATOR:
+            op = self.tokens.value(pos)
+            if op in ('-', '!', '+'):
+                self.i += 1
+                operand = self.parse_expression(PREFIX_BP)
+                return operand if op == '+' else Unary(pos, op, operand)
+            if op in ('++', '--'):
+                self.i += 1
+                operand = self.parse_expression(PREFIX_BP)
+                if not isinstance(operand, Name):
+                    raise self.error(f"Operand of '{op}' must be a variable", pos)
+                return IncDec(pos, op[0], operand, True)
+
+        raise self.error("Expected an expression")
+
+
+def parse(tokens):
+    """Parses a TokenBuffer into a Program; raises ParseError on bad input."""
+    return Parser(tokens).parse_program()
@@ -0,0 +1,89 @@
+# dag.py - Expression DAGs, and the Sethi-Ullman order to evaluate them in
+
+
+class DAGNode:
+    """An operation of an expression DAG, or a leaf holding an existing value.
+
+    A leaf has op None and value set to its value ID. An operation has
+    its opcode, its operand nodes (right is None for a unary one), and
+    value -1 until a temp has been emitted for it. need is its
+    Sethi-Ullman number: the registers it takes to evaluate the node
+    without spilling. Nodes computing the same thing have the same number.
+    """
+
+    __slots__ = ('op', 'ctype', 'left', 'right', 'value', 'need', 'number')
+
+    def __init__(self, op, ctype, left=None, right=None, value=-1, need=0, number=0):
+        self.op = op
+        self.ctype = ctype
+        self.left = left
+        self.right = right
+        self.value = value
+        self.need = need
+        self.number = number
+
+
+class ExpressionDAG:
+    """The operations of one side-effect-free expression, with repeated subexpressions shared.
+
+    Nodes are hash-consed on their opcode, type and operands, so building
+    the same subtree twice returns the same node, which is then computed
+    once. An operation on two leaves is the exception: recomputing it
+    takes one instruction, while sharing it would hold a register from its
+    first use to its last, so each occurrence gets a node of its own. The
+    copies share a number, which is what their users are keyed on.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def leaf(self, value_id):
+        node = self.nodes.get(value_id)
+        if node is None:
+            node = self.nodes[value_id] = DAGNode(None, None, value=value_id, number=len(self.nodes))
+        return node
+
+    def operation(self, op, ctype, left, right=None):
+        key = (op, ctype, left.number, -1 if right is None else right.number)
+        node = self.nodes.get(key)
+        if node is not None and (left.op is not None or right is not None and right.op is not None):
+            return node
+        # A leaf is a register when it is the left operand and a memory
+        # or immediate operand on the right, as in two-address code
+        first = max(left.need, 1)
+        if right is None:
+            need = first
+        else:
+            need = max(first, right.need) if first != right.need else first + 1
+        created = DAGNode(op, ctype, left, right, need=need,
+                          number=len(self.nodes) if node is None else node.number)
+        if node is None:
+            self.nodes[key] = created
+        return created
+
+    def order(self, root):
+        """The operation nodes under root in evaluation order.
+
+        At each node the operand needing more registers is evaluated
+        first, so only its result is held while the other one runs; a
+        node reached again through a shared edge is already computed and
+        is not repeated.
+        """
+        ordered = []
+        seen = set()
+
+        def visit(node):
+            if node.op is None or node in seen:
+                return
+            seen.add(node)
+            if node.right is not None and node.right.need > node.left.need:
+                visit(node.right)
+                visit(node.left)
+            else:
+                visit(node.left)
+                if node.right is not None:
+                    visit(node.right)
+            ordered.append(node)
+
+        visit(root)
+        return ordered
@@ -0,0 +1,222 @@
+# dataflow.py - Worklist dataflow analysis over basic blocks, and the passes built on it
+
+import heapq
+
+from cfg import CFG
+from ir import LOCAL, OP_CALL, TEMP, quad_def, quad_uses
+
+# Sets are Python ints used as bitsets: bit n stands for element n (a
+# value ID for liveness, a definition number for reaching definitions).
+# Union is |, difference is & ~, and the big-int operations work a
+# machine word at a time.
+
+
+def bits(elements):
+    """The bitset of an iterable of element numbers."""
+    result = 0
+    for element in elements:
+        result |= 1 << element
+    return result
+
+
+def members(bitset):
+    """The element numbers in bitset, in increasing order."""
+    result = []
+    while bitset:
+        low = bitset & -bitset
+        result.append(low.bit_length() - 1)
+        bitset ^= low
+    return result
+
+
+# --- Engine ---
+
+def solve(cfg, gen, kill, forward=True):
+    """Solves a union-meet dataflow problem: out = gen | (in & ~kill) per block.
+
+    gen and kill hold one bitset per block. For a forward problem in[b] is
+    the union over predecessors and the result is (in, out) per block; for
+    a backward one the roles of the edges swap, so in[b] holds at the end
+    of block b and out[b] at its start.
+
+    The worklist is a heap keyed by reverse postorder (postorder for
+    backward problems): a block is queued again only when the set flowing
+    into it grows, and the queued block earliest in that order always goes
+    first. A change carried around a loop's back edge therefore settles
+    the loop before it travels on, and the number of passes is bounded by
+    the loop nesting depth rather than the number of loops.
+    """
+    count = len(cfg.blocks)
+    if forward:
+        sources, targets = cfg.predecessors, cfg.successors
+        order = cfg.postorder()[::-1]
+    else:
+        sources, targets = cfg.successors, cfg.predecessors
+        order = cfg.postorder()
+    rank = [0] * count
+    for position, index in enumerate(order):
+        rank[index] = position
+
+    into = [0] * count
+    out = [0] * count
+    worklist = list(range(count))       # ranks; already a heap
+    queued = [True] * count
+    while worklist:
+        index = order[heapq.heappop(worklist)]
+        queued[index] = False
+        entering = 0
+        for source in sources[index]:
+            entering |= out[source]
+        into[index] = entering
+        leaving = gen[index] | (entering & ~kill[index])
+        if leaving != out[index]:
+            out[index] = leaving
+            for target in targets[index]:
+                if not queued[target]:
+                    queued[target] = True
+                    heapq.heappush(worklist, rank[target])
+    return into, out
+
+
+# --- Analyses ---
+
+def tracked_values(function):
+    """One flag per value: locals and temps are analysed, globals and constants are not."""
+    return [value.kind == LOCAL or value.kind == TEMP for value in function.values]
+
+
+def block_uses(function, cfg):
+    """(exposed, defined) per block: the bitset of values read before any
+    write in the block, and the set of values the block writes."""
+    quads = function.quads
+    tracked = tracked_values(function)
+    exposed = []
+    defined = []
+    for first, last in cfg.blocks:
+        used = 0
+        written = set()
+        for quad in quads[first:last]:
+            for value_id in quad_uses(quad):
+                if tracked[value_id] and value_id not in written:
+                    used |= 1 << value_id
+            dest = quad_def(quad)
+            if dest >= 0 and tracked[dest]:
+                written.add(dest)
+        exposed.append(used)
+        defined.append(written)
+    return exposed, defined
+
+
+def crossing_values(exposed):
+    """The values some block reads before writing: the only ones live across a block boundary.
+
+    Most temps are read only in the block that writes them; leaving them
+    out keeps the bitsets as wide as the few values that cross blocks
+    rather than all the temps.
+    """
+    crossing = 0
+    for used in exposed:
+        crossing |= used
+    return crossing
+
+
+def live_variables(function, cfg=None):
+    """Liveness as (cfg, live_in, live_out): bitsets of value IDs per block.
+
+    A value is live at a point if some path from there reads it before
+    writing it. Only locals and temps are tracked; globals are always
+    considered live.
+    """
+    cfg = cfg or CFG(function.quads)
+    gen, defined = block_uses(function, cfg)
+    crossing = crossing_values(gen)
+    kill = [bits(value_id for value_id in written if crossing >> value_id & 1) for written in defined]
+    live_out, live_in = solve(cfg, gen, kill, forward=False)
+    return cfg, live_in, live_out
+
+
+class ReachingDefinitions:
+    """Which definitions of each local and temp may reach each block.
+
+    Definition n is the quad definitions[n] (an index into the quads);
+    reach_in[b] and reach_out[b] are bitsets of definition numbers.
+    Parameters get an implicit definition at the start of the entry block,
+    numbered after the quads' definitions. Only the values some block
+    reads before writing are numbered (see crossing_values); a definition
+    of any other value reaches only the rest of its own block.
+    """
+
+    __slots__ = ('cfg', 'definitions', 'defined_value', 'reach_in', 'reach_out')
+
+    def __init__(self, function, cfg=None):
+        self.cfg = cfg = cfg or CFG(function.quads)
+        quads = function.quads
+        crossing = crossing_values(block_uses(function, cfg)[0])
+        self.definitions = []
+        self.defined_value = []
+        for i, quad in enumerate(quads):
+            dest = quad_def(quad)
+            if dest >= 0 and crossing >> dest & 1:
+                self.definitions.append(i)
+                self.defined_value.append(dest)
+        entry = bits(range(len(self.definitions), len(self.definitions) + len(function.params)))
+        self.defined_value.extend(function.params)
+
+        # All the definitions of each value: a new definition kills them
+        of_value = {}
+        for number, value_id in enumerate(self.defined_value):
+            of_value[value_id] = of_value.get(value_id, 0) | 1 << number
+
+        number_of = {quad_index: number for number, quad_index in enumerate(self.definitions)}
+        gen = []
+        kill = []
+        for index, (first, last) in enumerate(cfg.blocks):
+            generated = entry if index == 0 else 0
+            killed = 0
+            for i in range(first, last):
+                number = number_of.get(i)
+                if number is not None:
+                    every = of_value[self.defined_value[number]]
+                    killed |= every
+                    generated = (generated & ~every) | 1 << number
+            gen.append(generated)
+            kill.append(killed)
+        self.reach_in, self.reach_out = solve(cfg, gen, kill, forward=True)
+
+
+# --- Dead Code ---
+
+def eliminate_dead_code(function):
+    """Deletes assignments to locals and temps whose value no path reads.
+
+    Each block is walked backwards from its live-out set; a quad that
+    writes a value not live after it is dead (a call keeps the call and
+    drops only its result). Deleting a quad can make the values it read
+    dead in other blocks, so liveness is recomputed until nothing changes.
+    Returns the number of quads removed.
+    """
+    tracked = tracked_values(function)
+    removed = 0
+    while True:
+        quads = function.quads
+        cfg, _, live_out = live_variables(function)
+        dead = set()
+        for index, (first, last) in enumerate(cfg.blocks):
+            live = set(members(live_out[index]))
+            for i in range(last - 1, first - 1, -1):
+                quad = quads[i]
+                dest = quad_def(quad)
+                if dest >= 0 and tracked[dest]:
+                    if dest not in live:
+                        if quad.op != OP_CALL:
+                            dead.add(i)
+                            continue
+                        quad.dest = -1      # the call itself still happens
+                    live.discard(dest)
+                for value_id in quad_uses(quad):
+                    if tracked[value_id]:
+                        live.add(value_id)
+        if not dead:
+            return removed
+        removed += len(dead)
+        function.quads = [quad for i, quad in enumerate(quads) if i not in dead]
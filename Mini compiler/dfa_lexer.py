@@ -0,0 +1,468 @@
+# dfa_lexer.py - Table-driven DFA lexer generated from token_specification
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from lexer import RULE_KINDS, TK_ID, TK_KEYWORD, TokenBuffer, token_specification
+
+# Bump when the table layout or the construction changes, so stale cache
+# files are not reused.
+GENERATOR_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.lexer_cache')
+
+# Input bytes are mapped to symbols 0..128: ASCII is itself and every
+# non-ASCII byte becomes OTHER, which only '.' matches.
+OTHER = 128
+ALPHABET = range(OTHER + 1)
+
+# A rule written as \b(word|word|...)\b is a keyword list. Keywords are not
+# compiled into the DFA; identifiers are checked against a perfect hash.
+KEYWORD_RULE = re.compile(r'^\\b\((\w+(?:\|\w+)*)\)\\b$')
+
+
+# --- 1. Regex Subset Parser ---
+
+ESCAPES = {
+    'd': frozenset(range(ord('0'), ord('9') + 1)),
+    's': frozenset(map(ord, ' \t\n\r\f\v')),
+    'w': frozenset(map(ord, 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')),
+}
+ANY = frozenset(ALPHABET) - {ord('\n')}
+
+
+class RegexParser:
+    """Parses the regex subset used by token_specification into a small AST.
+
+    Supported: literals, escapes (\\d \\s \\w and escaped punctuation), '.',
+    character classes with ranges, groups, '|', '*', '+', '?' and {m,n}.
+    AST nodes are tuples: ('chars', set), ('cat', [..]), ('alt', [..]),
+    ('repeat', node, min, max) with max None for unbounded.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.pos = 0
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.pos != len(self.pattern):
+            raise ValueError(f"Unexpected '{self.pattern[self.pos]}' in pattern {self.pattern!r}")
+        return node
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def take(self):
+        char = self.pattern[self.pos]
+        self.pos += 1
+        return char
+
+    def parse_alt(self):
+        branches = [self.parse_cat()]
+        while self.peek() == '|':
+            self.take()
+            branches.append(self.parse_cat())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def parse_cat(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.parse_repeat())
+        return items[0] if len(items) == 1 else ('cat', items)
+
+    def parse_repeat(self):
+        node = self.parse_atom()
+        while True:
+            char = self.peek()
+            if char == '*':
+                self.take()
+                node = ('repeat', node, 0, None)
+            elif char == '+':
+                self.take()
+                node = ('repeat', node, 1, None)
+            elif char == '?':
+                self.take()
+                node = ('repeat', node, 0, 1)
+            elif char == '{':
+                self.take()
+                end = self.pattern.index('}', self.pos)
+                bounds = self.pattern[self.pos:end].split(',')
+                self.pos = end + 1
+                low = int(bounds[0])
+                high = low if len(bounds) == 1 else (int(bounds[1]) if bounds[1] else None)
+                node = ('repeat', node, low, high)
+            else:
+                return node
+
+    def parse_atom(self):
+        char = self.take()
+        if char == '(':
+            if self.pattern.startswith('?:', self.pos):
+                self.pos += 2
+            node = self.parse_alt()
+            if self.peek() != ')':
+                raise ValueError(f"Missing ')' in pattern {self.pattern!r}")
+            self.take()
+            return node
+        if char == '[':
+            return ('chars', self.parse_class())
+        if char == '.':
+            return ('chars', ANY)
+        if char == '\\':
+            return ('chars', self.parse_escape())
+        return ('chars', frozenset([ord(char)]))
+
+    def parse_escape(self):
+        char = self.take()
+        if char in ESCAPES:
+            return ESCAPES[char]
+        if char.isalnum():
+            raise ValueError(f"Unsupported escape '\\{char}' in pattern {self.pattern!r}")
+        return frozenset([ord(char)])
+
+    def parse_class(self):
+        negate = self.peek() == '^'
+        if negate:
+            self.take()
+        chars = set()
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            char = self.take()
+            if char == '\\':
+                low = self.parse_escape()
+            else:
+                low = frozenset([ord(char)])
+            if self.peek() == '-' and self.pattern[self.pos + 1] != ']' and len(low) == 1:
+                self.take()
+                high = self.take()
+                if high == '\\':
+                    high = chr(next(iter(self.parse_escape())))
+                chars.update(range(next(iter(low)), ord(high) + 1))
+            else:
+                chars.update(low)
+        self.take()
+        return frozenset(ALPHABET) - chars if negate else frozenset(chars)
+
+
+# --- 2. NFA (Thompson Construction) ---
+
+class NFA:
+    """Thompson NFA: per-state epsilon lists and (charset, target) edges."""
+
+    def __init__(self):
+        self.eps = []
+        self.edges = []
+        self.accept = {}
+
+    def new_state(self):
+        self.eps.append([])
+        self.edges.append([])
+        return len(self.eps) - 1
+
+    def build(self, node):
+        """Adds node to the NFA and returns its (start, end) states."""
+        kind = node[0]
+        start = self.new_state()
+        if kind == 'chars':
+            end = self.new_state()
+            self.edges[start].append((node[1], end))
+        elif kind == 'cat':
+            end = start
+            for item in node[1]:
+                s, e = self.build(item)
+                self.eps[end].append(s)
+                end = e
+        elif kind == 'alt':
+            end = self.new_state()
+            for branch in node[1]:
+                s, e = self.build(branch)
+                self.eps[start].append(s)
+                self.eps[e].append(end)
+        else:
+            _, item, low, high = node
+            end = start
+            for _ in range(low):
+                s, e = self.build(item)
+                self.eps[end].append(s)
+                end = e
+            if high is None:
+                s, e = self.build(item)
+                self.eps[end].append(s)
+                self.eps[e].append(s)
+                tail = self.new_state()
+                self.eps[end].append(tail)
+                self.eps[e].append(tail)
+                end = tail
+            else:
+                tail = self.new_state()
+                for _ in range(high - low):
+                    self.eps[end].append(tail)
+                    s, e = self.build(item)
+                    self.eps[end].append(s)
+                    end = e
+                self.eps[end].append(tail)
+                end = tail
+        return start, end
+
+    def closure(self, states):
+        stack = list(states)
+        seen = set(states)
+        while stack:
+            for target in self.eps[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+
+# --- 3. DFA Construction, Minimization and Keyword Hash ---
+
+def split_specification(spec):
+    """Separates keyword-list rules from the rules compiled into the DFA."""
+    keywords = []
+    rules = []
+    for name, pattern in spec:
+        match = KEYWORD_RULE.match(pattern)
+        if match:
+            keywords.extend(match.group(1).split('|'))
+        else:
+            rules.append((name, pattern))
+    return keywords, rules
+
+
+def symbol_classes(nfa):
+    """Groups alphabet symbols that every NFA edge treats the same way."""
+    charsets = list({cs for edges in nfa.edges for cs, _ in edges})
+    signatures = {}
+    classmap = []
+    for symbol in ALPHABET:
+        signature = tuple(symbol in cs for cs in charsets)
+        classmap.append(signatures.setdefault(signature, len(signatures)))
+    return classmap, len(signatures)
+
+
+def subset_construction(nfa, start, classmap, n_classes):
+    """Returns (transitions, accept) of the DFA; -1 is the dead state."""
+    representative = {}
+    for symbol, cls in enumerate(classmap):
+        representative.setdefault(cls, symbol)
+
+    start_set = nfa.closure([start])
+    index = {start_set: 0}
+    worklist = [start_set]
+    transitions = []
+    accept = []
+
+    while worklist:
+        current = worklist.pop()
+        state = index[current]
+        while len(transitions) <= state:
+            transitions.append(None)
+            accept.append(-1)
+
+        rules = [nfa.accept[s] for s in current if s in nfa.accept]
+        accept[state] = min(rules) if rules else -1
+
+        row = []
+        for cls in range(n_classes):
+            symbol = representative[cls]
+            moved = [target for s in current for cs, target in nfa.edges[s] if symbol in cs]
+            if not moved:
+                row.append(-1)
+                continue
+            target_set = nfa.closure(moved)
+            if target_set not in index:
+                index[target_set] = len(index)
+                worklist.append(target_set)
+            row.append(index[target_set])
+        transitions[state] = row
+
+    return transitions, accept
+
+
+def minimize(transitions, accept):
+    """Moore partition refinement; returns the minimized (transitions, accept).
+
+    States start out grouped by the rule they accept and are split until
+    every state in a block moves to the same blocks on every symbol class.
+    The start state (0) stays state 0.
+    """
+    block_of = list(accept)
+    n_blocks = len(set(block_of))
+    while True:
+        signatures = {}
+        new_block_of = []
+        for state, row in enumerate(transitions):
+            signature = (block_of[state],) + tuple(block_of[t] if t >= 0 else None for t in row)
+            new_block_of.append(signatures.setdefault(signature, len(signatures)))
+        block_of = new_block_of
+        if len(signatures) == n_blocks:
+            break
+        n_blocks = len(signatures)
+
+    # Renumber blocks in first-seen order so the start state stays 0.
+    order = {}
+    for block in block_of:
+        order.setdefault(block, len(order))
+    new_transitions = [None] * len(order)
+    new_accept = [-1] * len(order)
+    for state, row in enumerate(transitions):
+        block = order[block_of[state]]
+        new_transitions[block] = [order[block_of[t]] if t >= 0 else -1 for t in row]
+        new_accept[block] = accept[state]
+    return new_transitions, new_accept
+
+
+def keyword_hash(word, a, b, m):
+    return (ord(word[0]) * a + ord(word[-1]) * b + len(word)) % m
+
+
+def perfect_hash(keywords):
+    """Finds (a, b, m) such that keyword_hash is collision-free on keywords."""
+    for m in range(len(keywords), 8 * len(keywords) + 1):
+        for a in range(1, 64):
+            for b in range(0, 64):
+                slots = {keyword_hash(word, a, b, m) for word in keywords}
+                if len(slots) == len(keywords):
+                    table = [None] * m
+                    for word in keywords:
+                        table[keyword_hash(word, a, b, m)] = word
+                    return {'a': a, 'b': b, 'm': m, 'table': table}
+    raise ValueError("No perfect hash found for the keyword set")
+
+
+def build_tables(spec=token_specification):
+    """Compiles a token specification into minimized DFA lexer tables."""
+    keywords, rules = split_specification(spec)
+
+    nfa = NFA()
+    start = nfa.new_state()
+    for rule, (name, pattern) in enumerate(rules):
+        s, e = nfa.build(RegexParser(pattern).parse())
+        nfa.eps[start].append(s)
+        nfa.accept[e] = rule
+
+    classmap, n_classes = symbol_classes(nfa)
+    transitions, accept = minimize(*subset_construction(nfa, start, classmap, n_classes))
+
+    return {
+        'version': GENERATOR_VERSION,
+        'rules': [name for name, _ in rules],
+        'classmap': classmap,
+        'n_classes': n_classes,
+        'transitions': [t for row in transitions for t in row],
+        'accept': accept,
+        'keywords': perfect_hash(keywords) if keywords else None,
+    }
+
+
+# --- 4. On-Disk Table Cache ---
+
+def specification_key(spec):
+    """Hash of the specification and generator version naming the cache file."""
+    text = json.dumps([GENERATOR_VERSION, [list(pair) for pair in spec]])
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:20]
+
+
+def load_tables(spec=token_specification, cache_dir=DEFAULT_CACHE_DIR):
+    """Returns the tables for spec, building and caching them on a miss."""
+    path = os.path.join(cache_dir, f"dfa-{specification_key(spec)}.json")
+    try:
+        with open(path, 'r') as file:
+            tables = json.load(file)
+        if tables.get('version') == GENERATOR_VERSION:
+            return tables
+    except (OSError, ValueError):
+        pass
+
+    tables = build_tables(spec)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(tables, file)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only install still works; it just rebuilds every start.
+        pass
+    return tables
+
+
+# --- 5. Table-Driven Lexer ---
+
+class DFALexer:
+    """Longest-match lexer driven by precomputed DFA tables.
+
+    Produces the same TokenBuffer as lexer.tokenize. Ties between rules of
+    equal length go to the earlier rule in the specification.
+    """
+
+    def __init__(self, spec=token_specification, cache_dir=DEFAULT_CACHE_DIR):
+        tables = load_tables(spec, cache_dir)
+        n_classes = tables['n_classes']
+        flat = tables['transitions']
+        self.rows = [tuple(flat[i:i + n_classes]) for i in range(0, len(flat), n_classes)]
+        self.accept = tuple(tables['accept'])
+
+        classmap = tables['classmap']
+        self.byte_classes = bytes(classmap[b] if b < OTHER else classmap[OTHER] for b in range(256))
+
+        self.kinds = [RULE_KINDS[name] for name in tables['rules']]
+
+        keywords = tables['keywords'] or {'a': 1, 'b': 0, 'm': 1, 'table': [None]}
+        self.kw_a, self.kw_b, self.kw_m = keywords['a'], keywords['b'], keywords['m']
+        self.kw_table = keywords['table']
+
+    def is_keyword(self, word):
+        return self.kw_table[keyword_hash(word, self.kw_a, self.kw_b, self.kw_m)] == word
+
+    def tokenize(self, c_code):
+        """Splits C code into a TokenBuffer."""
+        # latin-1 with replacement keeps one byte per character, so byte
+        # positions are also offsets into c_code. Characters outside it
+        # become '?', which, like OTHER, only '.' matches.
+        data = c_code.encode('latin-1', 'replace')
+        classes = data.translate(self.byte_classes)
+        rows = self.rows
+        accept = self.accept
+        kinds = self.kinds
+        kw_table, kw_a, kw_b, kw_m = self.kw_table, self.kw_a, self.kw_b, self.kw_m
+
+        tokens = TokenBuffer(c_code)
+        append = tokens.append
+        pos = 0
+        n = len(data)
+
+        while pos < n:
+            state = 0
+            i = pos
+            rule = -1
+            end = pos
+            while i < n:
+                state = rows[state][classes[i]]
+                if state < 0:
+                    break
+                i += 1
+                if accept[state] >= 0:
+                    rule = accept[state]
+                    end = i
+
+            if rule < 0:
+                # Unmatched character: skip it, as re.finditer does.
+                pos += 1
+                continue
+
+            kind = kinds[rule]
+            if kind is not None:
+                if kind == TK_ID:
+                    value = c_code[pos:end]
+                    if kw_table[(ord(value[0]) * kw_a + ord(value[-1]) * kw_b + len(value)) % kw_m] == value:
+                        kind = TK_KEYWORD
+                append(kind, pos, end)
+            pos = end
+
+        return tokens
@@ -0,0 +1,60 @@
+# folding.py - Compile-time arithmetic on constants, with the target's int and float semantics
+
+import struct
+
+from ir import ARITHMETIC_OPS, OP_ADD, OP_DIV, OP_EQ, OP_GE, OP_GT, OP_LE, OP_LT, OP_MUL, OP_NE, OP_SUB, is_float
+
+
+def parse_constant(text, ctype='int'):
+    if '.' not in text:
+        return int(text)
+    return single(float(text)) if ctype == 'float' else float(text)
+
+
+def single(number):
+    """number rounded to single precision, as a float variable holds it."""
+    try:
+        return struct.unpack('<f', struct.pack('<f', number))[0]
+    except OverflowError:
+        return float('inf') if number > 0 else float('-inf')
+
+
+def wrap_int(value):
+    """Truncates to a signed 32-bit int, as the target's registers do."""
+    value = int(value) & 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def format_constant(number, ctype):
+    """The literal text for number as a constant of ctype, or None if it has none."""
+    if is_float(ctype):
+        text = repr(single(number) if ctype == 'float' else float(number))
+        return text if '.' in text and 'e' not in text else None
+    if isinstance(number, float) and not -2.0 ** 31 <= number < 2.0 ** 31:
+        return None     # out of range: left to the conversion instruction
+    return str(wrap_int(number))
+
+
+def fold_binary(op, left, right, ctype):
+    """left op right for constants, or None if it cannot be folded."""
+    if op in ARITHMETIC_OPS and not is_float(ctype):
+        left, right = int(left), int(right)
+    if op == OP_ADD:
+        result = left + right
+    elif op == OP_SUB:
+        result = left - right
+    elif op == OP_MUL:
+        result = left * right
+    elif op == OP_DIV:
+        if right == 0:
+            return None
+        if is_float(ctype):
+            result = left / right
+        else:
+            # C division truncates toward zero
+            result = abs(left) // abs(right)
+            result = -result if (left < 0) != (right < 0) else result
+    else:
+        result = int({OP_EQ: left == right, OP_NE: left != right, OP_LT: left < right,
+                      OP_GT: left > right, OP_LE: left <= right, OP_GE: left >= right}[op])
+    return format_constant(result, ctype)
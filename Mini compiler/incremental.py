@@ -0,0 +1,45 @@
+# incremental.py - Fingerprinting the top-level items of a unit
+
+import hashlib
+
+from lexer import TK_SEPARATOR
+
+# Prefix for per-item keys in the CompileCache, so they never collide with
+# whole-file entries.
+ITEM_KEY_PREFIX = 'item:'
+
+
+def body_start(tokens, first, last):
+    """Index of the '{' opening a function body in the item, or None."""
+    for i in range(first, last):
+        if tokens.kinds[i] == TK_SEPARATOR and tokens.value(i) == '{':
+            return i
+    return None
+
+
+def _token_text(tokens, first, last):
+    # Kinds and lexemes only: whitespace and comment edits do not change it.
+    return '\x00'.join(f"{tokens.kinds[i]}{tokens.value(i)}" for i in range(first, last)).encode('utf-8')
+
+
+def fingerprints(tokens, items):
+    """One hex fingerprint per item.
+
+    A function's code depends on the declarations around it, so every
+    fingerprint also covers the shared context: all non-function items and
+    every function signature. Editing a function body changes only that
+    function's fingerprint; editing a global or a signature changes all.
+    """
+    context = hashlib.blake2b(digest_size=16)
+    for first, last in items:
+        brace = body_start(tokens, first, last)
+        context.update(_token_text(tokens, first, last if brace is None else brace))
+        context.update(b'\x01')
+    context_digest = context.digest()
+
+    result = []
+    for first, last in items:
+        digest = hashlib.blake2b(context_digest, digest_size=16)
+        digest.update(_token_text(tokens, first, last))
+        result.append(digest.hexdigest())
+    return result
@@ -0,0 +1,223 @@
+# inline.py - Call graph, and inlining small functions into their callers
+
+import collections
+
+from dataflow import live_variables, members
+from ir import (CONST, GLOBAL, OP_CALL, OP_COPY, OP_IFFALSE, OP_JUMP, OP_LABEL, OP_PARAM, OP_RETURN, TEMP, Quad,
+                is_float)
+from optimizer import optimize
+
+# A callee is inlined only if it makes no calls and its body has at most
+# this many quads, labels not counted
+MAX_CALLEE_SIZE = 24
+# Inlining may grow a caller to GROWTH_FACTOR times its size, or by one
+# callee of MAX_CALLEE_SIZE if that is more
+GROWTH_FACTOR = 2.0
+
+InlinedCall = collections.namedtuple('InlinedCall', 'caller callee site quads')
+
+
+def function_size(function):
+    return sum(1 for quad in function.quads if quad.op != OP_LABEL)
+
+
+# --- Call Graph ---
+
+class CallGraph:
+    """Which of a unit's functions call which.
+
+    callees[name] is the set of defined functions name calls; calls to
+    undeclared functions are left out. components lists the strongly
+    connected components callees first (Tarjan's algorithm), and
+    recursive holds every function on a cycle, including one that calls
+    itself.
+    """
+
+    def __init__(self, functions):
+        self.functions = {function.name: function for function in functions}
+        self.callees = {}
+        for function in functions:
+            self.callees[function.name] = {function.values[quad.src1].name for quad in function.quads
+                                           if quad.op == OP_CALL} & self.functions.keys()
+        self.components = self.strongly_connected()
+        self.recursive = set()
+        for component in self.components:
+            if len(component) > 1 or component[0] in self.callees[component[0]]:
+                self.recursive.update(component)
+
+    def strongly_connected(self):
+        """Tarjan's algorithm with an explicit stack; components come out callees first."""
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in self.functions:
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self.callees[root])))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                name, successors = work[-1]
+                for callee in successors:
+                    if callee not in index:
+                        index[callee] = low[callee] = len(index)
+                        stack.append(callee)
+                        on_stack.add(callee)
+                        work.append((callee, iter(sorted(self.callees[callee]))))
+                        break
+                    if callee in on_stack:
+                        low[name] = min(low[name], index[callee])
+                else:
+                    work.pop()
+                    if work:
+                        caller = work[-1][0]
+                        low[caller] = min(low[caller], low[name])
+                    if low[name] == index[name]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == name:
+                                break
+                        components.append(component)
+        return components
+
+
+# --- Inlining ---
+
+def call_arguments(quads, count):
+    """Indexes into quads of the PARAMs passing the arguments of a CALL appended next, in order.
+
+    The PARAMs belonging to calls in between are skipped. None if they do
+    not all sit in the same basic block as the call.
+    """
+    found = []
+    skip = 0
+    for j in range(len(quads) - 1, -1, -1):
+        if len(found) == count:
+            break
+        op = quads[j].op
+        if op == OP_CALL:
+            skip += quads[j].src2
+        elif op == OP_PARAM:
+            if skip:
+                skip -= 1
+            else:
+                found.append(j)
+        elif op in (OP_LABEL, OP_JUMP, OP_IFFALSE, OP_RETURN):
+            break
+    return found[::-1] if len(found) == count else None
+
+
+def expand_call(caller, quads, call, callee):
+    """Appends callee's body to quads in place of call; False if the call cannot be inlined.
+
+    The PARAMs become copies into the callee's parameters where they
+    stand, so the arguments are still read when the call would have read
+    them. Every local, temp and label of the callee gets a fresh copy in
+    the caller; a return becomes a copy into the call's destination and a
+    jump past the body. Locals some path reads before writing start at
+    zero, as they do in a new frame.
+    """
+    if call.src2 != len(callee.params):
+        return False
+    arguments = call_arguments(quads, call.src2)
+    if arguments is None:
+        return False
+
+    mapping = {}
+    for value in callee.values:
+        if value.kind == CONST:
+            mapping[value.id] = caller.constant(value.name, value.ctype)
+        elif value.kind == GLOBAL:
+            mapping[value.id] = caller.global_value(value.name, value.ctype, value.symbol)
+        elif value.kind == TEMP:
+            mapping[value.id] = caller.new_temp(value.ctype)
+        else:
+            mapping[value.id] = caller.inlined_local(f"{callee.name}.{value.name}.{len(caller.values)}",
+                                                     value.ctype, value.symbol)
+    mapping[-1] = -1
+    labels = {}
+    for quad in callee.quads:
+        if quad.op == OP_LABEL:
+            labels[quad.dest] = caller.new_label()
+    end = caller.new_label()
+
+    for j, param in zip(arguments, callee.params):
+        quads[j] = Quad(OP_COPY, mapping[param], quads[j].src1)
+    _, live_in, _ = live_variables(callee)
+    for value_id in members(live_in[0]) if live_in else ():
+        if value_id not in callee.params:
+            zero = '0.0' if is_float(callee.values[value_id].ctype) else '0'
+            quads.append(Quad(OP_COPY, mapping[value_id], caller.constant(zero, callee.values[value_id].ctype)))
+
+    for quad in callee.quads:
+        op = quad.op
+        if op == OP_LABEL or op == OP_JUMP:
+            quads.append(Quad(op, labels[quad.dest]))
+        elif op == OP_IFFALSE:
+            quads.append(Quad(op, labels[quad.dest], mapping[quad.src1]))
+        elif op == OP_RETURN:
+            if call.dest >= 0:
+                if quad.src1 >= 0:
+                    result = mapping[quad.src1]
+                else:
+                    ctype = caller.values[call.dest].ctype
+                    result = caller.constant('0.0' if is_float(ctype) else '0', ctype)
+                quads.append(Quad(OP_COPY, call.dest, result))
+            quads.append(Quad(OP_JUMP, end))
+        else:
+            quads.append(Quad(op, mapping[quad.dest], mapping[quad.src1], mapping[quad.src2]))
+    quads.append(Quad(OP_LABEL, end))
+    return True
+
+
+def inline_functions(functions, callers=None):
+    """Inlines small leaf functions into their callers; returns the InlinedCall sites.
+
+    Functions are visited callees first along the call graph, so a
+    function whose own calls have all been inlined is a leaf by the time
+    its callers are considered. A call is inlined when the callee is
+    defined, not recursive, makes no calls, has at most MAX_CALLEE_SIZE
+    quads, and the caller stays within its growth budget. Only the
+    functions named in callers (default: all) are changed; each one that
+    is gets the optimizer run over it again, so constants passed as
+    arguments are folded through the inlined body and what it leaves
+    dead is removed.
+    """
+    graph = CallGraph(functions)
+    report = []
+    for component in graph.components:
+        for name in component:
+            if callers is not None and name not in callers:
+                continue
+            function = graph.functions[name]
+            size = function_size(function)
+            budget = max(int(size * GROWTH_FACTOR), size + MAX_CALLEE_SIZE)
+            quads = []
+            site = 0
+            inlined = []
+            for quad in function.quads:
+                if quad.op != OP_CALL:
+                    quads.append(quad)
+                    continue
+                site += 1
+                callee = graph.functions.get(function.values[quad.src1].name)
+                if callee is not None and callee.name not in graph.recursive and callee is not function \
+                        and not any(q.op == OP_CALL for q in callee.quads):
+                    callee_size = function_size(callee)
+                    if callee_size <= MAX_CALLEE_SIZE and size + callee_size <= budget \
+                            and expand_call(function, quads, quad, callee):
+                        size += callee_size
+                        inlined.append(InlinedCall(name, callee.name, site, callee_size))
+                        continue
+                quads.append(quad)
+            if inlined:
+                function.quads = quads
+                optimize(function)
+                report.extend(inlined)
+    return report
@@ -0,0 +1,276 @@
+# ir.py - Quadruple intermediate representation for three-address code
+
+# --- Opcodes ---
+# Field use per opcode (-1 = unused); value fields hold IDs into
+# IRFunction.values, label fields hold label numbers.
+#   LABEL    dest=label
+#   JUMP     dest=label
+#   IFFALSE  dest=label   src1=condition
+#   COPY     dest         src1
+#   ADD..GE  dest         src1  src2
+#   NEG/NOT  dest         src1
+#   PARAM                 src1=argument
+#   CALL     dest or -1   src1=function  src2=argument count
+#   RETURN                src1=value or -1
+(OP_LABEL, OP_JUMP, OP_IFFALSE, OP_COPY,
+ OP_ADD, OP_SUB, OP_MUL, OP_DIV,
+ OP_EQ, OP_NE, OP_LT, OP_GT, OP_LE, OP_GE,
+ OP_NEG, OP_NOT, OP_PARAM, OP_CALL, OP_RETURN) = range(19)
+
+# Source operator <-> opcode
+BINARY_OPCODES = {'+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV,
+                  '==': OP_EQ, '!=': OP_NE, '<': OP_LT, '>': OP_GT, '<=': OP_LE, '>=': OP_GE}
+UNARY_OPCODES = {'-': OP_NEG, '!': OP_NOT}
+OPERATOR_TEXT = {opcode: text for text, opcode in BINARY_OPCODES.items()}
+OPERATOR_TEXT.update({opcode: text for text, opcode in UNARY_OPCODES.items()})
+
+ARITHMETIC_OPS = frozenset((OP_ADD, OP_SUB, OP_MUL, OP_DIV))
+COMPARE_OPS = frozenset((OP_EQ, OP_NE, OP_LT, OP_GT, OP_LE, OP_GE))
+BINARY_OPS = ARITHMETIC_OPS | COMPARE_OPS
+UNARY_OPS = frozenset((OP_NEG, OP_NOT))
+BLOCK_ENDS = frozenset((OP_JUMP, OP_IFFALSE, OP_RETURN))
+
+# --- Value kinds ---
+LOCAL, TEMP, CONST, GLOBAL = range(4)
+
+FLOAT_TYPES = ('float', 'double')
+
+
+def is_float(ctype):
+    return ctype in FLOAT_TYPES
+
+
+class Value:
+    """An operand: a local variable or parameter, a temp, a constant or a global.
+
+    name is what the textual dump shows; for a CONST it is the literal.
+    symbol is the symbol table ID, or -1 for temps and constants.
+    """
+
+    __slots__ = ('id', 'kind', 'name', 'ctype', 'symbol')
+
+    def __init__(self, id, kind, name, ctype, symbol=-1):
+        self.id = id
+        self.kind = kind
+        self.name = name
+        self.ctype = ctype
+        self.symbol = symbol
+
+    def __repr__(self):
+        return f"Value({self.id}, {self.name!r})"
+
+
+class Quad:
+    __slots__ = ('op', 'dest', 'src1', 'src2')
+
+    def __init__(self, op, dest=-1, src1=-1, src2=-1):
+        self.op = op
+        self.dest = dest
+        self.src1 = src1
+        self.src2 = src2
+
+    def __repr__(self):
+        return f"Quad({self.op}, {self.dest}, {self.src1}, {self.src2})"
+
+
+class IRFunction:
+    """The quads of one function and the table of values they refer to.
+
+    Constants, globals and local symbols are interned, so each has exactly
+    one Value per function and passes can compare operands by ID.
+    """
+
+    __slots__ = ('name', 'params', 'values', 'quads', 'temp_count', 'label_count', '_interned')
+
+    def __init__(self, name):
+        self.name = name
+        self.params = []
+        self.values = []
+        self.quads = []
+        self.temp_count = 0
+        self.label_count = 0
+        self._interned = {}
+
+    # --- Values ---
+
+    def _value(self, kind, name, ctype, symbol=-1):
+        value = Value(len(self.values), kind, name, ctype, symbol)
+        self.values.append(value)
+        return value.id
+
+    def new_temp(self, ctype):
+        self.temp_count += 1
+        return self._value(TEMP, f"t{self.temp_count}", ctype)
+
+    def new_local(self, name, ctype, symbol):
+        value_id = self._value(LOCAL, name, ctype, symbol)
+        self._interned[('symbol', symbol)] = value_id
+        return value_id
+
+    def local(self, symbol):
+        """The value ID of an already-declared local symbol, or None."""
+        return self._interned.get(('symbol', symbol))
+
+    def new_version(self, value_id):
+        """A fresh value of the same kind and type as value_id, for another
+        of its definitions in SSA form. Versions of a local are named x.N."""
+        value = self.values[value_id]
+        if value.kind == TEMP:
+            return self.new_temp(value.ctype)
+        return self._value(value.kind, f"{value.name}.{len(self.values)}", value.ctype, value.symbol)
+
+    def inlined_local(self, name, ctype, symbol):
+        """A local standing for one inlined copy of another function's local.
+
+        Unlike new_local it is not interned: a function inlined twice gets
+        two copies of each of its locals.
+        """
+        return self._value(LOCAL, name, ctype, symbol)
+
+    def global_value(self, name, ctype, symbol=-1):
+        key = ('global', name)
+        value_id = self._interned.get(key)
+        if value_id is None:
+            value_id = self._interned[key] = self._value(GLOBAL, name, ctype, symbol)
+        return value_id
+
+    def constant(self, text, ctype):
+        key = ('const', text)
+        value_id = self._interned.get(key)
+        if value_id is None:
+            value_id = self._interned[key] = self._value(CONST, text, ctype)
+        return value_id
+
+    def new_label(self):
+        self.label_count += 1
+        return self.label_count
+
+    def emit(self, op, dest=-1, src1=-1, src2=-1):
+        self.quads.append(Quad(op, dest, src1, src2))
+
+    def compact(self):
+        """Drops values no quad refers to any more and renumbers the temps.
+
+        Value IDs are reassigned densely; parameters and declared locals are
+        kept, SSA versions of a local only while some quad refers to them.
+        """
+        referenced = set(self.params)
+        referenced.update(value_id for key, value_id in self._interned.items() if key[0] == 'symbol')
+        for quad in self.quads:
+            referenced.update(quad_uses(quad))
+            if quad_def(quad) >= 0:
+                referenced.add(quad.dest)
+            if quad.op == OP_CALL:
+                referenced.add(quad.src1)
+
+        mapping = {}
+        values = []
+        self._interned = {}
+        self.temp_count = 0
+        for value in self.values:
+            if value.id not in referenced:
+                continue
+            mapping[value.id] = value.id = len(values)
+            values.append(value)
+            if value.kind == TEMP:
+                self.temp_count += 1
+                value.name = f"t{self.temp_count}"
+            elif value.kind == LOCAL:
+                self._interned.setdefault(('symbol', value.symbol), value.id)
+            elif value.kind == CONST:
+                self._interned[('const', value.name)] = value.id
+            else:
+                self._interned[('global', value.name)] = value.id
+        self.values = values
+
+        self.params = [mapping[param] for param in self.params]
+        for quad in self.quads:
+            replace_uses(quad, mapping)
+            if quad_def(quad) >= 0:
+                quad.dest = mapping[quad.dest]
+            if quad.op == OP_CALL:
+                quad.src1 = mapping[quad.src1]
+
+    # --- Display ---
+
+    def dump(self):
+        """The textual three-address code, one string per quad."""
+        names = [value.name for value in self.values]
+        lines = [f"{self.name}:"]
+        for quad in self.quads:
+            lines.append(format_quad(quad, names))
+        return lines
+
+
+def format_quad(quad, names):
+    op = quad.op
+    if op == OP_LABEL:
+        return f"L{quad.dest}:"
+    if op == OP_JUMP:
+        return f"goto L{quad.dest}"
+    if op == OP_IFFALSE:
+        return f"ifFalse {names[quad.src1]} goto L{quad.dest}"
+    if op == OP_COPY:
+        return f"{names[quad.dest]} = {names[quad.src1]}"
+    if op in BINARY_OPS:
+        return f"{names[quad.dest]} = {names[quad.src1]} {OPERATOR_TEXT[op]} {names[quad.src2]}"
+    if op in UNARY_OPS:
+        return f"{names[quad.dest]} = {OPERATOR_TEXT[op]} {names[quad.src1]}"
+    if op == OP_PARAM:
+        return f"param {names[quad.src1]}"
+    if op == OP_CALL:
+        call = f"call {names[quad.src1]}, {quad.src2}"
+        return call if quad.dest < 0 else f"{names[quad.dest]} = {call}"
+    if op == OP_RETURN:
+        return "return" if quad.src1 < 0 else f"return {names[quad.src1]}"
+    raise ValueError(f"Unknown opcode {op}")
+
+
+# --- Operand Access ---
+
+def quad_uses(quad):
+    """Value IDs read by quad. A CALL's function is not counted as a use."""
+    op = quad.op
+    if op in BINARY_OPS:
+        return (quad.src1, quad.src2)
+    if op == OP_COPY or op in UNARY_OPS or op == OP_IFFALSE or op == OP_PARAM:
+        return (quad.src1,)
+    if op == OP_RETURN and quad.src1 >= 0:
+        return (quad.src1,)
+    return ()
+
+
+def quad_def(quad):
+    """Value ID written by quad, or -1."""
+    op = quad.op
+    if op == OP_LABEL or op == OP_JUMP or op == OP_IFFALSE:
+        return -1
+    return quad.dest
+
+
+def replace_uses(quad, mapping):
+    """Rewrites the value IDs quad reads through mapping (old ID -> new ID)."""
+    op = quad.op
+    if op in BINARY_OPS:
+        quad.src1 = mapping.get(quad.src1, quad.src1)
+        quad.src2 = mapping.get(quad.src2, quad.src2)
+    elif quad_uses(quad):
+        quad.src1 = mapping.get(quad.src1, quad.src1)
+
+
+# --- Basic Blocks ---
+
+def basic_blocks(quads):
+    """(first, last) index ranges of the basic blocks, last exclusive."""
+    blocks = []
+    first = 0
+    for i, quad in enumerate(quads):
+        if quad.op == OP_LABEL and i > first:
+            blocks.append((first, i))
+            first = i
+        if quad.op in BLOCK_ENDS:
+            blocks.append((first, i + 1))
+            first = i + 1
+    if first < len(quads):
+        blocks.append((first, len(quads)))
+    return blocks
@@ -0,0 +1,194 @@
+# lexer.py - Token specification and lexers shared by the compiler phases
+
+import collections
+import mmap
+import re
+from array import array
+
+KEYWORDS = {'int', 'float', 'void', 'if', 'else', 'while', 'for', 'return'}
+token_specification = [
+    ('COMMENT',       r'//.*'),
+    ('KEYWORD_R',     r'\b(int|float|void|if|else|while|for|return)\b'),
+    ('IDENTIFIER',    r'[a-zA-Z_][a-zA-Z0-9_]*'),
+    ('LITERAL_FLOAT', r'\d+\.\d+'),
+    ('LITERAL_INT',   r'\d+'),
+    ('OPERATOR',      r'==|!=|<=|>=|\+\+|--|\+=|-=|\*=|/=|[+\-*/=><!]'),
+    ('SEPARATOR',     r'[;,(){}]'),
+    ('SKIP',          r'\s+'),
+]
+# KEYWORD_R is left out of the master regex: trying it before IDENTIFIER
+# costs a failed match on every identifier, and identifiers are checked
+# against KEYWORDS anyway.
+tok_pattern = '|'.join('(?P<%s>%s)' % pair for pair in token_specification
+                       if pair[0] != 'KEYWORD_R')
+tok_regex = re.compile(tok_pattern)
+# Same pattern over bytes, so it can scan an mmap without decoding the file.
+# '.' never matches '\n' in either form, so comments stop at end of line.
+tok_regex_bytes = re.compile(tok_pattern.encode('ascii'))
+
+# A positioned token from the streaming lexer. kind is a TK_* code, offset
+# is the byte offset of the lexeme; line and column are 1-based.
+Token = collections.namedtuple('Token', 'kind value offset line column')
+
+
+# Token kind codes stored in TokenBuffer.kinds; KIND_NAMES maps them back.
+KIND_NAMES = ('KEYWORD', 'ID', 'LITERAL', 'OPERATOR', 'SEPARATOR')
+TK_KEYWORD, TK_ID, TK_LITERAL, TK_OPERATOR, TK_SEPARATOR = range(len(KIND_NAMES))
+
+# Specification rule -> kind code; None means the match is discarded.
+RULE_KINDS = {
+    'COMMENT': None,
+    'SKIP': None,
+    'KEYWORD_R': TK_KEYWORD,
+    'IDENTIFIER': TK_ID,
+    'LITERAL_FLOAT': TK_LITERAL,
+    'LITERAL_INT': TK_LITERAL,
+    'OPERATOR': TK_OPERATOR,
+    'SEPARATOR': TK_SEPARATOR,
+}
+
+
+class TokenBuffer:
+    """Compact token store: parallel arrays over the source text.
+
+    Each token costs one byte of kind code and two 4-byte offsets; the
+    lexeme is only sliced out of the source when value() is called.
+    """
+
+    __slots__ = ('source', 'kinds', 'starts', 'ends')
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def append(self, kind, start, end):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield TokenView(self, index)
+
+    def kind(self, index):
+        return self.kinds[index]
+
+    def value(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def match(self, index, kind, value):
+        """True if token index has the given kind code and lexeme."""
+        return (self.kinds[index] == kind
+                and self.ends[index] - self.starts[index] == len(value)
+                and self.source.startswith(value, self.starts[index]))
+
+    def nbytes(self):
+        """Memory held by the token arrays, excluding the source text."""
+        return sum(a.buffer_info()[1] * a.itemsize for a in (self.kinds, self.starts, self.ends))
+
+
+class TokenView:
+    """Lightweight handle on one token of a TokenBuffer."""
+
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.buffer.kinds[self.index]
+
+    @property
+    def name(self):
+        return KIND_NAMES[self.buffer.kinds[self.index]]
+
+    @property
+    def value(self):
+        return self.buffer.value(self.index)
+
+    @property
+    def start(self):
+        return self.buffer.starts[self.index]
+
+    @property
+    def end(self):
+        return self.buffer.ends[self.index]
+
+    def __repr__(self):
+        return f"TokenView({self.name}, {self.value!r})"
+
+
+def tokenize(c_code):
+    """Splits C code into a TokenBuffer in one regex scan."""
+    tokens = TokenBuffer(c_code)
+    kinds = tokens.kinds
+    starts = tokens.starts
+    ends = tokens.ends
+
+    for mo in tok_regex.finditer(c_code):
+        kind = RULE_KINDS[mo.lastgroup]
+        if kind is None:
+            continue
+        if kind == TK_ID and mo.group() in KEYWORDS:
+            kind = TK_KEYWORD
+        start, end = mo.span()
+        kinds.append(kind)
+        starts.append(start)
+        ends.append(end)
+
+    return tokens
+
+
+def stream_tokens(file_path="input.txt"):
+    """Lazily yields positioned Tokens from a memory-mapped source file.
+
+    Nothing but the current match is held in memory, so arbitrarily large
+    files are lexed in constant space and a consumer can start working
+    before the end of the file has been reached. Newlines can only occur
+    inside whitespace, so line numbers are tracked from SKIP matches alone.
+    """
+    with open(file_path, 'rb') as file:
+        try:
+            source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files; an empty file has no tokens.
+            return
+
+        with source:
+            line = 1
+            line_start = 0
+
+            for mo in tok_regex_bytes.finditer(source):
+                kind = mo.lastgroup
+                start = mo.start()
+
+                if kind == 'SKIP':
+                    lexeme = mo.group()
+                    newlines = lexeme.count(b'\n')
+                    if newlines:
+                        line += newlines
+                        line_start = start + lexeme.rindex(b'\n') + 1
+                    continue
+                elif kind == 'COMMENT':
+                    continue
+
+                value = mo.group().decode('ascii')
+                kind = RULE_KINDS[kind]
+                if kind == TK_ID and value in KEYWORDS:
+                    kind = TK_KEYWORD
+
+                yield Token(kind, value, start, line, start - line_start + 1)
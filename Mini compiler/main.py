@@ -1,319 +1,694 @@
-# main.py - Compiler Phases Integration
-
-import re
-import os
-
-# --- 1. Lexical Analyzer Function ---
-
-def lexical_analysis(file_path="input.txt"):
-    """Reads C code and identifies tokens (lexemes)."""
-    try:
-        with open(file_path, 'r') as file:
-            c_code = file.read()
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found.")
-        return
-
-    # Define sets and specification for tokens
-    KEYWORDS = {'int', 'float', 'void', 'if', 'else', 'while', 'for', 'return'}
-    token_specification = [
-        ('COMMENT',       r'//.*'),
-        ('KEYWORD_R',     r'\b(int|float|void|if|else|while|for|return)\b'),
-        ('IDENTIFIER',    r'[a-zA-Z_][a-zA-Z0-9_]*'),
-        ('LITERAL_FLOAT', r'\d+\.\d+'),
-        ('LITERAL_INT',   r'\d+'),
-        ('OPERATOR',      r'[+\-*/=><!]{1,2}'),
-        ('SEPARATOR',     r'[;,(){}]'),
-        ('SKIP',          r'\s+'),
-    ]
-
-    tok_regex = '|'.join('(?P<%s>%s)' % pair for pair in token_specification)
-
-    print("\n" + "="*70)
-    print("                 PHASE 1: LEXICAL ANALYSIS")
-    print("="*70)
-    
-    tokens_list = []
-    
-    for mo in re.finditer(tok_regex, c_code):
-        kind = mo.lastgroup
-        value = mo.group(kind)
-        
-        if kind == 'SKIP' or kind == 'COMMENT':
-            continue
-        elif kind == 'KEYWORD_R':
-            print(f"KEYWORD:   '{value}'")
-            tokens_list.append(('KEYWORD', value))
-        elif kind == 'OPERATOR':
-            print(f"OPERATOR:  '{value}'")
-            tokens_list.append(('OPERATOR', value))
-        elif kind == 'SEPARATOR':
-            print(f"SEPARATOR: '{value}'")
-            tokens_list.append(('SEPARATOR', value))
-        elif kind == 'IDENTIFIER':
-            if value in KEYWORDS:
-                 print(f"KEYWORD:   '{value}'")
-                 tokens_list.append(('KEYWORD', value))
-            else:
-                print(f"ID:        '{value}'")
-                tokens_list.append(('ID', value))
-        elif kind.startswith('LITERAL'):
-             print(f"LITERAL:   '{value}' ({kind.split('_')[1]})")
-             tokens_list.append(('LITERAL', value))
-        else:
-            print(f"ERROR:     Unexpected character: '{value}'")
-            
-    return tokens_list
-
-# --- 2. Symbol Table Function (Basic) ---
-
-def build_symbol_table(file_path="input.txt"):
-    """Scans for variable/function declarations and builds a basic symbol table."""
-    try:
-        with open(file_path, 'r') as file:
-            c_code = file.read()
-    except FileNotFoundError:
-        return
-
-    DATA_TYPES = ['int', 'float', 'double', 'char', 'void']
-    symbol_table = {}
-    index = 1
-    
-    # Simple tokenization for symbol table
-    all_tokens = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*|\d+\.\d+|\d+|[+\-*/=;,(){}]', c_code)
-    
-    i = 0
-    while i < len(all_tokens):
-        token = all_tokens[i]
-
-        if token in DATA_TYPES:
-            data_type = token
-            if i + 1 < len(all_tokens):
-                identifier = all_tokens[i + 1]
-                
-                # Check if it's a valid identifier and not already in table
-                if identifier not in ['=', ';', '(', ')', '{', '}'] and identifier not in symbol_table:
-                    
-                    scope = "Variable"
-                    # Simple check for function: identifier followed by '('
-                    if i + 2 < len(all_tokens) and all_tokens[i+2] == '(':
-                        scope = "Function"
-                    
-                    symbol_table[identifier] = {
-                        "Index": index,
-                        "Type": data_type,
-                        "Scope": scope,
-                        "Initial Value": "N/A"
-                    }
-                    index += 1
-        i += 1
-
-    print("\n" + "="*70)
-    print("                 PHASE 2: SYMBOL TABLE")
-    print("="*70)
-    if not symbol_table:
-        print("No data type declarations (int, float, etc.) found.")
-        return
-
-    print("{:<10} {:<20} {:<10} {:<15} {:<15}".format(
-        "Index", "Identifier", "Type", "Scope", "Initial Value"
-    ))
-    print("-" * 70)
-
-    for name, data in symbol_table.items():
-        print("{:<10} {:<20} {:<10} {:<15} {:<15}".format(
-            data["Index"], name, data["Type"], data["Scope"], data["Initial Value"]
-        ))
-    return symbol_table
-
-# --- 3. Three-Address Code (TAC) Function ---
-
-def generate_tac(file_path="input.txt"):
-    """Generates Three-Address Code (TAC) for a simple assignment using RPN."""
-    try:
-        with open(file_path, 'r') as file:
-            c_code = file.read().strip()
-    except FileNotFoundError:
-        return []
-
-    # 1. Extract Target Variable and Expression
-    match = re.search(r'(\w+)\s*=\s*(.*);', c_code)
-    if not match:
-        return []
-
-    target_var = match.group(1)
-    expression = match.group(2).strip()
-
-    # Define operators and their precedence
-    operators = {'*': 3, '/': 3, '+': 2, '-': 2, '(': 1}
-    tokens = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*|\d+\.\d+|\d+|[+\-*/()]', expression)
-
-    # 2. Shunting-Yard Algorithm: Convert to RPN
-    op_stack = []
-    output_queue = []
-
-    for token in tokens:
-        if token not in operators and token != ')':
-            output_queue.append(token)
-        elif token == '(':
-            op_stack.append(token)
-        elif token == ')':
-            while op_stack and op_stack[-1] != '(':
-                output_queue.append(op_stack.pop())
-            if op_stack and op_stack[-1] == '(':
-                op_stack.pop() 
-        elif token in operators:
-            while (op_stack and op_stack[-1] != '(' and 
-                   operators.get(op_stack[-1], 0) >= operators[token]):
-                output_queue.append(op_stack.pop())
-            op_stack.append(token)
-
-    while op_stack:
-        output_queue.append(op_stack.pop()) 
-
-    # 3. Generate TAC from RPN
-    tac_instructions = []
-    temp_count = 1
-    operand_stack = []
-
-    for token in output_queue:
-        if token not in operators:
-            operand_stack.append(token)
-        elif token in operators:
-            op2 = operand_stack.pop()
-            op1 = operand_stack.pop()
-            
-            temp_var = f"t{temp_count}"
-            tac_instructions.append(f"{temp_var} = {op1} {token} {op2}")
-            operand_stack.append(temp_var)
-            temp_count += 1
-            
-    if operand_stack:
-        final_temp = operand_stack.pop()
-        tac_instructions.append(f"{target_var} = {final_temp}")
-
-    print("\n" + "="*70)
-    print("             PHASE 3: THREE-ADDRESS CODE (TAC)")
-    print("="*70)
-    print(f"Input C Expression: {c_code}")
-    print("-" * 50)
-    for instruction in tac_instructions:
-        print(instruction)
-        
-    return tac_instructions
-
-
-# --- 4. Assembly Code Generation Function (Basic) ---
-
-def generate_assembly(tac_instructions, file_path="input.txt"):
-    """Generates simplified x86-like Assembly Code from the TAC instructions."""
-    
-    if not tac_instructions:
-        print("\n" + "="*70)
-        print("             PHASE 4: ASSEMBLY CODE GENERATION")
-        print("="*70)
-        print("Cannot generate Assembly: No TAC instructions provided.")
-        return
-
-    # Extract target variable from the last TAC instruction
-    target_var_match = re.match(r'(\w+)\s*=\s*(\w+)', tac_instructions[-1])
-    target_var = target_var_match.group(1) if target_var_match else "result"
-
-    assembly_code = []
-    variables = set()
-
-    for tac in tac_instructions:
-        match_op = re.match(r'(t\d+|\w+)\s*=\s*(\w+|\d+)\s*([+\-*/])\s*(\w+|\d+)', tac)
-        match_assign = re.match(r'(\w+)\s*=\s*(\w+)', tac)
-        
-        # Collect variables for the data section
-        for token in re.findall(r'\b[a-zA-Z_]\w*\b', tac):
-            if not token.startswith('t') and token not in ['dd']: # 'dd' is part of assembly syntax
-                 variables.add(token)
-
-        if match_op:
-            result_var, op1, operator, op2 = match_op.groups()
-            
-            # Use EBX for temporary calculations
-            assembly_code.append(f"  MOV EAX, [{op1}]   ; Load {op1} into EAX")
-            
-            if operator == '+':
-                assembly_code.append(f"  ADD EAX, [{op2}]   ; EAX = EAX + {op2}")
-            elif operator == '-':
-                assembly_code.append(f"  SUB EAX, [{op2}]   ; EAX = EAX - {op2}")
-            elif operator == '*':
-                # IMUL for multiplication, uses a different syntax when one operand is a register
-                assembly_code.append(f"  MOV EBX, [{op2}]   ; Load {op2} into EBX")
-                assembly_code.append(f"  IMUL EAX, EBX   ; EAX = EAX * EBX")
-            elif operator == '/':
-                # IDIV is more complex (uses EDX:EAX), simplified here
-                assembly_code.append(f"  IDIV EAX, [{op2}]   ; EAX = EAX / {op2} (simplified)")
-
-            # Store the temporary result
-            assembly_code.append(f"  MOV [{result_var}], EAX ; Store result in {result_var}")
-            
-        elif match_assign and match_assign.group(1) == target_var:
-            # Final assignment
-            assembly_code.append(f"  MOV EAX, [{match_assign.group(2)}] ; Load final result from {match_assign.group(2)} into EAX")
-            assembly_code.append(f"  MOV [{target_var}], EAX  ; Store final EAX value in {target_var}")
-
-    print("\n" + "="*70)
-    print("             PHASE 4: ASSEMBLY CODE GENERATION")
-    print("="*70)
-    print(f"Target Variable: {target_var}")
-    print("-" * 50)
-
-    # Print a simplified data section
-    print("\nSECTION .data ; Variable Declarations (Simplified)")
-    for var in sorted(list(variables)):
-        print(f"  {var} dd 0") # dd = Define Double-word (4-byte integer)
-    
-    # Print the code section
-    print("\nSECTION .text ; Program Code")
-    for line in assembly_code:
-        print(line)
-
-
-# --- Setup and Main Execution ---
-
-def setup_input_file(file_path="input.txt"):
-    """Creates a sample input.txt file for the compiler phases."""
-    sample_c_code = """
-// Sample C code for compiler demonstration
-int x = 10;
-float y;
-int main() {
-    y = x * (5.0 + y) - 2; // Expression for TAC and Assembly
-    return 0;
-}
-"""
-    try:
-        with open(file_path, 'w') as file:
-            file.write(sample_c_code.strip())
-        print(f"Created/updated '{file_path}' with sample C code.")
-    except Exception as e:
-        print(f"Error creating file: {e}")
-
-
-def main():
-    """Executes all compiler phases sequentially."""
-    file_path = "input.txt"
-    setup_input_file(file_path)
-
-    # Phase 1: Lexical Analysis
-    tokens = lexical_analysis(file_path)
-
-    # Phase 2: Symbol Table Construction
-    symbol_table = build_symbol_table(file_path)
-
-    # Phase 3: Intermediate Code Generation (TAC)
-    tac_instructions = generate_tac(file_path)
-
-    # Phase 4: Code Generation (Assembly)
-    generate_assembly(tac_instructions, file_path)
-    
-    # Clean up (optional)
-    # os.remove(file_path) 
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# main.py - Compiler Phases Integration
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+from array import array
+
+from cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, CompileCache
+from codegen import aligned_section, assembly_for_globals, assembly_for_tac, constant_pool
+from cparser import (RELATIONAL_OPS, Assign, Binary, Block, Call, DeclStmt, ExprStmt, For, FunctionDef, If, IncDec,
+                     Name, Num, ParseError, Return, Unary, While, parse)
+from incremental import ITEM_KEY_PREFIX, fingerprints
+from inline import inline_functions
+from lexer import TokenBuffer, stream_tokens, tokenize
+from optimizer import optimize
+from output import MODES, OutputWriter
+from peephole import peephole
+from pycode import PythonProgram
+from symtab import FUNCTION, PARAMETER, VARIABLE, SymbolTable
+from tac import TACGenerator, global_tac
+from vm import Program, VMError
+
+# --- 0. Compilation Unit (Front End) ---
+
+class CompilationUnit:
+    """A source file that is read once and tokenized once.
+
+    Every phase takes the unit instead of a file path, so the file is not
+    re-opened and the source is not re-scanned with a phase-specific regex.
+    """
+
+    def __init__(self, file_path, c_code, tokens=None):
+        self.file_path = file_path
+        self.c_code = c_code
+        self.tokens = tokenize(c_code) if tokens is None else tokens
+        self.program = None
+        self.symbol_table = None
+        self.resolved = None
+        self.items = []
+        self.reused_items = 0
+        self.tac_instructions = []
+        self.assembly = None
+
+    @classmethod
+    def from_file(cls, file_path="input.txt"):
+        """Reads the file at file_path; returns None if it does not exist."""
+        try:
+            with open(file_path, 'r') as file:
+                c_code = file.read()
+        except FileNotFoundError:
+            print(f"Error: The file '{file_path}' was not found.")
+            return None
+        return cls(file_path, c_code)
+
+    def to_payload(self):
+        """The phase results to cache; the source text is not included."""
+        return {
+            'tokens': (self.tokens.kinds, self.tokens.starts, self.tokens.ends),
+            'symbol_table': self.symbol_table,
+            'resolved': self.resolved,
+            'items': self.items,
+            'tac_instructions': self.tac_instructions,
+            'assembly': self.assembly,
+        }
+
+    @classmethod
+    def from_payload(cls, file_path, c_code, payload):
+        """Rebuilds a compiled unit from a cached payload without rerunning any phase."""
+        tokens = TokenBuffer(c_code)
+        tokens.kinds, tokens.starts, tokens.ends = payload['tokens']
+        unit = cls(file_path, c_code, tokens)
+        unit.symbol_table = payload['symbol_table']
+        unit.resolved = payload['resolved']
+        unit.items = payload['items']
+        unit.tac_instructions = payload['tac_instructions']
+        unit.assembly = payload['assembly']
+        return unit
+
+
+# --- 1. Lexical Analyzer Function ---
+
+def lexical_analysis(unit):
+    """Returns the tokens (lexemes) of the compilation unit."""
+    return unit.tokens
+
+
+def lexical_analysis_stream(file_path="input.txt"):
+    """Returns a lazy stream of positioned tokens for file_path.
+
+    Unlike lexical_analysis, no token list is built, so memory use does not
+    grow with the size of the file.
+    """
+    return stream_tokens(file_path)
+
+# --- 2. Syntax Analysis and Symbol Table Functions ---
+
+def syntax_analysis(unit):
+    """Parses the unit's tokens into an AST; raises ParseError on bad input."""
+    unit.program = parse(unit.tokens)
+    return unit.program
+
+
+def arithmetic_type(left, right):
+    if left in ('float', 'double') or right in ('float', 'double'):
+        return 'float'
+    return 'int'
+
+
+def constant_value(node):
+    """The literal text of a constant initializer (a number, or a negated one), else None."""
+    if isinstance(node, Num):
+        return node.value
+    if isinstance(node, Unary) and node.op == '-' and isinstance(node.operand, Num):
+        return '-' + node.operand.value
+    return None
+
+
+class SymbolTableBuilder:
+    """Walks the AST, declaring every name in its scope and resolving every use.
+
+    Blocks and for-loop headers open a scope; a function's parameters share
+    a scope with its body. Name and Call nodes get the ID of the Symbol they
+    refer to and the C type of their value.
+    """
+
+    def __init__(self, unit):
+        self.table = SymbolTable()
+        self.resolved = array('i', [-1]) * len(unit.tokens)
+        self.program = unit.program
+        # Calls may precede the callee's definition: they are resolved at the end.
+        self.pending_calls = []
+        self.return_types = {item.name: item.type for item in self.program.items if isinstance(item, FunctionDef)}
+
+    def build(self):
+        table = self.table
+        for item in self.program.items:
+            if isinstance(item, FunctionDef):
+                self.function(item)
+            else:
+                self.declaration(item, is_global=True)
+
+        for call in self.pending_calls:
+            symbol = table.lookup_global(call.name)
+            if symbol is None:
+                table.errors.append(f"Undeclared function '{call.name}'")
+                continue
+            self.bind(call, symbol)
+            if symbol.kind != FUNCTION:
+                table.errors.append(f"'{call.name}' is not a function")
+            elif len(call.args) != len(symbol.params):
+                table.errors.append(f"Function '{call.name}' expects {len(symbol.params)} argument(s), "
+                                    f"got {len(call.args)}")
+        return table
+
+    def bind(self, node, symbol):
+        node.symbol = symbol.id
+        self.resolved[node.pos] = symbol.id
+
+    # --- Declarations ---
+
+    def function(self, node):
+        table = self.table
+        function = table.declare(node.name, node.type, FUNCTION, definition=node.body is not None)
+        function.params = []    # a definition re-lists a prototype's parameters
+        self.bind(node, function)
+
+        table.push(function.name)
+        for param in node.params:
+            symbol = table.declare(param.name, param.type, PARAMETER)
+            function.params.append(symbol)
+            self.bind(param, symbol)
+        if node.body is not None:
+            node.body.scope = table.current.id
+            for stmt in node.body.stmts:
+                self.statement(stmt)
+        table.pop()
+
+    def declaration(self, node, is_global=False):
+        for decl in node.decls:
+            initial_value = None if decl.init is None else constant_value(decl.init)
+            symbol = self.table.declare(decl.name, decl.type, VARIABLE, initial_value)
+            self.bind(decl, symbol)
+            if decl.init is not None:
+                self.expression(decl.init)
+                if is_global and initial_value is None:
+                    self.table.errors.append(f"Initializer of global '{decl.name}' is not a constant")
+
+    # --- Statements ---
+
+    def statement(self, node):
+        table = self.table
+        if isinstance(node, ExprStmt):
+            self.expression(node.expr)
+        elif isinstance(node, DeclStmt):
+            self.declaration(node)
+        elif isinstance(node, Block):
+            node.scope = table.push().id
+            for stmt in node.stmts:
+                self.statement(stmt)
+            table.pop()
+        elif isinstance(node, Return):
+            if node.value is not None:
+                self.expression(node.value)
+        elif isinstance(node, If):
+            self.expression(node.cond)
+            self.statement(node.then)
+            if node.orelse is not None:
+                self.statement(node.orelse)
+        elif isinstance(node, While):
+            self.expression(node.cond)
+            self.statement(node.body)
+        elif isinstance(node, For):
+            node.scope = table.push().id
+            if node.init is not None:
+                self.statement(node.init)
+            for expr in (node.cond, node.step):
+                if expr is not None:
+                    self.expression(expr)
+            self.statement(node.body)
+            table.pop()
+
+    # --- Expressions ---
+
+    def variable(self, node):
+        symbol = self.table.lookup(node.name)
+        if symbol is None:
+            self.table.errors.append(f"Undeclared identifier '{node.name}'")
+            node.ctype = 'int'
+            return
+        if symbol.kind == FUNCTION:
+            self.table.errors.append(f"Function '{node.name}' used as a variable")
+        self.bind(node, symbol)
+        node.ctype = symbol.type
+
+    def expression(self, node):
+        """Resolves the names in node and returns its C type."""
+        if isinstance(node, Num):
+            return node.ctype
+        if isinstance(node, Name):
+            self.variable(node)
+        elif isinstance(node, Binary):
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            node.ctype = 'int' if node.op in RELATIONAL_OPS else arithmetic_type(left, right)
+        elif isinstance(node, Unary):
+            operand = self.expression(node.operand)
+            node.ctype = 'int' if node.op == '!' else operand
+        elif isinstance(node, Assign):
+            self.expression(node.value)
+            self.variable(node.target)
+            node.ctype = node.target.ctype
+        elif isinstance(node, IncDec):
+            self.variable(node.target)
+            node.ctype = node.target.ctype
+        elif isinstance(node, Call):
+            for arg in node.args:
+                self.expression(arg)
+            symbol = self.table.lookup(node.name)
+            if symbol is None:
+                self.pending_calls.append(node)
+            else:
+                self.bind(node, symbol)
+                if symbol.kind == FUNCTION and len(node.args) != len(symbol.params):
+                    self.table.errors.append(f"Function '{node.name}' expects {len(symbol.params)} "
+                                             f"argument(s), got {len(node.args)}")
+                elif symbol.kind != FUNCTION:
+                    self.table.errors.append(f"'{node.name}' is not a function")
+            node.ctype = self.return_types.get(node.name, 'int')
+        return node.ctype
+
+
+def build_symbol_table(unit):
+    """Builds the scoped symbol table by walking the unit's AST.
+
+    unit.resolved maps token index -> symbol ID for every declared or used
+    name (-1 for other tokens), so later phases look names up by index
+    instead of re-deriving them from strings.
+    """
+    builder = SymbolTableBuilder(unit)
+    unit.symbol_table = builder.build()
+    unit.resolved = builder.resolved
+    return unit.symbol_table
+
+# --- 3. Three-Address Code (TAC) Function ---
+
+def item_header(unit, item):
+    """Source text of a top-level item, up to a function's body, on one line."""
+    tokens = unit.tokens
+    last = item.last
+    if isinstance(item, FunctionDef) and item.body is not None:
+        last = item.body.pos
+    return ' '.join(unit.c_code[tokens.starts[item.first]:tokens.ends[last - 1]].split())
+
+
+def generate_tac(unit, item_cache=None):
+    """Generates TAC for every top-level declaration and function of the unit.
+
+    With an item_cache, items whose fingerprint is already cached reuse
+    their TAC and assembly; only the changed items are translated again.
+    """
+    program_items = unit.program.items
+    ranges = [(item.first, item.last) for item in program_items]
+    generator = TACGenerator(unit.symbol_table)
+    unit.items = []
+    unit.reused_items = 0
+    item_fingerprints = fingerprints(unit.tokens, ranges)
+    # A function with calls inlined depends on the bodies it copied in too
+    current = {node.name: fingerprint for node, fingerprint in zip(program_items, item_fingerprints)
+               if isinstance(node, FunctionDef) and node.body is not None}
+
+    for node, fingerprint in zip(program_items, item_fingerprints):
+        if item_cache is not None:
+            cached = item_cache.load(item_cache.key(ITEM_KEY_PREFIX + fingerprint))
+            if cached is not None and all(current.get(name) == inlined
+                                          for name, inlined in cached['inlined'].items()):
+                unit.items.append(cached)
+                unit.reused_items += 1
+                continue
+
+        item = {
+            'fingerprint': fingerprint,
+            'statement': item_header(unit, node),
+            'tac': [],
+            'function': None,
+            'globals': [],
+            'quad_counts': None,
+            'inlined': {},          # name -> fingerprint of every function whose body was inlined
+            'inlined_sites': [],
+            'assembly': None,
+            'peephole': None,
+        }
+        if isinstance(node, FunctionDef):
+            if node.body is not None:
+                item['function'] = generator.function(node)
+                item['tac'] = item['function'].dump()
+        else:
+            item['tac'] = global_tac(node, unit.symbol_table)
+            item['globals'] = [unit.symbol_table.symbols[decl.symbol] for decl in node.decls]
+        unit.items.append(item)
+
+    unit.tac_instructions = [instruction for item in unit.items for instruction in item['tac']]
+    return unit.tac_instructions
+
+
+def optimize_tac(unit, inline=True):
+    """Runs the optimizer over every freshly generated function, then inlines small callees.
+
+    Each item records (quads before, quads after) in 'quad_counts' and
+    the calls inlined into it in 'inlined_sites'; items reused from the
+    cache were optimized when they were first built. Any function can be
+    inlined into a fresh one, including a function reused from the cache.
+    """
+    fresh = [item for item in unit.items if item['function'] is not None and item['quad_counts'] is None]
+    for item in fresh:
+        item['quad_counts'] = optimize(item['function'])
+    if inline and fresh:
+        by_name = {item['function'].name: item for item in unit.items if item['function'] is not None}
+        # Callees come first, so a callee's own 'inlined' is final when its callers copy it
+        for site in inline_functions([item['function'] for item in by_name.values()],
+                                     {item['function'].name for item in fresh}):
+            item = by_name[site.caller]
+            callee = by_name[site.callee]
+            item['inlined_sites'].append(site)
+            item['inlined'][site.callee] = callee['fingerprint']
+            item['inlined'].update(callee['inlined'])
+            item['quad_counts'] = (item['quad_counts'][0], len(item['function'].quads))
+    for item in fresh:
+        item['tac'] = item['function'].dump()
+    unit.tac_instructions = [instruction for item in unit.items for instruction in item['tac']]
+    return unit.tac_instructions
+
+
+# --- 4. Assembly Code Generation Function (Basic) ---
+
+def generate_assembly(unit, item_cache=None):
+    """Generates assembly for each item's TAC and splices the items together.
+
+    Each function's instructions go through the peephole optimizer, which
+    records how often each rule fired in the item's 'peephole' counts.
+    Float constants from every function are merged into one read-only
+    pool with one entry per label, and both data sections are laid out so
+    every entry is aligned to its size. Items reused from the cache
+    already carry their assembly. Freshly translated items are stored in
+    item_cache for the next build.
+    """
+    data = []
+    rodata = {}                 # label -> line of each pooled constant
+    assembly_code = []
+
+    for item in unit.items:
+        if item['assembly'] is None:
+            if item['function'] is not None:
+                item['assembly'] = assembly_for_tac(item['function'], symbol_table=unit.symbol_table)
+                item['assembly']['text'], item['peephole'] = peephole(item['assembly']['text'])
+            else:
+                item['assembly'] = assembly_for_globals(item['globals'])
+            if item_cache is not None:
+                item_cache.store(item_cache.key(ITEM_KEY_PREFIX + item['fingerprint']), item)
+        data.extend(item['assembly']['data'])
+        for line in item['assembly']['rodata']:
+            rodata.setdefault(line.split()[0], line)
+        assembly_code.extend(item['assembly']['text'])
+
+    if not assembly_code and not data:
+        unit.assembly = None
+        return None
+
+    unit.assembly = {'data': aligned_section(data), 'rodata': constant_pool(rodata), 'text': assembly_code}
+    return unit.assembly
+
+
+# --- Setup and Main Execution ---
+
+def setup_input_file(file_path="input.txt"):
+    """Creates a sample input.txt file for the compiler phases."""
+    sample_c_code = """
+// Sample C code for compiler demonstration
+int x = 10;
+float y;
+int main() {
+    y = x * (5.0 + y) - 2; // Expression for TAC and Assembly
+    return 0;
+}
+"""
+    try:
+        with open(file_path, 'w') as file:
+            file.write(sample_c_code.strip())
+        print(f"Created/updated '{file_path}' with sample C code.", file=sys.stderr)
+    except Exception as e:
+        print(f"Error creating file: {e}")
+
+
+def compile_unit(unit, item_cache=None):
+    """Runs every compiler phase over a unit; results are recorded on it.
+
+    Raises ParseError if the source is not syntactically valid. item_cache
+    enables incremental recompilation: top-level items whose fingerprint
+    is cached skip phases 3 and 4.
+    """
+    # Phase 1: Lexical Analysis
+    lexical_analysis(unit)
+
+    # Phase 2: Syntax Analysis and Symbol Table Construction
+    syntax_analysis(unit)
+    build_symbol_table(unit)
+
+    # Phase 3: Intermediate Code Generation (TAC) and Optimization
+    generate_tac(unit, item_cache)
+    optimize_tac(unit)
+
+    # Phase 4: Code Generation (Assembly)
+    generate_assembly(unit, item_cache)
+    return unit
+
+
+def load_or_compile(file_path, cache=None):
+    """Returns (unit, cached) for file_path, consulting cache when given.
+
+    cached is True on a cache hit, False on a miss (the fresh results are
+    then stored) and None when no cache is in use.
+    """
+    with open(file_path, 'r') as file:
+        c_code = file.read()
+    if cache is None:
+        return compile_unit(CompilationUnit(file_path, c_code)), None
+
+    key = cache.key(c_code)
+    payload = cache.load(key)
+    if payload is not None:
+        return CompilationUnit.from_payload(file_path, c_code, payload), True
+
+    # Whole-file miss: unchanged functions still come from the item cache.
+    item_cache = CompileCache(cache.cache_dir, cache.max_bytes)
+    unit = compile_unit(CompilationUnit(file_path, c_code), item_cache)
+    cache.store(key, unit.to_payload())
+    return unit, False
+
+
+def write_unit(unit, mode, output_path=None):
+    """Renders a compiled unit and writes it in one go to output_path or stdout."""
+    if output_path is None:
+        writer = OutputWriter(mode)
+        writer.unit(unit)
+        writer.flush()
+    else:
+        with open(output_path, 'w') as stream:
+            writer = OutputWriter(mode, stream)
+            writer.unit(unit)
+            writer.flush()
+
+
+# --- Batch Compilation ---
+
+CompileResult = collections.namedtuple('CompileResult', 'file_path output_path tokens seconds cached items reused error')
+
+ARTIFACT_EXTENSIONS = {'text': '.out.txt', 'jsonl': '.out.jsonl', 'silent': None}
+
+
+def expand_inputs(patterns):
+    """Expands paths and glob patterns into an ordered, de-duplicated file list."""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isdir(path) or path in seen:
+                continue
+            seen.add(path)
+            paths.append(path)
+    return paths
+
+
+def artifact_path(file_path, mode, out_dir=None, base_dir=None):
+    """Where the output for file_path goes: beside it, or mirrored under out_dir."""
+    extension = ARTIFACT_EXTENSIONS[mode]
+    if extension is None:
+        return None
+    if out_dir is None:
+        return file_path + extension
+    relative = os.path.relpath(os.path.abspath(file_path), base_dir) if base_dir else os.path.basename(file_path)
+    return os.path.join(out_dir, relative + extension)
+
+
+def compile_file(file_path, mode='text', output_path=None, cache_dir=None):
+    """Compiles one file and writes its artifact; never raises.
+
+    This is the unit of work handed to the process pool, so it returns a
+    small picklable CompileResult instead of the unit itself. With a
+    cache_dir, unchanged sources are served from the compile cache.
+    """
+    start = time.perf_counter()
+    cached = None
+    try:
+        cache = CompileCache(cache_dir) if cache_dir is not None else None
+        unit, cached = load_or_compile(file_path, cache)
+        if output_path is not None:
+            directory = os.path.dirname(output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            write_unit(unit, mode, output_path)
+        return CompileResult(file_path, output_path, len(unit.tokens), time.perf_counter() - start, cached,
+                             len(unit.items), unit.reused_items, None)
+    except Exception as e:
+        return CompileResult(file_path, output_path, 0, time.perf_counter() - start, cached, 0, 0,
+                             f"{type(e).__name__}: {e}")
+
+
+def _compile_job(job):
+    return compile_file(*job)
+
+
+def compile_many(paths, mode='text', jobs=None, out_dir=None, cache_dir=None):
+    """Compiles paths across a process pool and returns their CompileResults.
+
+    jobs is the worker count (default: one per CPU); jobs=1 compiles in
+    this process. Work is handed out in chunks so that tens of thousands
+    of small files do not pay one round trip to a worker each.
+    """
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else None
+    work = [(path, mode, artifact_path(path, mode, out_dir, base_dir), cache_dir) for path in paths]
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(work) == 1:
+        return [_compile_job(job) for job in work]
+
+    chunksize = max(1, len(work) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_compile_job, work, chunksize=chunksize))
+
+
+def format_cache_stats(hits, misses):
+    total = hits + misses
+    rate = 100.0 * hits / total if total else 0.0
+    return f"Cache: {hits} hit(s), {misses} miss(es) ({rate:.1f}% hit rate)"
+
+
+def format_item_stats(items, reused):
+    return f"Incremental: {items - reused} of {items} top-level item(s) recompiled, {reused} reused"
+
+
+def format_summary(results, jobs, wall_seconds):
+    """Per-file timing lines followed by a one-line total."""
+    failed = sum(1 for r in results if r.error)
+    lines = ["{:>10} {:>10}  {:<6} {}".format("ms", "tokens", "status", "file -> artifact"), "-" * 70]
+    for r in results:
+        status = "FAILED" if r.error else ("cached" if r.cached else "ok")
+        target = r.error if r.error else (r.output_path or "-")
+        lines.append(f"{r.seconds * 1000:>10.2f} {r.tokens:>10}  {status:<6} {r.file_path} -> {target}")
+    lines.append("-" * 70)
+    lines.append(f"Compiled {len(results)} file(s) with {jobs} worker(s) in {wall_seconds:.2f} s "
+                 f"({len(results) - failed} ok, {failed} failed; "
+                 f"{sum(r.seconds for r in results):.2f} s total compile time)")
+    if any(r.cached is not None for r in results):
+        lines.append(format_cache_stats(sum(1 for r in results if r.cached),
+                                        sum(1 for r in results if r.cached is False)))
+        changed = [r for r in results if r.cached is False]
+        if changed:
+            lines.append(format_item_stats(sum(r.items for r in changed), sum(r.reused for r in changed)))
+    return "\n".join(lines)
+
+
+# --- Command-Line Entry Point ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mini C compiler: lexer, symbol table, TAC and assembly phases.")
+    parser.add_argument('inputs', nargs='*', default=["input.txt"],
+                        help="source files or glob patterns (default: input.txt)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes for batch compilation (default: CPU count)")
+    parser.add_argument('-m', '--mode', choices=MODES, default='text',
+                        help="output format (default: text)")
+    parser.add_argument('-o', '--out-dir', default=None,
+                        help="directory for per-file artifacts (default: next to each source)")
+    parser.add_argument('--cache-dir', nargs='?', const=DEFAULT_CACHE_DIR, default=None,
+                        help=f"reuse results for unchanged sources from this cache directory "
+                             f"(default when given without a value: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache size limit in MB; least recently used entries are evicted (default: 256)")
+    parser.add_argument('--stream', action='store_true',
+                        help="only run the streaming lexer and print positioned tokens")
+    parser.add_argument('--sample', action='store_true',
+                        help="(re)write the sample program to input.txt before compiling")
+    parser.add_argument('--run', action='store_true',
+                        help="after compiling a single input, run its main()")
+    parser.add_argument('--backend', choices=('vm', 'python'), default='vm',
+                        help="what --run executes: the bytecode VM or Python functions (default: vm)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Compiles the given sources.
+
+    A single input without --out-dir is compiled in-process and its listing
+    goes to stdout, as before. Several inputs are compiled in parallel, each
+    into its own artifact, followed by a timing summary.
+    """
+    args = parse_args(argv)
+    if args.sample:
+        setup_input_file("input.txt")
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("Error: no input files matched.", file=sys.stderr)
+        return 1
+
+    if args.stream:
+        writer = OutputWriter(args.mode)
+        for path in paths:
+            writer.token_stream(path, lexical_analysis_stream(path))
+        writer.flush()
+        return 0
+
+    cache = CompileCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+
+    if len(paths) == 1 and args.out_dir is None:
+        # Read and tokenize the source once; every phase shares the unit
+        try:
+            unit, _ = load_or_compile(paths[0], cache)
+        except FileNotFoundError:
+            print(f"Error: The file '{paths[0]}' was not found.", file=sys.stderr)
+            return 1
+        except ParseError as e:
+            print(f"Syntax error in '{paths[0]}': {e}", file=sys.stderr)
+            return 1
+        write_unit(unit, args.mode)
+        if args.run:
+            try:
+                program = PythonProgram.from_unit(unit) if args.backend == 'python' else Program.from_unit(unit)
+                result = program.run()
+            except VMError as e:
+                print(f"Runtime error in '{paths[0]}': {e}", file=sys.stderr)
+                return 1
+            print(f"main() returned {result}", file=sys.stderr)
+        if cache is not None:
+            cache.prune()
+            print(format_cache_stats(cache.hits, cache.misses), file=sys.stderr)
+            if cache.misses:
+                print(format_item_stats(len(unit.items), unit.reused_items), file=sys.stderr)
+        return 0
+
+    jobs = args.jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = compile_many(paths, args.mode, jobs, args.out_dir, args.cache_dir)
+    if cache is not None:
+        cache.prune()
+    print(format_summary(results, jobs, time.perf_counter() - start))
+    return 1 if any(r.error for r in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# optimizer.py - Local optimizations over the quadruple IR
+
+from cfg import simplify_cfg
+from dataflow import eliminate_dead_code
+from folding import fold_binary, format_constant, parse_constant
+from ir import (BINARY_OPS, CONST, GLOBAL, OP_ADD, OP_CALL, OP_COPY, OP_DIV, OP_EQ, OP_IFFALSE, OP_JUMP, OP_MUL, OP_NE,
+                OP_NEG, OP_SUB, TEMP, UNARY_OPS, basic_blocks, is_float, quad_def, quad_uses)
+from ssa import optimize_ssa
+
+COMMUTATIVE_OPS = frozenset((OP_ADD, OP_MUL, OP_EQ, OP_NE))
+
+
+# --- Local Value Numbering ---
+
+class ValueNumbering:
+    """Local value numbering over one basic block.
+
+    Every value gets a value number (VN); two values with the same VN are
+    known to be equal. Constants are folded as soon as both operands have
+    constant VNs, algebraic identities turn into copies, and an expression
+    whose VN is already held by some value becomes a copy of that value.
+    Operands are rewritten to a constant or another value holding their VN,
+    which propagates copies and constants within the block.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.values = function.values
+        self.vn_of = {}         # value ID -> VN
+        self.holder = {}        # VN -> value ID that currently holds it
+        self.constant = {}      # VN -> number, for constant VNs
+        self.expressions = {}   # (op, VN, VN, float?) -> VN
+        self.vn_count = 0
+        self.dead = []          # quads to delete
+
+    def new_vn(self):
+        self.vn_count += 1
+        return self.vn_count
+
+    def number(self, value_id):
+        vn = self.vn_of.get(value_id)
+        if vn is None:
+            vn = self.vn_of[value_id] = self.new_vn()
+            self.holder[vn] = value_id
+            value = self.values[value_id]
+            if value.kind == CONST:
+                self.constant[vn] = parse_constant(value.name, value.ctype)
+        return vn
+
+    def operand(self, value_id):
+        """The value to read instead of value_id: a constant or the holder of its VN."""
+        vn = self.number(value_id)
+        holder = self.holder.get(vn)
+        if holder is None:
+            self.holder[vn] = holder = value_id
+        return holder
+
+    def kill(self, value_id):
+        vn = self.vn_of.pop(value_id, None)
+        if vn is not None and self.holder.get(vn) == value_id:
+            del self.holder[vn]
+
+    def assign(self, value_id, vn):
+        self.kill(value_id)
+        self.vn_of[value_id] = vn
+        self.holder.setdefault(vn, value_id)
+
+    def to_copy(self, quad, source):
+        quad.op = OP_COPY
+        quad.src1 = source
+        quad.src2 = -1
+
+    def to_constant(self, quad, text, ctype):
+        self.to_copy(quad, self.function.constant(text, ctype))
+
+    # --- Quads ---
+
+    def run(self, quads):
+        for quad in quads:
+            op = quad.op
+            if op in BINARY_OPS:
+                self.binary(quad)
+            elif op in UNARY_OPS:
+                self.unary(quad)
+            elif op == OP_COPY:
+                self.copy(quad)
+            elif op == OP_CALL:
+                self.call(quad)
+            elif quad_uses(quad):
+                quad.src1 = self.operand(quad.src1)
+                if op == OP_IFFALSE:
+                    self.branch(quad)
+
+    def copy(self, quad):
+        source = quad.src1 = self.operand(quad.src1)
+        if source == quad.dest:
+            self.dead.append(quad)
+            return
+        dest_type = self.values[quad.dest].ctype
+        vn = self.vn_of[source]
+        if is_float(dest_type) == is_float(self.values[source].ctype):
+            self.assign(quad.dest, vn)
+            if self.values[source].kind == TEMP and self.values[quad.dest].kind != TEMP:
+                # Read the variable rather than the temp, so the temp can
+                # later be folded into the instruction that computes it.
+                self.holder[vn] = quad.dest
+            return
+        # A copy between int and float converts the value
+        if vn in self.constant:
+            text = format_constant(self.constant[vn], dest_type)
+            if text is not None:
+                quad.src1 = source = self.function.constant(text, dest_type)
+                self.assign(quad.dest, self.number(source))
+                return
+        self.assign(quad.dest, self.new_vn())
+
+    def binary(self, quad):
+        op = quad.op
+        dest = self.values[quad.dest]
+        left = quad.src1 = self.operand(quad.src1)
+        right = quad.src2 = self.operand(quad.src2)
+        left_vn, right_vn = self.vn_of[left], self.vn_of[right]
+        constant = self.constant
+
+        if left_vn in constant and right_vn in constant:
+            text = fold_binary(op, constant[left_vn], constant[right_vn], dest.ctype)
+            if text is not None:
+                self.to_constant(quad, text, dest.ctype)
+                self.copy(quad)
+                return
+
+        if self.identity(quad, left, right, left_vn, right_vn):
+            self.copy(quad)
+            return
+
+        if op in COMMUTATIVE_OPS and left_vn > right_vn:
+            left_vn, right_vn = right_vn, left_vn
+        key = (op, left_vn, right_vn, is_float(dest.ctype))
+        vn = self.expressions.get(key)
+        if vn is not None and vn in self.holder:
+            self.to_copy(quad, self.holder[vn])
+            self.assign(quad.dest, vn)
+            return
+        vn = self.new_vn()
+        self.expressions[key] = vn
+        self.assign(quad.dest, vn)
+
+    def identity(self, quad, left, right, left_vn, right_vn):
+        """Rewrites x+0, x-0, x*1, x/1, 0+x, 1*x (and x*0, x-x for ints) into copies."""
+        op = quad.op
+        dest_type = self.values[quad.dest].ctype
+        left_value = self.constant.get(left_vn)
+        right_value = self.constant.get(right_vn)
+
+        def same_type(value_id):
+            return is_float(self.values[value_id].ctype) == is_float(dest_type)
+
+        if ((op == OP_ADD or op == OP_SUB) and right_value == 0
+                or (op == OP_MUL or op == OP_DIV) and right_value == 1) and same_type(left):
+            self.to_copy(quad, left)
+            return True
+        if (op == OP_ADD and left_value == 0 or op == OP_MUL and left_value == 1) and same_type(right):
+            self.to_copy(quad, right)
+            return True
+        if not is_float(dest_type) and (op == OP_MUL and (left_value == 0 or right_value == 0)
+                                        or op == OP_SUB and left_vn == right_vn):
+            self.to_constant(quad, '0', dest_type)
+            return True
+        return False
+
+    def unary(self, quad):
+        op = quad.op
+        dest = self.values[quad.dest]
+        source = quad.src1 = self.operand(quad.src1)
+        vn = self.vn_of[source]
+        if vn in self.constant:
+            value = self.constant[vn]
+            text = format_constant(-value if op == OP_NEG else int(not value), dest.ctype)
+            if text is not None:
+                self.to_constant(quad, text, dest.ctype)
+                self.copy(quad)
+                return
+        key = (op, vn, -1, is_float(dest.ctype))
+        found = self.expressions.get(key)
+        if found is not None and found in self.holder:
+            self.to_copy(quad, self.holder[found])
+            self.assign(quad.dest, found)
+            return
+        self.expressions[key] = vn = self.new_vn()
+        self.assign(quad.dest, vn)
+
+    def call(self, quad):
+        # The callee may write any global
+        for value_id in [v for v in self.vn_of if self.values[v].kind == GLOBAL]:
+            self.kill(value_id)
+        if quad.dest >= 0:
+            self.assign(quad.dest, self.new_vn())
+
+    def branch(self, quad):
+        vn = self.vn_of[quad.src1]
+        if vn in self.constant:
+            if self.constant[vn]:
+                self.dead.append(quad)      # never taken
+            else:
+                quad.op = OP_JUMP           # always taken
+                quad.src1 = -1
+
+
+# --- Copies ---
+
+def coalesce_copies(function):
+    """Rewrites 't = expr; x = t' into 'x = expr' when t is read nowhere else."""
+    values = function.values
+    uses = [0] * len(values)
+    for quad in function.quads:
+        for value_id in quad_uses(quad):
+            uses[value_id] += 1
+
+    quads = function.quads
+    kept = []
+    for quad in quads:
+        if (quad.op == OP_COPY and kept and uses[quad.src1] == 1
+                and values[quad.src1].kind == TEMP and quad_def(kept[-1]) == quad.src1
+                and is_float(values[quad.src1].ctype) == is_float(values[quad.dest].ctype)):
+            kept[-1].dest = quad.dest
+            continue
+        kept.append(quad)
+    function.quads = kept
+    return len(quads) - len(kept)
+
+
+def optimize(function):
+    """Runs the optimizations over function in place.
+
+    The block passes run first, then constants and copies are propagated
+    across blocks in SSA form (see ssa.py). The block passes run again
+    before value numbering, so it sees blocks merged across labels nothing
+    jumps to, and after it, since branches it decided leave blocks
+    unreachable. Dead assignments are then removed
+    using global liveness. Returns (quads before, quads after).
+    """
+    before = len(function.quads)
+    simplify_cfg(function)
+    optimize_ssa(function)
+    simplify_cfg(function)
+    quads = function.quads
+    dead = set()
+    for first, last in basic_blocks(quads):
+        numbering = ValueNumbering(function)
+        numbering.run(quads[first:last])
+        dead.update(id(quad) for quad in numbering.dead)
+    if dead:
+        function.quads = [quad for quad in quads if id(quad) not in dead]
+
+    simplify_cfg(function)
+    eliminate_dead_code(function)
+    coalesce_copies(function)
+    eliminate_dead_code(function)
+    function.compact()
+    return before, len(function.quads)
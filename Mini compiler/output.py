@@ -0,0 +1,198 @@
+# output.py - Output layer: renders phase results and writes them in bulk
+
+import json
+import sys
+from collections import Counter
+
+from lexer import KIND_NAMES, TK_LITERAL
+
+MODES = ('silent', 'text', 'jsonl')
+
+
+def _banner(title):
+    return ["", "=" * 70, title, "=" * 70]
+
+
+def optimization_totals(items):
+    """(quads before, quads after) the optimizer, summed over items."""
+    counts = [item['quad_counts'] for item in items if item['quad_counts'] is not None]
+    return sum(before for before, _ in counts), sum(after for _, after in counts)
+
+
+def peephole_totals(items):
+    """Counter of peephole rule name -> times fired, summed over items."""
+    fired = Counter()
+    for item in items:
+        if item['peephole']:
+            fired.update(item['peephole'])
+    return fired
+
+
+class OutputWriter:
+    """Collects rendered phase results and writes them in one go.
+
+    Modes:
+      silent - nothing is rendered or written
+      text   - the human-readable listing, buffered until flush()
+      jsonl  - one JSON object per token, symbol, instruction or line
+
+    Phases never write themselves; they return data and the driver hands
+    it to the writer. flush() writes everything collected so far with a
+    single write call, to stream (default: stdout).
+    """
+
+    def __init__(self, mode='text', stream=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown output mode '{mode}', expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.stream = stream
+        self.chunks = []
+
+    def _lines(self, lines):
+        self.chunks.append("\n".join(lines) + "\n")
+
+    def _records(self, records):
+        dumps = json.dumps
+        self.chunks.append("".join(dumps(record) + "\n" for record in records))
+
+    def flush(self):
+        if self.chunks:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("".join(self.chunks))
+            stream.flush()
+            self.chunks = []
+
+    # --- Phase Renderers ---
+
+    def tokens(self, file_path, tokens):
+        if self.mode == 'text':
+            lines = _banner("                 PHASE 1: LEXICAL ANALYSIS")
+            for i in range(len(tokens)):
+                kind = tokens.kinds[i]
+                value = tokens.value(i)
+                label = KIND_NAMES[kind] + ':'
+                if kind == TK_LITERAL:
+                    lines.append(f"{label:<10} '{value}' ({'FLOAT' if '.' in value else 'INT'})")
+                else:
+                    lines.append(f"{label:<10} '{value}'")
+            self._lines(lines)
+        elif self.mode == 'jsonl':
+            self._records({"file": file_path, "phase": "lexical", "kind": KIND_NAMES[tokens.kinds[i]],
+                           "value": tokens.value(i)} for i in range(len(tokens)))
+
+    def token_stream(self, file_path, stream, chunk_size=65536):
+        """Renders a lazy token stream, flushing every chunk_size tokens."""
+        if self.mode == 'silent':
+            for _ in stream:
+                pass
+            return
+        if self.mode == 'text':
+            self._lines(_banner("           PHASE 1: LEXICAL ANALYSIS (STREAMING)"))
+
+        pending = []
+        for token in stream:
+            name = KIND_NAMES[token.kind]
+            if self.mode == 'text':
+                label = name + ':'
+                pending.append(f"{token.line:>5}:{token.column:<4} {label:<10} '{token.value}'\n")
+            else:
+                pending.append(json.dumps({"file": file_path, "phase": "lexical", "kind": name,
+                                           "value": token.value, "offset": token.offset,
+                                           "line": token.line, "column": token.column}) + "\n")
+            if len(pending) >= chunk_size:
+                self.chunks.append("".join(pending))
+                pending = []
+                self.flush()
+        self.chunks.append("".join(pending))
+
+    def symbol_table(self, file_path, symbol_table):
+        if self.mode == 'text':
+            lines = _banner("                 PHASE 2: SYMBOL TABLE")
+            if symbol_table is None or not len(symbol_table):
+                lines.append("No data type declarations (int, float, etc.) found.")
+            else:
+                row = "{:<7} {:<20} {:<7} {:<10} {:<24} {:<13}"
+                lines.append(row.format("Index", "Identifier", "Type", "Kind", "Scope", "Initial Value"))
+                lines.append("-" * 86)
+                for symbol in symbol_table:
+                    lines.append(row.format(symbol.id + 1, symbol.name, symbol.type, symbol.kind,
+                                            symbol_table.scope_name(symbol), symbol.initial_value or "N/A"))
+            if symbol_table is not None:
+                lines.extend(f"Error: {error}" for error in symbol_table.errors)
+            self._lines(lines)
+        elif self.mode == 'jsonl' and symbol_table is not None:
+            records = [{"file": file_path, "phase": "symbols", "index": symbol.id + 1, "name": symbol.name,
+                        "type": symbol.type, "kind": symbol.kind, "scope": symbol_table.scope_name(symbol),
+                        "initial_value": symbol.initial_value}
+                       for symbol in symbol_table]
+            records += [{"file": file_path, "phase": "symbols", "error": error} for error in symbol_table.errors]
+            self._records(records)
+
+    def tac(self, file_path, items):
+        if self.mode == 'text':
+            lines = _banner("             PHASE 3: THREE-ADDRESS CODE (TAC)")
+            for item in items:
+                if item['tac']:
+                    lines.append(f"Input C Statement: {item['statement']}")
+                    lines.append("-" * 50)
+                    lines.extend(item['tac'])
+            before, after = optimization_totals(items)
+            if before:
+                lines.append("-" * 50)
+                lines.append(f"Optimized: {before} -> {after} TAC instructions "
+                             f"({100.0 * (before - after) / before:.1f}% fewer)")
+            for item in items:
+                for site in item['inlined_sites']:
+                    lines.append(f"Inlined: {site.callee} into {site.caller} at call {site.site} "
+                                 f"({site.quads} quads)")
+            self._lines(lines)
+        elif self.mode == 'jsonl':
+            records = [{"file": file_path, "phase": "tac", "item": number, "index": index,
+                        "instruction": instruction}
+                       for number, item in enumerate(items)
+                       for index, instruction in enumerate(item['tac'])]
+            records += [{"file": file_path, "phase": "tac", "item": number, "quads_before": item['quad_counts'][0],
+                         "quads_after": item['quad_counts'][1]}
+                        for number, item in enumerate(items) if item['quad_counts'] is not None]
+            records += [{"file": file_path, "phase": "tac", "item": number, "inlined": site.callee,
+                         "caller": site.caller, "site": site.site, "quads": site.quads}
+                        for number, item in enumerate(items) for site in item['inlined_sites']]
+            self._records(records)
+
+    def assembly(self, file_path, assembly, items=()):
+        fired = peephole_totals(items)
+        if self.mode == 'text':
+            lines = _banner("             PHASE 4: ASSEMBLY CODE GENERATION")
+            if assembly is None:
+                lines.append("Cannot generate Assembly: No TAC instructions provided.")
+            else:
+                lines.append("SECTION .data ; Variable Declarations (Simplified)")
+                lines.extend(assembly['data'])
+                if assembly['rodata']:
+                    lines.append("\nSECTION .rodata ; Constant Pool")
+                    lines.extend(assembly['rodata'])
+                lines.append("\nSECTION .text ; Program Code")
+                lines.extend(assembly['text'])
+            if fired:
+                lines.append("-" * 50)
+                lines.append("Peephole: " + ", ".join(f"{name} x{count}" for name, count in fired.most_common()))
+            self._lines(lines)
+        elif self.mode == 'jsonl' and assembly is not None:
+            records = [{"file": file_path, "phase": "assembly", "section": "data", "line": line.strip()}
+                       for line in assembly['data']]
+            records += [{"file": file_path, "phase": "assembly", "section": "rodata", "line": line.strip()}
+                        for line in assembly['rodata']]
+            records += [{"file": file_path, "phase": "assembly", "section": "text", "line": line.strip()}
+                        for line in assembly['text']]
+            records += [{"file": file_path, "phase": "assembly", "rule": name, "fired": count}
+                        for name, count in sorted(fired.items())]
+            self._records(records)
+
+    def unit(self, unit):
+        """Renders every phase result recorded on a CompilationUnit."""
+        if self.mode == 'silent':
+            return
+        self.tokens(unit.file_path, unit.tokens)
+        self.symbol_table(unit.file_path, unit.symbol_table)
+        self.tac(unit.file_path, unit.items)
+        self.assembly(unit.file_path, unit.assembly, unit.items)
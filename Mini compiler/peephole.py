@@ -0,0 +1,240 @@
+# peephole.py - Pattern-driven peephole optimization of the emitted assembly
+
+from collections import Counter
+
+# Condition code -> its negation, for rewriting a conditional jump
+NEGATED_CONDITION = {'E': 'NE', 'NE': 'E', 'L': 'GE', 'GE': 'L', 'G': 'LE', 'LE': 'G',
+                     'Z': 'NZ', 'NZ': 'Z', 'B': 'AE', 'AE': 'B', 'A': 'BE', 'BE': 'A'}
+# Full register -> every name that reads or writes part of it
+REGISTER_ALIASES = {'EAX': ('EAX', 'AX', 'AL', 'AH'), 'EBX': ('EBX', 'BX', 'BL', 'BH'),
+                    'ECX': ('ECX', 'CX', 'CL', 'CH'), 'EDX': ('EDX', 'DX', 'DL', 'DH'),
+                    'ESI': ('ESI', 'SI'), 'EDI': ('EDI', 'DI'), 'ESP': ('ESP', 'SP'), 'EBP': ('EBP', 'BP')}
+REGISTER_ALIASES.update({f"XMM{n}": (f"XMM{n}",) for n in range(8)})
+# Plain moves: MOV, and the scalar SSE moves of a float or double
+MOVES = ('MOV', 'MOVSS', 'MOVSD')
+
+
+class Instruction:
+    """One line of assembly: either a label or a mnemonic with operands.
+
+    The comment after ';' is kept so rewritten code stays readable.
+    """
+
+    __slots__ = ('label', 'mnemonic', 'operands', 'comment')
+
+    def __init__(self, label=None, mnemonic=None, operands=(), comment=None):
+        self.label = label
+        self.mnemonic = mnemonic
+        self.operands = operands
+        self.comment = comment
+
+    @classmethod
+    def parse(cls, line):
+        code, _, comment = line.partition(';')
+        code = code.strip()
+        comment = comment.strip() or None
+        if code.endswith(':'):
+            return cls(label=code[:-1], comment=comment)
+        mnemonic, _, operands = code.partition(' ')
+        return cls(mnemonic=mnemonic, operands=tuple(op.strip() for op in operands.split(',')) if operands else (),
+                   comment=comment)
+
+    def text(self):
+        if self.label is not None:
+            return f"{self.label}:"
+        code = f"  {self.mnemonic} {', '.join(self.operands)}" if self.operands else f"  {self.mnemonic}"
+        return f"{code}   ; {self.comment}" if self.comment else code
+
+    def is_move(self):
+        return self.mnemonic in MOVES
+
+    def same_move(self, other):
+        """Whether both are moves of the same width."""
+        return self.is_move() and self.mnemonic == other.mnemonic
+
+    def reads_flags(self):
+        mnemonic = self.mnemonic or ''
+        return mnemonic.startswith('SET') or mnemonic[0:1] == 'J' and mnemonic != 'JMP'
+
+
+def is_register(operand):
+    return operand in REGISTER_ALIASES
+
+
+def is_memory(operand):
+    return operand.endswith(']')
+
+
+def mentions(operand, register):
+    """Whether operand reads any part of register (directly or in an address)."""
+    words = operand.replace('[', ' ').replace(']', ' ').replace('+', ' ').replace('-', ' ').replace('*', ' ').split()
+    return any(word in REGISTER_ALIASES[register] for word in words)
+
+
+# --- Rules ---
+
+class PeepholeRule:
+    """A rewrite of `window` consecutive instructions.
+
+    apply(window) returns the replacement instructions, or None if the
+    pattern does not match. It is only tried on windows whose first
+    instruction has one of the mnemonics in starts. Unless labels is set,
+    windows that contain a label are skipped, since control can enter at
+    the label.
+    """
+
+    __slots__ = ('name', 'window', 'starts', 'apply', 'labels')
+
+    def __init__(self, name, window, starts, apply, labels=False):
+        self.name = name
+        self.window = window
+        self.starts = starts
+        self.apply = apply
+        self.labels = labels
+
+
+RULES = []
+CONDITIONAL_JUMPS = tuple('J' + condition for condition in NEGATED_CONDITION)
+SET_CONDITIONS = tuple('SET' + condition for condition in NEGATED_CONDITION)
+
+
+def rule(window, starts, labels=False):
+    """Registers the decorated function as a PeepholeRule named after it."""
+    def register(apply):
+        RULES.append(PeepholeRule(apply.__name__, window, starts, apply, labels))
+        return apply
+    return register
+
+
+@rule(1, MOVES)
+def self_move(window):
+    """MOV r, r  ==>  (nothing)"""
+    (move,) = window
+    if move.is_move() and move.operands[0] == move.operands[1]:
+        return []
+    return None
+
+
+@rule(2, MOVES)
+def store_load(window):
+    """MOV [m], r ; MOV s, [m]  ==>  MOV [m], r ; MOV s, r"""
+    store, load = window
+    if (store.same_move(load) and is_memory(store.operands[0])
+            and is_register(store.operands[1]) and load.operands[1] == store.operands[0]):
+        if load.operands[0] == store.operands[1]:
+            return [store]
+        return [store, Instruction(mnemonic=store.mnemonic, operands=(load.operands[0], store.operands[1]),
+                                   comment=load.comment)]
+    return None
+
+
+@rule(2, MOVES)
+def move_back(window):
+    """MOV a, b ; MOV b, a  ==>  MOV a, b"""
+    first, second = window
+    if (first.same_move(second) and first.operands == second.operands[::-1]
+            and not (is_memory(first.operands[0]) and is_memory(first.operands[1]))):
+        return [first]
+    return None
+
+
+@rule(2, MOVES)
+def overwritten_move(window):
+    """MOV d, x ; MOV d, y  ==>  MOV d, y   (when y does not read d)"""
+    first, second = window
+    if first.same_move(second) and first.operands[0] == second.operands[0]:
+        dest, source = first.operands[0], second.operands[1]
+        if is_register(dest) and not mentions(source, dest) or is_memory(dest) and source != dest:
+            return [second]
+    return None
+
+
+@rule(2, ('ADD', 'SUB', 'IMUL'))
+def useless_arithmetic(window):
+    """ADD r, 0 / SUB r, 0 / IMUL r, 1  ==>  (nothing), unless the flags are read next"""
+    first, following = window
+    if (len(first.operands) == 2 and not following.reads_flags()
+            and (first.mnemonic in ('ADD', 'SUB') and first.operands[1] == '0'
+                 or first.mnemonic == 'IMUL' and first.operands[1] == '1')):
+        return [following]
+    return None
+
+
+@rule(4, SET_CONDITIONS)
+def branch_on_flags(window):
+    """SETcc b ; MOVZX r, b ; CMP r, 0 ; JE L  ==>  SETcc b ; MOVZX r, b ; Jncc L
+
+    SETcc and MOVZX leave the flags alone, so the branch can test the
+    original comparison instead of its materialized 0/1. A float == or !=
+    is two SETcc joined by AND or OR, which changes the flags; the MOVZX
+    then follows the AND, not a SETcc, so such a sequence never matches,
+    and no single Jcc could test ZF and PF together anyway.
+    """
+    setcc, extend, compare, branch = window
+    if (extend.mnemonic == 'MOVZX' and extend.operands[1] == setcc.operands[0] and compare.mnemonic == 'CMP'
+            and compare.operands == (extend.operands[0], '0') and branch.mnemonic in ('JE', 'JNE')):
+        condition = setcc.mnemonic[3:]
+        if branch.mnemonic == 'JE':
+            condition = NEGATED_CONDITION.get(condition)
+        if condition is not None:
+            return [setcc, extend, Instruction(mnemonic='J' + condition, operands=branch.operands,
+                                               comment=branch.comment)]
+    return None
+
+
+@rule(2, ('JMP',) + CONDITIONAL_JUMPS, labels=True)
+def jump_to_next(window):
+    """JMP L ; L:  ==>  L:   (and Jcc L ; L:, which goes to L either way)"""
+    jump, label = window
+    if label.label is not None and jump.operands[0] == label.label:
+        return [label]
+    return None
+
+
+@rule(3, CONDITIONAL_JUMPS, labels=True)
+def branch_over_jump(window):
+    """Jcc L1 ; JMP L2 ; L1:  ==>  Jncc L2 ; L1:"""
+    branch, jump, label = window
+    if jump.mnemonic == 'JMP' and label.label is not None and branch.operands[0] == label.label:
+        negated = NEGATED_CONDITION[branch.mnemonic[1:]]
+        return [Instruction(mnemonic='J' + negated, operands=jump.operands, comment=branch.comment), label]
+    return None
+
+
+# --- Driver ---
+
+def peephole(text, rules=None):
+    """Rewrites a list of assembly lines until no rule matches any more.
+
+    Returns (new lines, Counter of rule name -> times fired). Label-free
+    rules never look across a label, so a rewrite cannot change what a
+    jump to that label executes.
+    """
+    rules = RULES if rules is None else rules
+    by_start = {}
+    for peephole_rule in rules:
+        for mnemonic in peephole_rule.starts:
+            by_start.setdefault(mnemonic, []).append(peephole_rule)
+    # A rewrite can complete a pattern that starts up to this many lines earlier
+    back = max((peephole_rule.window for peephole_rule in rules), default=1) - 1
+
+    code = [Instruction.parse(line) for line in text]
+    fired = Counter()
+    i = 0
+    while i < len(code):
+        for peephole_rule in by_start.get(code[i].mnemonic, ()):
+            end = i + peephole_rule.window
+            if end > len(code):
+                continue
+            window = code[i:end]
+            if not peephole_rule.labels and any(line.label is not None for line in window):
+                continue
+            replacement = peephole_rule.apply(window)
+            if replacement is not None:
+                code[i:end] = replacement
+                fired[peephole_rule.name] += 1
+                i = max(i - back, 0)
+                break
+        else:
+            i += 1
+    return [line.text() for line in code], fired
@@ -0,0 +1,365 @@
+# pycode.py - A second back end: TAC functions compiled into Python functions
+
+import math
+import re
+from array import array
+
+from dataflow import live_variables, members
+from folding import wrap_int
+from ir import (CONST, GLOBAL, OP_ADD, OP_CALL, OP_COPY, OP_DIV, OP_EQ, OP_GE, OP_GT, OP_IFFALSE, OP_JUMP, OP_LABEL,
+                OP_LE, OP_LT, OP_MUL, OP_NE, OP_NEG, OP_NOT, OP_PARAM, OP_RETURN, OP_SUB, TEMP, quad_uses)
+from vm import DOUBLE, FLOAT, INT, VMError, convert, divide, initial_value, kind_of
+
+# Each C function becomes a Python function f_<name> whose parameters,
+# locals and temps are Python locals, so CPython keeps them in fast
+# slots and its specializing interpreter sees plain int and float
+# arithmetic. C globals are module globals g_<name> of the namespace the
+# source is executed in. The values computed are the bytecode VM's: ints
+# wrap to 32 bits, floats are rounded to single precision through the
+# one-element array R, and an int division by zero raises.
+#
+# Python has no goto, so a function with labels runs as a loop over its
+# regions (the quads from one label to the next) with the region number
+# in b: a jump sets b and goes round again. A region that jumps back to
+# its own start, the shape a loop without branches in its body compiles
+# to, gets an inner while loop of its own and does not dispatch at all.
+
+PYTHON_OPERATORS = {OP_ADD: '+', OP_SUB: '-', OP_MUL: '*', OP_DIV: '/',
+                    OP_EQ: '==', OP_NE: '!=', OP_LT: '<', OP_GT: '>', OP_LE: '<=', OP_GE: '>='}
+COMPARES = frozenset((OP_EQ, OP_NE, OP_LT, OP_GT, OP_LE, OP_GE))
+INT_CHECK = "if not -2147483648 <= {0} <= 2147483647: {0} = wrap_int({0})"
+
+
+def python_name(value):
+    """The Python identifier for a local, parameter or temp."""
+    if value.kind == TEMP:
+        return f"t{value.id}"
+    return f"v{value.id}_{re.sub(r'[^0-9A-Za-z_]', '_', value.name)}"
+
+
+class FunctionTranslator:
+    """Writes the Python source for one IRFunction.
+
+    Operands are rendered as expressions: a name, a global, or a literal
+    already converted to the kind the operation computes in. Conversions
+    between kinds go through vm.convert, so the two back ends agree.
+    """
+
+    def __init__(self, function, functions, constants):
+        self.function = function
+        self.values = function.values
+        self.functions = functions
+        self.constants = constants      # name -> value, for literals Python cannot spell
+        self.stored_globals = set()
+        self.pending = []               # (value ID, expression) per PARAM not yet passed
+        self.spills = 0
+        self.uses = [0] * len(function.values)
+        for quad in function.quads:
+            for value_id in quad_uses(quad):
+                self.uses[value_id] += 1
+
+    # --- Operands ---
+
+    def literal(self, number):
+        if isinstance(number, float) and not math.isfinite(number):
+            name = f"K{len(self.constants)}"
+            self.constants[name] = number
+            return name
+        return repr(number)
+
+    def operand(self, value_id, kind):
+        """value_id as an expression of kind."""
+        value = self.values[value_id]
+        if value.kind == CONST:
+            return self.literal(convert(float(value.name) if '.' in value.name else int(value.name), kind))
+        text = f"g_{value.name}" if value.kind == GLOBAL else python_name(value)
+        return self.converted(text, kind_of(value.ctype), kind)
+
+    def own(self, value_id):
+        return self.operand(value_id, kind_of(self.values[value_id].ctype))
+
+    def converted(self, text, source, kind):
+        if source == kind or (source == FLOAT and kind == DOUBLE):
+            return text
+        if source == INT and kind == DOUBLE:
+            return f"float({text})"
+        return f"convert({text}, {kind})"
+
+    # --- Statements ---
+
+    def destination(self, dest, kind):
+        """The name an operation producing a kind value writes for dest."""
+        value = self.values[dest]
+        if value.kind != GLOBAL and kind_of(value.ctype) == kind:
+            return python_name(value)
+        return "r"
+
+    def store(self, lines, dest, name, kind):
+        """Moves a kind value in name into dest, converting it to dest's type."""
+        value = self.values[dest]
+        self.save_pending(lines, dest)
+        if value.kind == GLOBAL:
+            self.stored_globals.add(f"g_{value.name}")
+            lines.append(f"g_{value.name} = {self.converted(name, kind, kind_of(value.ctype))}")
+        elif name != python_name(value):
+            lines.append(f"{python_name(value)} = {self.converted(name, kind, kind_of(value.ctype))}")
+
+    def assign(self, lines, dest, expression, kind):
+        """dest = expression, where expression computes a kind value."""
+        name = self.destination(dest, kind)
+        self.save_pending(lines, dest)
+        lines.append(f"{name} = {expression}")
+        self.store(lines, dest, name, kind)
+
+    def save_pending(self, lines, dest):
+        """Copies argument dest of a pending PARAM aside before dest is overwritten."""
+        for index, (value_id, expression) in enumerate(self.pending):
+            if value_id == dest:
+                name = f"p{self.spills}"
+                self.spills += 1
+                lines.append(f"{name} = {expression}")
+                self.pending[index] = (-1, name)
+
+    def binary(self, lines, quad):
+        op = quad.op
+        kind = kind_of(self.values[quad.dest].ctype)
+        left = self.operand(quad.src1, kind)
+        right = self.operand(quad.src2, kind)
+        if kind == INT:
+            name = self.destination(quad.dest, INT)
+            self.save_pending(lines, quad.dest)
+            # Exact for 32-bit operands: the quotient's rounding error is below 1/|right|
+            if op == OP_DIV:
+                lines.append(f"{name} = int({left} / {right})")
+            else:
+                lines.append(f"{name} = {left} {PYTHON_OPERATORS[op]} {right}")
+            lines.append(INT_CHECK.format(name))
+            self.store(lines, quad.dest, name, INT)
+            return
+        if op == OP_DIV and not (self.values[quad.src2].kind == CONST and float(self.values[quad.src2].name)):
+            expression = f"{left} / {right} if {right} else divide({left}, {right})"
+        else:
+            expression = f"{left} {PYTHON_OPERATORS[op]} {right}"
+        if kind == FLOAT:
+            lines.append(f"R[0] = {expression}")
+            expression = "R[0]"
+        self.assign(lines, quad.dest, expression, kind)
+
+    def comparison(self, quad):
+        """The condition text of a compare quad, in the wider of its operands' kinds."""
+        types = (self.values[quad.src1].ctype, self.values[quad.src2].ctype)
+        kind = DOUBLE if 'double' in types else FLOAT if 'float' in types else INT
+        return f"{self.operand(quad.src1, kind)} {PYTHON_OPERATORS[quad.op]} {self.operand(quad.src2, kind)}"
+
+    # --- Regions ---
+
+    def regions(self):
+        """Splits the quads at labels: (regions, region number of each label).
+
+        Quads after a jump or return up to the next label are unreachable
+        and dropped.
+        """
+        regions = [[]]
+        region_of = {}
+        ended = False
+        for quad in self.function.quads:
+            if quad.op == OP_LABEL:
+                if regions[-1] or ended:
+                    regions.append([])
+                region_of[quad.dest] = len(regions) - 1
+                ended = False
+            elif not ended:
+                regions[-1].append(quad)
+                ended = quad.op in (OP_JUMP, OP_RETURN)
+        return regions, region_of
+
+    def region_body(self, number, quads, region_of, count, looping):
+        """The statements of one region, indented relative to its case."""
+        lines = []
+
+        def goto(label):
+            target = region_of[label]
+            if looping and target == number:
+                return ["continue"]
+            return [f"b = {target}", "break" if looping else "continue"]
+
+        skip = False
+        for i, quad in enumerate(quads):
+            if skip:
+                skip = False
+                continue
+            op = quad.op
+            if op == OP_JUMP:
+                lines.extend(goto(quad.dest))
+            elif op == OP_IFFALSE:
+                lines.append(f"if {self.own(quad.src1)} == 0:")
+                lines.extend("    " + line for line in goto(quad.dest))
+            elif op == OP_COPY:
+                self.assign(lines, quad.dest, self.operand(quad.src1, kind_of(self.values[quad.dest].ctype)),
+                            kind_of(self.values[quad.dest].ctype))
+            elif op in COMPARES:
+                following = quads[i + 1] if i + 1 < len(quads) else None
+                if following is not None and following.op == OP_IFFALSE and following.src1 == quad.dest \
+                        and self.values[quad.dest].kind == TEMP and self.uses[quad.dest] == 1:
+                    lines.append(f"if not {self.comparison(quad)}:")
+                    lines.extend("    " + line for line in goto(following.dest))
+                    skip = True
+                    continue
+                self.assign(lines, quad.dest, f"1 if {self.comparison(quad)} else 0", INT)
+            elif op in (OP_ADD, OP_SUB, OP_MUL, OP_DIV):
+                self.binary(lines, quad)
+            elif op == OP_NEG:
+                kind = kind_of(self.values[quad.dest].ctype)
+                source = self.operand(quad.src1, kind)
+                if kind == INT:
+                    name = self.destination(quad.dest, INT)
+                    self.save_pending(lines, quad.dest)
+                    lines.append(f"{name} = -{source}")
+                    lines.append(INT_CHECK.format(name))
+                    self.store(lines, quad.dest, name, INT)
+                else:
+                    self.assign(lines, quad.dest, f"-{source}", kind)
+            elif op == OP_NOT:
+                self.assign(lines, quad.dest, f"1 if {self.own(quad.src1)} == 0 else 0", INT)
+            elif op == OP_PARAM:
+                expression = self.own(quad.src1)
+                value = self.values[quad.src1]
+                if value.kind == GLOBAL:
+                    # The call may be preceded by others that change the global
+                    name = f"p{self.spills}"
+                    self.spills += 1
+                    lines.append(f"{name} = {expression}")
+                    expression = name
+                self.pending.append((quad.src1 if value.kind != CONST else -1, expression))
+            elif op == OP_CALL:
+                name = self.values[quad.src1].name
+                if name not in self.functions:
+                    raise VMError(f"call to undefined function '{name}' in {self.function.name}")
+                first = len(self.pending) - quad.src2
+                arguments = [expression for _, expression in self.pending[first:]]
+                del self.pending[first:]
+                call = f"f_{name}({', '.join(arguments)})"
+                if quad.dest < 0:
+                    lines.append(call)
+                else:
+                    self.assign(lines, quad.dest, call, kind_of(self.values[quad.dest].ctype))
+            elif op == OP_RETURN:
+                lines.append("return 0" if quad.src1 < 0 else f"return {self.own(quad.src1)}")
+
+        if not quads or quads[-1].op not in (OP_JUMP, OP_RETURN):
+            # Falling into the next region, or off the end of the function
+            if number + 1 < count:
+                lines.extend([f"b = {number + 1}", "break"] if looping else [f"b = {number + 1}"])
+            else:
+                lines.append("return 0")
+        elif not looping and lines[-1] == "continue":
+            lines.pop()                 # the end of the case goes round anyway
+        if looping:
+            lines = ["while True:"] + ["    " + line for line in lines]
+        return lines
+
+    def dispatch(self, bodies, first, last, indent, lines):
+        """Selects bodies[first:last] on b with a binary search of if statements."""
+        pad = " " * indent
+        if last - first == 1:
+            lines.extend(pad + line for line in bodies[first])
+        elif last - first <= 3:
+            for number in range(first, last):
+                keyword = "if" if number == first else "elif" if number < last - 1 else "else"
+                lines.append(f"{pad}{keyword} b == {number}:" if keyword != "else" else f"{pad}else:")
+                lines.extend(pad + "    " + line for line in bodies[number])
+        else:
+            middle = (first + last) // 2
+            lines.append(f"{pad}if b < {middle}:")
+            self.dispatch(bodies, first, middle, indent + 4, lines)
+            lines.append(f"{pad}else:")
+            self.dispatch(bodies, middle, last, indent + 4, lines)
+
+    def translate(self):
+        """The source of the function's def statement, as a list of lines."""
+        function = self.function
+        regions, region_of = self.regions()
+        bodies = []
+        for number, quads in enumerate(regions):
+            looping = any(quad.op in (OP_JUMP, OP_IFFALSE) and region_of[quad.dest] == number for quad in quads)
+            bodies.append(self.region_body(number, quads, region_of, len(regions), looping))
+
+        params = [python_name(self.values[param]) for param in function.params]
+        lines = [f"def f_{function.name}({', '.join(params)}):"]
+        if self.stored_globals:
+            lines.append(f"    global {', '.join(sorted(self.stored_globals))}")
+        # Locals some path reads before writing start at zero, as the VM's frame does
+        _, live_in, _ = live_variables(function)
+        for value_id in members(live_in[0]) if live_in else ():
+            if value_id not in function.params:
+                value = self.values[value_id]
+                lines.append(f"    {python_name(value)} = {0 if kind_of(value.ctype) == INT else 0.0}")
+        if len(bodies) == 1:
+            lines.extend("    " + line for line in bodies[0])
+        else:
+            lines.append("    b = 0")
+            lines.append("    while True:")
+            self.dispatch(bodies, 0, len(bodies), 8, lines)
+        return lines
+
+
+# --- Programs ---
+
+class PythonProgram:
+    """Every function of a compiled unit as a Python function, and its globals.
+
+    functions maps each C function's name to a callable Python function;
+    run() calls one and turns the errors the program can raise into
+    VMError. Globals keep their values between runs; reset() restores
+    the initial ones. Unlike the VM there is no step limit, and recursion
+    is bounded by Python's own.
+    """
+
+    def __init__(self, source, global_names, global_values, constants):
+        self.source = source
+        self.global_names = global_names
+        self.initial_globals = global_values
+        self.namespace = {'R': array('f', [0.0]), 'wrap_int': wrap_int, 'convert': convert, 'divide': divide}
+        self.namespace.update(constants)
+        self.reset()
+        exec(compile(source, "<mini-c>", "exec"), self.namespace)
+        self.functions = {name[2:]: value for name, value in self.namespace.items()
+                          if name.startswith("f_") and callable(value)}
+
+    @classmethod
+    def from_unit(cls, unit):
+        """Translates the functions and globals of a compiled CompilationUnit."""
+        names = []
+        values = []
+        for item in unit.items:
+            for symbol in item['globals']:
+                names.append(symbol.name)
+                values.append(initial_value(symbol.initial_value, symbol.type))
+        functions = [item['function'] for item in unit.items if item['function'] is not None]
+        defined = {function.name for function in functions}
+        constants = {}
+        lines = []
+        for function in functions:
+            lines.extend(FunctionTranslator(function, defined, constants).translate())
+            lines.append("")
+        return cls("\n".join(lines), names, values, constants)
+
+    def global_values(self):
+        """The current value of every global, by name."""
+        return {name: self.namespace[f"g_{name}"] for name in self.global_names}
+
+    def reset(self):
+        for name, value in zip(self.global_names, self.initial_globals):
+            self.namespace[f"g_{name}"] = value
+
+    def run(self, entry='main', args=()):
+        """Calls function entry with args; returns what it returns (0 for nothing)."""
+        function = self.functions.get(entry)
+        if function is None:
+            raise VMError(f"no function named '{entry}'")
+        try:
+            return function(*args)
+        except ZeroDivisionError:
+            raise VMError("integer division by zero") from None
+        except RecursionError:
+            raise VMError("call stack overflow") from None
@@ -0,0 +1,201 @@
+# regalloc.py - Liveness analysis and linear-scan register allocation
+
+from dataflow import live_variables, members, tracked_values
+from ir import OP_CALL, OP_DIV, is_float, quad_def, quad_uses
+
+REGISTERS = ('EAX', 'EBX', 'ECX', 'EDX', 'ESI', 'EDI')
+# Float and double values live in the low lane of an SSE register
+XMM_REGISTERS = tuple(f"XMM{n}" for n in range(8))
+# Registers with an addressable low byte, needed by SETcc
+BYTE_REGISTERS = ('EAX', 'EBX', 'ECX', 'EDX')
+# A callee must preserve these (and EBP); it may overwrite the others
+CALLEE_SAVED = ('EBX', 'ESI', 'EDI')
+# The first integer arguments of a call are passed in these, left to right
+ARGUMENT_REGISTERS = ('ECX', 'EDX')
+
+# Registers an instruction overwrites besides its destination
+CLOBBERS = {
+    OP_CALL: frozenset(('EAX', 'ECX', 'EDX') + XMM_REGISTERS),
+    OP_DIV: frozenset(('EAX', 'EDX')),      # CDQ / IDIV and the magic-number IMUL use EDX:EAX
+}
+
+
+def clobbers(quad, values):
+    """The registers quad overwrites besides its destination, or None."""
+    if quad.op == OP_DIV and is_float(values[quad.dest].ctype):
+        return None                         # DIVSS works in place
+    return CLOBBERS.get(quad.op)
+
+
+def argument_registers(ctypes):
+    """The register each argument of the given types is passed in, or None for one on the stack.
+
+    The first len(ARGUMENT_REGISTERS) int and char arguments take them in
+    order; float and double arguments, and any further ones, are pushed.
+    """
+    free = list(ARGUMENT_REGISTERS)
+    return [None if is_float(ctype) or not free else free.pop(0) for ctype in ctypes]
+
+
+# --- Liveness ---
+
+def liveness(function):
+    """Returns live_out, one set of value IDs per quad.
+
+    Only locals and temps are tracked; globals always live in memory.
+    Block-level sets come from the dataflow solver, then each block is
+    walked backwards to get per-quad sets.
+    """
+    quads = function.quads
+    tracked = tracked_values(function)
+    cfg, _, block_live_out = live_variables(function)
+
+    live_out = [None] * len(quads)
+    for index, (first, last) in enumerate(cfg.blocks):
+        live = set(members(block_live_out[index]))
+        for i in range(last - 1, first - 1, -1):
+            quad = quads[i]
+            live_out[i] = live
+            live = set(live)
+            dest = quad_def(quad)
+            live.discard(dest)
+            for value_id in quad_uses(quad):
+                if tracked[value_id]:
+                    live.add(value_id)
+    return live_out
+
+
+# --- Linear Scan ---
+
+class Interval:
+    __slots__ = ('value', 'start', 'end', 'forbidden', 'register', 'hint')
+
+    def __init__(self, value, start):
+        self.value = value
+        self.start = start
+        self.end = start
+        self.forbidden = set()
+        self.register = None
+        self.hint = None            # the register the value arrives in, if any
+
+
+class Allocation:
+    """Where each value lives: registers[value ID] is a register name or None (memory).
+
+    busy[i] is the set of registers holding a value whose interval covers
+    quad i; the code generator takes scratch registers from the rest.
+    saved lists the callee-saved registers the function must preserve.
+    """
+
+    __slots__ = ('registers', 'busy', 'saved', 'spilled')
+
+    def __init__(self, registers, busy, saved, spilled=0):
+        self.registers = registers
+        self.busy = busy
+        self.saved = saved
+        self.spilled = spilled
+
+
+def memory_allocation(function):
+    """Every value in memory: the allocation used when allocation is off."""
+    return Allocation([None] * len(function.values), [frozenset()] * len(function.quads), [])
+
+
+def build_intervals(function, live_out):
+    """One live interval per tracked value, in quad index space.
+
+    A value's interval runs from its first definition or use (parameters
+    from 0) to the last quad where it is used or live out. forbidden holds
+    the registers clobbered by a quad the value must survive, and EAX/EDX
+    for a divisor.
+    """
+    intervals = {}
+
+    def touch(value_id, i):
+        interval = intervals.get(value_id)
+        if interval is None:
+            intervals[value_id] = Interval(value_id, i)
+        elif i > interval.end:
+            interval.end = i
+
+    for param in function.params:
+        touch(param, 0)
+    tracked = tracked_values(function)
+    for i, quad in enumerate(function.quads):
+        for value_id in quad_uses(quad):
+            if tracked[value_id]:
+                touch(value_id, i)
+        dest = quad_def(quad)
+        if dest >= 0 and tracked[dest]:
+            touch(dest, i)
+        clobbered = clobbers(quad, function.values)
+        for value_id in live_out[i]:
+            touch(value_id, i)
+            if clobbered and value_id != dest:
+                intervals[value_id].forbidden |= clobbered
+        if quad.op == OP_DIV and clobbered and tracked[quad.src2]:
+            # IDIV cannot divide by EAX or EDX after CDQ has overwritten them
+            intervals[quad.src2].forbidden |= clobbered
+    return sorted(intervals.values(), key=lambda interval: (interval.start, interval.value))
+
+
+def linear_scan(intervals, registers):
+    """Assigns registers to intervals sorted by start; returns the number spilled."""
+    free = list(registers)
+    active = []     # sorted by end
+    spilled = 0
+
+    for interval in intervals:
+        while active and active[0].end < interval.start:
+            free.append(active.pop(0).register)
+
+        register = next((r for r in (interval.hint,) + registers if r in free and r not in interval.forbidden), None)
+        if register is not None:
+            free.remove(register)
+            interval.register = register
+        else:
+            victim = next((a for a in reversed(active)
+                           if a.register not in interval.forbidden and a.end > interval.end), None)
+            spilled += 1
+            if victim is None:
+                continue
+            interval.register = victim.register
+            victim.register = None
+            active.remove(victim)
+
+        position = len(active)
+        while position and active[position - 1].end > interval.end:
+            position -= 1
+        active.insert(position, interval)
+    return spilled
+
+
+def allocate_registers(function):
+    """Linear-scan allocation (Poletto and Sarkar), one scan per register class.
+
+    Integer values get REGISTERS and float values XMM_REGISTERS.
+    Intervals are visited by start point; a free register not forbidden
+    for the interval is taken, otherwise the interval ending furthest away
+    is spilled to memory, which frees its register if the current one may
+    use it. A parameter passed in a register keeps it when it can.
+    """
+    intervals = build_intervals(function, liveness(function))
+    values = function.values
+    incoming = argument_registers([values[param].ctype for param in function.params])
+    hints = dict(zip(function.params, incoming))
+    for interval in intervals:
+        interval.hint = hints.get(interval.value)
+    spilled = 0
+    for floats, registers in ((False, REGISTERS), (True, XMM_REGISTERS)):
+        spilled += linear_scan([interval for interval in intervals
+                                if is_float(values[interval.value].ctype) == floats], registers)
+
+    registers = [None] * len(function.values)
+    busy = [set() for _ in function.quads]
+    for interval in intervals:
+        if interval.register is not None:
+            registers[interval.value] = interval.register
+            for i in range(interval.start, min(interval.end, len(busy) - 1) + 1):
+                busy[i].add(interval.register)
+    saved = [register for register in CALLEE_SAVED if register in registers]
+    return Allocation(registers, busy, saved, spilled)
@@ -0,0 +1,637 @@
+# ssa.py - Static single assignment form: construction, sparse conditional constant and copy propagation, and the way back
+
+from cfg import CFG, remove_unreachable_blocks
+from dataflow import live_variables, members, tracked_values
+from folding import fold_binary, format_constant, parse_constant
+from ir import (BINARY_OPS, CONST, LOCAL, OP_CALL, OP_COPY, OP_IFFALSE, OP_JUMP, OP_LABEL, OP_NEG, OP_RETURN, TEMP, Quad,
+                quad_def, quad_uses)
+
+# In SSA form every local and temp has exactly one definition. Each
+# definition in the quads writes a fresh version of the value it used to
+# write (IRFunction.new_version), and where versions meet at a join a phi
+# picks the one for the edge control came in on. The original value ID
+# stands for whatever the value held on entry: a parameter's argument, or
+# nothing for a local read before it is written.
+#
+# Phis are kept beside the quads rather than in them, so the quad list
+# and its block ranges stay valid while the passes rewrite operands.
+
+
+class Phi:
+    """dest = phi(args): args[k] is the version flowing in from predecessors[block][k]."""
+
+    __slots__ = ('original', 'dest', 'args', 'block')
+
+    def __init__(self, original, block, count):
+        self.original = original
+        self.dest = original
+        self.args = [original] * count
+        self.block = block
+
+
+# --- Dominators ---
+
+def dominators(cfg):
+    """The immediate dominator of each block: -1 for unreachable blocks, 0 for the entry.
+
+    Cooper, Harvey and Kennedy's iterative algorithm: blocks are visited in
+    reverse postorder and a block's dominator is the intersection of its
+    processed predecessors' dominators, found by walking both up the tree
+    by postorder number until they meet. On reducible graphs it settles in
+    two passes.
+    """
+    order = cfg.postorder()
+    reachable = cfg.reachable()
+    number = [0] * len(cfg.blocks)
+    for position, index in enumerate(order):
+        number[index] = position
+    order = [index for index in reversed(order) if reachable[index] and index != 0]
+
+    idom = [-1] * len(cfg.blocks)
+    idom[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for index in order:
+            new = -1
+            for predecessor in cfg.predecessors[index]:
+                if idom[predecessor] < 0:
+                    continue
+                if new < 0:
+                    new = predecessor
+                    continue
+                other = predecessor
+                while new != other:
+                    while number[new] < number[other]:
+                        new = idom[new]
+                    while number[other] < number[new]:
+                        other = idom[other]
+            if idom[index] != new:
+                idom[index] = new
+                changed = True
+    return idom
+
+
+def dominance_frontiers(cfg, idom):
+    """frontier[b]: the blocks where b's dominance ends, a set per block.
+
+    For each join, every predecessor and its dominators up to (not
+    including) the join's immediate dominator have the join in their
+    frontier.
+    """
+    frontier = [set() for _ in cfg.blocks]
+    for index, predecessors in enumerate(cfg.predecessors):
+        if len(predecessors) < 2 or idom[index] < 0:
+            continue
+        for runner in predecessors:
+            while runner >= 0 and runner != idom[index] and index not in frontier[runner]:
+                frontier[runner].add(index)
+                runner = idom[runner]
+    return frontier
+
+
+# --- Construction ---
+
+class SSAForm:
+    """A function in SSA form: its quads, CFG and phis.
+
+    phis[b] lists the phis at the start of block b. first_version is the
+    first value ID renaming created; IDs below it are the originals.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        remove_unreachable_blocks(function)
+        cfg = CFG(function.quads)
+        if cfg.blocks and cfg.predecessors[0]:
+            # The entry must not be a join, or its phis would have nowhere to go
+            function.quads.insert(0, Quad(OP_LABEL, function.new_label()))
+            cfg = CFG(function.quads)
+        self.cfg = cfg
+        self.idom = dominators(cfg)
+        self.tracked = tracked_values(function)
+        self.phis = [[] for _ in cfg.blocks]
+        self.first_version = len(function.values)
+        self.originals = {}         # version -> original
+        self.dead = set()           # indexes of quads deleted since construction
+        # The edges control can take; the entry is entered from block -1
+        self.executable = {(-1, 0)} | {(index, successor) for index, successors in enumerate(cfg.successors)
+                                       for successor in successors}
+        if cfg.blocks:
+            self.place_phis()
+            self.rename()
+
+    def place_phis(self):
+        """Pruned placement: a phi for v goes on the iterated dominance
+        frontier of v's definitions, but only where v is live on entry."""
+        cfg = self.cfg
+        _, live_in, _ = live_variables(self.function, cfg)
+        crossing = 0
+        for live in live_in:
+            crossing |= live
+        sites = {}
+        for index, (first, last) in enumerate(cfg.blocks):
+            for quad in cfg.quads[first:last]:
+                dest = quad_def(quad)
+                if dest >= 0 and crossing >> dest & 1:
+                    sites.setdefault(dest, set()).add(index)
+
+        frontier = dominance_frontiers(cfg, self.idom)
+        for value_id in sorted(sites):
+            placed = set()
+            worklist = list(sites[value_id])
+            while worklist:
+                for join in frontier[worklist.pop()]:
+                    if join in placed or not live_in[join] >> value_id & 1:
+                        continue
+                    placed.add(join)
+                    self.phis[join].append(Phi(value_id, join, len(cfg.predecessors[join])))
+                    if join not in sites[value_id]:
+                        worklist.append(join)
+
+    def rename(self):
+        """Gives every definition a fresh version and points each use at the
+        version that reaches it, walking the dominator tree from the entry."""
+        function = self.function
+        cfg = self.cfg
+        quads = cfg.quads
+        tracked = self.tracked
+        children = [[] for _ in cfg.blocks]
+        for index, parent in enumerate(self.idom):
+            if index and parent >= 0:
+                children[parent].append(index)
+
+        current = {}                # original -> stack of versions in scope
+
+        def reaching(value_id):
+            versions = current.get(value_id)
+            return versions[-1] if versions else value_id
+
+        def define(original):
+            version = function.new_version(original)
+            self.originals[version] = original
+            current.setdefault(original, []).append(version)
+            defined.append(original)
+            return version
+
+        walk = [0]
+        while walk:
+            index = walk.pop()
+            if isinstance(index, list):     # leaving a block: its versions go out of scope
+                for original in index:
+                    current[original].pop()
+                continue
+
+            defined = []
+            for phi in self.phis[index]:
+                phi.dest = define(phi.original)
+            first, last = cfg.blocks[index]
+            for quad in quads[first:last]:
+                if quad.op in BINARY_OPS:
+                    quad.src2 = reaching(quad.src2)
+                if quad_uses(quad):
+                    quad.src1 = reaching(quad.src1)
+                dest = quad_def(quad)
+                if dest >= 0 and tracked[dest]:
+                    quad.dest = define(dest)
+            for successor in set(cfg.successors[index]):
+                for k, predecessor in enumerate(cfg.predecessors[successor]):
+                    if predecessor == index:
+                        for phi in self.phis[successor]:
+                            phi.args[k] = reaching(phi.original)
+            walk.append(defined)
+            walk.extend(children[index])
+
+
+# --- Sparse Conditional Constant Propagation ---
+
+# Lattice values: TOP (no definition evaluated yet), a literal text (the
+# value is always that constant), BOTTOM (it varies). A value only moves
+# down, from TOP to a constant to BOTTOM.
+TOP = 'top'
+BOTTOM = 'bottom'
+
+
+class ConstantPropagation:
+    """Sparse conditional constant propagation (Wegman and Zadeck).
+
+    Two worklists: CFG edges found executable, and SSA values whose
+    lattice value dropped. A block's quads are evaluated the first time an
+    edge into it becomes executable, and again whenever an operand drops;
+    a branch on a constant makes only one of its edges executable, so code
+    behind it is never evaluated and cannot spoil a phi with its values.
+    Constants are folded with the target's arithmetic, as in value
+    numbering.
+    """
+
+    def __init__(self, ssa):
+        self.ssa = ssa
+        function = ssa.function
+        self.values = values = function.values
+        # Originals hold what they had on entry (parameters, globals): unknown
+        self.lattice = [value.name if value.kind == CONST else BOTTOM for value in values[:ssa.first_version]]
+        self.lattice.extend([TOP] * (len(values) - ssa.first_version))
+
+        cfg = ssa.cfg
+        self.block_of = block_of = [0] * len(cfg.quads)
+        for index, (first, last) in enumerate(cfg.blocks):
+            for i in range(first, last):
+                block_of[i] = index
+        self.users = users = {}
+        for i, quad in enumerate(cfg.quads):
+            for value_id in quad_uses(quad):
+                users.setdefault(value_id, []).append(i)
+        for phis in ssa.phis:
+            for phi in phis:
+                for value_id in set(phi.args):
+                    users.setdefault(value_id, []).append(phi)
+
+        self.executable = set()     # (predecessor, block) edges
+        self.reached = [False] * len(cfg.blocks)
+        self.edges = [(-1, 0)] if cfg.blocks else []
+        self.changed = []
+
+    def run(self):
+        while True:
+            self.propagate()
+            # A branch on a value still TOP reads nothing defined; let it go both ways
+            undecided = [quad.src1 for i, quad in enumerate(self.ssa.cfg.quads)
+                         if quad.op == OP_IFFALSE and self.reached[self.block_of[i]]
+                         and self.lattice[quad.src1] == TOP]
+            if not undecided:
+                return self
+            for value_id in undecided:
+                self.lower(value_id, BOTTOM)
+
+    def propagate(self):
+        cfg = self.ssa.cfg
+        reached = self.reached
+        while self.edges or self.changed:
+            while self.edges:
+                edge = self.edges.pop()
+                if edge in self.executable:
+                    continue
+                self.executable.add(edge)
+                index = edge[1]
+                for phi in self.ssa.phis[index]:
+                    self.phi(phi)
+                if not reached[index]:
+                    reached[index] = True
+                    first, last = cfg.blocks[index]
+                    for i in range(first, last):
+                        self.quad(i)
+                    if cfg.quads[last - 1].op != OP_IFFALSE:
+                        self.edges.extend((index, successor) for successor in cfg.successors[index])
+            while self.changed:
+                for user in self.users.get(self.changed.pop(), ()):
+                    if isinstance(user, Phi):
+                        if reached[user.block]:
+                            self.phi(user)
+                    elif reached[self.block_of[user]]:
+                        self.quad(user)
+
+    def lower(self, value_id, new):
+        if self.lattice[value_id] != new:
+            self.lattice[value_id] = new
+            self.changed.append(value_id)
+
+    def number(self, value_id):
+        return parse_constant(self.lattice[value_id], self.values[value_id].ctype)
+
+    def phi(self, phi):
+        result = TOP
+        predecessors = self.ssa.cfg.predecessors[phi.block]
+        for predecessor, arg in zip(predecessors, phi.args):
+            if (predecessor, phi.block) not in self.executable:
+                continue
+            value = self.lattice[arg]
+            if value == TOP:
+                continue
+            if result == TOP:
+                result = value
+            elif result != value:
+                result = BOTTOM
+                break
+        self.lower(phi.dest, result)
+
+    def quad(self, i):
+        quad = self.ssa.cfg.quads[i]
+        op = quad.op
+        lattice = self.lattice
+        if op == OP_IFFALSE:
+            self.branch(i, quad)
+            return
+        dest = quad_def(quad)
+        if dest < 0 or dest < self.ssa.first_version:
+            return
+        if op == OP_CALL:
+            self.lower(dest, BOTTOM)
+            return
+        operands = [lattice[value_id] for value_id in quad_uses(quad)]
+        if BOTTOM in operands:
+            self.lower(dest, BOTTOM)
+            return
+        if TOP in operands:
+            return
+        ctype = self.values[dest].ctype
+        if op == OP_COPY:
+            text = format_constant(self.number(quad.src1), ctype)
+        elif op in BINARY_OPS:
+            text = fold_binary(op, self.number(quad.src1), self.number(quad.src2), ctype)
+        else:
+            value = self.number(quad.src1)
+            text = format_constant(-value if op == OP_NEG else int(not value), ctype)
+        self.lower(dest, BOTTOM if text is None else text)
+
+    def branch(self, i, quad):
+        condition = self.lattice[quad.src1]
+        if condition == TOP:
+            return
+        index = self.block_of[i]
+        successors = self.ssa.cfg.successors[index]
+        if condition == BOTTOM:
+            self.edges.extend((index, successor) for successor in successors)
+        elif self.number(quad.src1) == 0:
+            self.edges.append((index, successors[0]))
+        elif len(successors) > 1:
+            self.edges.append((index, successors[1]))
+
+    def apply(self):
+        """Rewrites the function with what was found: uses of constant values
+        read the constant, constant branches become jumps or disappear, and
+        blocks no executable edge reaches are marked dead."""
+        ssa = self.ssa
+        function = ssa.function
+        cfg = ssa.cfg
+        lattice = self.lattice
+        values = self.values
+        constants = {}
+
+        def constant(value_id):
+            text = lattice[value_id]
+            if text == TOP or text == BOTTOM or values[value_id].kind == CONST:
+                return value_id
+            found = constants.get(value_id)
+            if found is None:
+                found = constants[value_id] = function.constant(text, values[value_id].ctype)
+            return found
+
+        ssa.executable = self.executable
+        folded = 0
+        for index, (first, last) in enumerate(cfg.blocks):
+            if not self.reached[index]:
+                ssa.dead.update(range(first, last))
+                ssa.phis[index] = []
+                continue
+            ssa.phis[index] = [phi for phi in ssa.phis[index] if constant(phi.dest) == phi.dest]
+            for phi in ssa.phis[index]:
+                # An argument on an edge never taken is dropped
+                phi.args = [constant(arg) if (predecessor, index) in self.executable else None
+                            for predecessor, arg in zip(cfg.predecessors[index], phi.args)]
+            for i in range(first, last):
+                quad = cfg.quads[i]
+                if quad.op in BINARY_OPS:
+                    quad.src2 = constant(quad.src2)
+                if quad_uses(quad):
+                    quad.src1 = constant(quad.src1)
+                dest = quad_def(quad)
+                if dest >= 0 and quad.op != OP_CALL and constant(dest) != dest \
+                        and (quad.op != OP_COPY or quad.src1 != constants[dest]):
+                    quad.op = OP_COPY
+                    quad.src1 = constants[dest]
+                    quad.src2 = -1
+                    folded += 1
+                elif quad.op == OP_IFFALSE and values[quad.src1].kind == CONST:
+                    if parse_constant(values[quad.src1].name, values[quad.src1].ctype) == 0:
+                        quad.op = OP_JUMP       # always taken
+                        quad.src1 = -1
+                    else:
+                        ssa.dead.add(i)         # never taken
+                    folded += 1
+        return folded
+
+
+# --- Copy Propagation ---
+
+def propagate_copies(ssa):
+    """Makes every use of a copy read the copy's source instead.
+
+    In SSA form neither side of 'x = y' is written again, so x can be
+    replaced by y everywhere. Only copies between values of the same type
+    go (a copy between types converts), and never from a global, which a
+    call or store may change. A phi whose arguments are all one value (or
+    the phi itself, around a loop) is such a copy too. The copies are left
+    for dead-code elimination. Returns the number of values replaced.
+    """
+    function = ssa.function
+    values = function.values
+    quads = ssa.cfg.quads
+    alias = {}
+
+    def find(value_id):
+        while value_id in alias:
+            value_id = alias[value_id]
+        return value_id
+
+    def replaceable(dest, source):
+        return source != dest and values[source].kind in (LOCAL, TEMP) and values[source].ctype == values[dest].ctype
+
+    copies = [quad for i, quad in enumerate(quads) if quad.op == OP_COPY and i not in ssa.dead]
+    changed = True
+    while changed:
+        changed = False
+        for quad in copies:
+            if quad.dest not in alias and quad.dest >= ssa.first_version:
+                source = find(quad.src1)
+                if replaceable(quad.dest, source):
+                    alias[quad.dest] = source
+                    changed = True
+        for phis in ssa.phis:
+            for phi in phis:
+                if phi.dest not in alias:
+                    sources = {find(arg) for arg in phi.args if arg is not None} - {phi.dest}
+                    if len(sources) == 1:
+                        source = sources.pop()
+                        if replaceable(phi.dest, source):
+                            alias[phi.dest] = source
+                            changed = True
+    if not alias:
+        return 0
+
+    mapping = {value_id: find(value_id) for value_id in alias}
+    for quad in quads:
+        if quad.op in BINARY_OPS:
+            quad.src2 = mapping.get(quad.src2, quad.src2)
+        if quad_uses(quad):
+            quad.src1 = mapping.get(quad.src1, quad.src1)
+    for index, phis in enumerate(ssa.phis):
+        ssa.phis[index] = [phi for phi in phis if phi.dest not in mapping]
+        for phi in ssa.phis[index]:
+            phi.args = [mapping.get(arg, arg) for arg in phi.args]
+    return len(mapping)
+
+
+# --- Deconstruction ---
+
+def sequential_copies(function, copies):
+    """Quads performing the (dest, source) copies as if all at once.
+
+    A copy waits until no other pending copy still reads its destination;
+    when every pending destination is still read, they form cycles, and
+    one destination is saved in a new temp to break one.
+    """
+    pending = [(dest, source) for dest, source in copies if dest != source]
+    quads = []
+    while pending:
+        sources = {source for _, source in pending}
+        ready = [(dest, source) for dest, source in pending if dest not in sources]
+        if ready:
+            quads.extend(Quad(OP_COPY, dest, source) for dest, source in ready)
+            pending = [(dest, source) for dest, source in pending if dest in sources]
+            continue
+        saved = pending[0][0]
+        temp = function.new_temp(function.values[saved].ctype)
+        quads.append(Quad(OP_COPY, temp, saved))
+        pending = [(dest, temp if source == saved else source) for dest, source in pending]
+    return quads
+
+
+def deconstruct(ssa):
+    """Replaces the phis with copies at the end of the predecessors and
+    merges the versions of each value back together where they do not
+    interfere.
+
+    The copies for edge p -> b go before p's closing jump, or after its
+    branch for the edge it falls through. For the edge a branch takes they
+    go in a new block at the end of the function that jumps on to b, and
+    the branch is pointed at it. Blocks no executable edge reaches are
+    dropped.
+    """
+    function = ssa.function
+    cfg = ssa.cfg
+    quads = cfg.quads
+    executable = ssa.executable
+
+    def edge_copies(index, successor):
+        k = cfg.predecessors[successor].index(index)
+        return sequential_copies(function, [(phi.dest, phi.args[k]) for phi in ssa.phis[successor]])
+
+    result = []
+    edge_blocks = []
+    for index, (first, last) in enumerate(cfg.blocks):
+        if not any((predecessor, index) in executable for predecessor in cfg.predecessors[index] or (-1,)):
+            continue
+        body = [quads[i] for i in range(first, last) if i not in ssa.dead]
+        end = body[-1] if body else None
+        successors = [successor for successor in cfg.successors[index] if (index, successor) in executable]
+        if end is not None and end.op == OP_IFFALSE and len(successors) == 2 and successors[0] == successors[1]:
+            end.op = OP_JUMP        # both ways lead to the same block
+            end.src1 = -1
+            successors.pop()
+        if end is not None and end.op == OP_IFFALSE:
+            target, rest = successors[0], successors[1:]
+            copies = edge_copies(index, target)
+            if copies:
+                label = function.new_label()
+                edge_blocks.append(Quad(OP_LABEL, label))
+                edge_blocks.extend(copies)
+                edge_blocks.append(Quad(OP_JUMP, end.dest))
+                end.dest = label
+            for successor in rest:
+                body.extend(edge_copies(index, successor))
+        elif successors:
+            copies = edge_copies(index, successors[0])
+            if end is not None and end.op == OP_JUMP:
+                body[-1:-1] = copies
+            else:
+                body.extend(copies)
+        result.extend(body)
+    if edge_blocks:
+        if result and result[-1].op != OP_JUMP and result[-1].op != OP_RETURN:
+            result.append(Quad(OP_RETURN))
+        result.extend(edge_blocks)
+    function.quads = result
+    merge_versions(ssa)
+
+
+def merge_versions(ssa):
+    """Renames the versions of each value back to as few values as possible.
+
+    Two versions of one value interfere if one is written while the other
+    is live, unless the write copies the other (both then hold the same
+    value). Versions are merged greedily, the original first, into the
+    first group none of whose members they interfere with; the copies
+    between members of one group then vanish.
+    """
+    function = ssa.function
+    if not ssa.originals:
+        return
+    versions = {}           # original -> the set of it and its versions
+    for version, root in ssa.originals.items():
+        versions.setdefault(root, {root}).add(version)
+    # A value written once whose original is never read needs no check
+    read = set(function.params)
+    for quad in function.quads:
+        read.update(quad_uses(quad))
+    for root in [root for root, group in versions.items() if len(group) == 2 and root not in read]:
+        del versions[root]
+    of = {value_id: group for group in versions.values() for value_id in group}
+
+    interference = {}
+    if of:
+        cfg, _, live_out = live_variables(function)
+        quads = function.quads
+        for index, (first, last) in enumerate(cfg.blocks):
+            live = {value_id for value_id in members(live_out[index]) if value_id in of}
+            for i in range(last - 1, first - 1, -1):
+                quad = quads[i]
+                dest = quad_def(quad)
+                if dest in of:
+                    live.discard(dest)
+                    for value_id in live & of[dest]:
+                        if quad.op != OP_COPY or quad.src1 != value_id:
+                            interference.setdefault(dest, set()).add(value_id)
+                            interference.setdefault(value_id, set()).add(dest)
+                for value_id in quad_uses(quad):
+                    if value_id in of:
+                        live.add(value_id)
+
+    groups = {}             # original -> [(representative, members)]
+    mapping = {}
+    for version in sorted(ssa.originals):
+        root = ssa.originals[version]
+        if root not in groups:
+            groups[root] = [(root, {root})]
+        neighbours = interference.get(version, set())
+        for representative, group in groups[root]:
+            if not neighbours & group:
+                group.add(version)
+                mapping[version] = representative
+                break
+        else:
+            groups[root].append((version, {version}))
+
+    kept = []
+    for quad in function.quads:
+        if quad.op in BINARY_OPS:
+            quad.src2 = mapping.get(quad.src2, quad.src2)
+        if quad_uses(quad):
+            quad.src1 = mapping.get(quad.src1, quad.src1)
+        if quad_def(quad) >= 0:
+            quad.dest = mapping.get(quad.dest, quad.dest)
+            if quad.op == OP_COPY and quad.src1 == quad.dest:
+                continue
+        kept.append(quad)
+    function.quads = kept
+
+
+def optimize_ssa(function):
+    """Builds SSA form for function, propagates constants and copies through
+    it and translates it back, in place. Returns the number of quads
+    folded to constants or decided branches plus values replaced by copies.
+    """
+    ssa = SSAForm(function)
+    changed = ConstantPropagation(ssa).run().apply()
+    changed += propagate_copies(ssa)
+    deconstruct(ssa)
+    return changed
@@ -0,0 +1,151 @@
+# symtab.py - Scoped symbol table with interned identifiers
+
+DATA_TYPES = ('int', 'float', 'double', 'char', 'void')
+
+# Symbol kinds
+VARIABLE = 'Variable'
+FUNCTION = 'Function'
+PARAMETER = 'Parameter'
+
+
+class Symbol:
+    """One declaration. id is its index in SymbolTable.symbols."""
+
+    __slots__ = ('id', 'name_id', 'name', 'type', 'kind', 'scope', 'initial_value', 'params', 'defined')
+
+    def __init__(self, id, name_id, name, type, kind, scope, initial_value=None):
+        self.id = id
+        self.name_id = name_id
+        self.name = name
+        self.type = type
+        self.kind = kind
+        self.scope = scope
+        self.initial_value = initial_value
+        # Parameter symbols of a function, in order
+        self.params = [] if kind == FUNCTION else None
+        # Whether a function's body has been seen
+        self.defined = False
+
+    def __repr__(self):
+        return f"Symbol({self.id}, {self.name!r}, {self.type}, {self.kind}, scope={self.scope})"
+
+
+class Scope:
+    """One block: a hash table from interned name ID to the Symbol declared there."""
+
+    __slots__ = ('id', 'parent', 'name', 'depth', 'symbols')
+
+    def __init__(self, id, parent, name):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.symbols = {}
+
+
+class SymbolTable:
+    """Chain of per-block hash tables with push/pop and O(1) lookup.
+
+    Identifiers are interned to small integer IDs. Besides the per-scope
+    tables, every name ID has a stack of the symbols currently in view;
+    push/pop maintain it, so lookup from any scope is a single index
+    instead of a walk up the scope chain. Scopes and symbols are kept after
+    they are popped, so later phases can refer to them by ID.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.name_ids = {}
+        self.symbols = []
+        self.scopes = []
+        self.bindings = []
+        self.errors = []
+        self.current = None
+        self.push('global')
+
+    # --- Interning ---
+
+    def intern(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.name_ids[name] = name_id
+            self.names.append(name)
+            self.bindings.append([])
+        return name_id
+
+    # --- Scopes ---
+
+    def push(self, name=None):
+        """Opens a block nested in the current one and returns it."""
+        scope = Scope(len(self.scopes), self.current, name)
+        if scope.name is None:
+            scope.name = f"{self.current.name}.block{scope.id}"
+        self.scopes.append(scope)
+        self.current = scope
+        return scope
+
+    def pop(self):
+        """Closes the current block; its names go out of view."""
+        scope = self.current
+        for name_id in scope.symbols:
+            self.bindings[name_id].pop()
+        self.current = scope.parent
+        return scope
+
+    @property
+    def global_scope(self):
+        return self.scopes[0]
+
+    # --- Declarations and Lookup ---
+
+    def declare(self, name, type, kind, initial_value=None, definition=False):
+        """Declares name in the current scope and returns its Symbol.
+
+        A second declaration in the same scope is recorded in errors and
+        the first Symbol is returned; shadowing an outer scope is allowed.
+        A function may be declared again (a prototype, then its definition),
+        but defined only once: definition marks a declaration with a body.
+        """
+        name_id = self.intern(name)
+        scope = self.current
+        existing = scope.symbols.get(name_id)
+        if existing is not None:
+            if not (kind == FUNCTION and existing.kind == FUNCTION):
+                self.errors.append(f"Redeclaration of '{name}' in scope '{scope.name}'")
+            elif definition and existing.defined:
+                self.errors.append(f"Redefinition of function '{name}' in scope '{scope.name}'")
+            existing.defined = existing.defined or definition
+            return existing
+
+        symbol = Symbol(len(self.symbols), name_id, name, type, kind, scope.id, initial_value)
+        symbol.defined = definition
+        self.symbols.append(symbol)
+        scope.symbols[name_id] = symbol
+        self.bindings[name_id].append(symbol)
+        return symbol
+
+    def lookup(self, name):
+        """The Symbol name refers to from the current scope, or None."""
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            return None
+        visible = self.bindings[name_id]
+        return visible[-1] if visible else None
+
+    def lookup_id(self, name_id):
+        visible = self.bindings[name_id]
+        return visible[-1] if visible else None
+
+    def lookup_global(self, name):
+        name_id = self.name_ids.get(name)
+        return None if name_id is None else self.global_scope.symbols.get(name_id)
+
+    def scope_name(self, symbol):
+        return self.scopes[symbol.scope].name
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self):
+        return iter(self.symbols)
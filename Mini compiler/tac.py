@@ -0,0 +1,228 @@
+# tac.py - Three-address code generation from the AST
+
+from cparser import Assign, Binary, Block, Call, DeclStmt, ExprStmt, For, If, IncDec, Name, Num, Return, Unary, While
+from dag import ExpressionDAG
+from ir import (BINARY_OPCODES, OP_ADD, OP_CALL, OP_COPY, OP_IFFALSE, OP_JUMP, OP_LABEL, OP_PARAM, OP_RETURN,
+                OP_SUB, UNARY_OPCODES, IRFunction, is_float)
+from symtab import FUNCTION
+
+
+def is_temp_name(name):
+    return len(name) > 1 and name[0] == 't' and name[1:].isdigit()
+
+
+def is_pure(node):
+    """True if evaluating node has no side effects: it is built from names, numbers and operators only."""
+    if isinstance(node, Binary):
+        return is_pure(node.left) and is_pure(node.right)
+    if isinstance(node, Unary):
+        return is_pure(node.operand)
+    return isinstance(node, (Name, Num))
+
+
+class TACGenerator:
+    """Translates one function at a time into an IRFunction.
+
+    Temps (t1, t2, ...) and labels (L1, L2, ...) are numbered per function,
+    so a function's TAC depends only on its own body and the globals it
+    uses. Locals keep their source name unless that would clash with a
+    global, a temp or an earlier local of the same function; those are
+    suffixed with '.k', which cannot occur in a C identifier.
+
+    With ordered set, an expression without side effects is built into an
+    ExpressionDAG and its operations are emitted in Sethi-Ullman order,
+    deepest operand first, with each repeated subexpression computed
+    once. Otherwise every expression is evaluated left to right.
+    """
+
+    def __init__(self, symbol_table, ordered=True):
+        self.table = symbol_table
+        self.ordered = ordered
+
+    # --- Names ---
+
+    def value_of(self, symbol_id, name):
+        """The value ID a resolved (or, for symbol_id -1, unresolved) name refers to."""
+        ir = self.current
+        if symbol_id < 0:
+            return ir.global_value(name, 'int')
+        local = ir.local(symbol_id)
+        if local is not None:
+            return local
+        symbol = self.table.symbols[symbol_id]
+        if symbol.scope == self.table.global_scope.id:
+            return ir.global_value(symbol.name, symbol.type, symbol.id)
+        return self.declare_local(symbol)
+
+    def declare_local(self, symbol):
+        name = symbol.name
+        if name in self.taken or is_temp_name(name) or self.table.lookup_global(name) is not None:
+            self.suffix += 1
+            name = f"{symbol.name}.{self.suffix}"
+        self.taken.add(name)
+        return self.current.new_local(name, symbol.type, symbol.id)
+
+    def convert(self, value_id, ctype):
+        """value_id as a value of ctype; a copy into a temp of that type converts it."""
+        ir = self.current
+        source = ir.values[value_id].ctype
+        if source == ctype or not (is_float(source) or is_float(ctype)):
+            return value_id
+        temp = ir.new_temp(ctype)
+        ir.emit(OP_COPY, temp, value_id)
+        return temp
+
+    # --- Functions ---
+
+    def function(self, node):
+        ir = self.current = IRFunction(node.name)
+        self.return_type = node.type
+        self.suffix = 0
+        self.taken = set()
+
+        for param in node.params:
+            ir.params.append(self.declare_local(self.table.symbols[param.symbol]))
+        self.block(node.body)
+        if not ir.quads or ir.quads[-1].op != OP_RETURN:
+            ir.emit(OP_RETURN)
+        return ir
+
+    # --- Statements ---
+
+    def statement(self, node):
+        ir = self.current
+        if isinstance(node, ExprStmt):
+            self.expression(node.expr, want_value=False)
+        elif isinstance(node, DeclStmt):
+            for decl in node.decls:
+                target = self.declare_local(self.table.symbols[decl.symbol])
+                if decl.init is not None:
+                    ir.emit(OP_COPY, target, self.expression(decl.init))
+        elif isinstance(node, Block):
+            self.block(node)
+        elif isinstance(node, Return):
+            value = -1 if node.value is None else self.convert(self.expression(node.value), self.return_type)
+            ir.emit(OP_RETURN, src1=value)
+        elif isinstance(node, If):
+            orelse = ir.new_label()
+            ir.emit(OP_IFFALSE, orelse, self.expression(node.cond))
+            self.statement(node.then)
+            if node.orelse is None:
+                ir.emit(OP_LABEL, orelse)
+            else:
+                end = ir.new_label()
+                ir.emit(OP_JUMP, end)
+                ir.emit(OP_LABEL, orelse)
+                self.statement(node.orelse)
+                ir.emit(OP_LABEL, end)
+        elif isinstance(node, While):
+            top, end = ir.new_label(), ir.new_label()
+            ir.emit(OP_LABEL, top)
+            ir.emit(OP_IFFALSE, end, self.expression(node.cond))
+            self.statement(node.body)
+            ir.emit(OP_JUMP, top)
+            ir.emit(OP_LABEL, end)
+        elif isinstance(node, For):
+            if node.init is not None:
+                self.statement(node.init)
+            top, end = ir.new_label(), ir.new_label()
+            ir.emit(OP_LABEL, top)
+            if node.cond is not None:
+                ir.emit(OP_IFFALSE, end, self.expression(node.cond))
+            self.statement(node.body)
+            if node.step is not None:
+                self.expression(node.step, want_value=False)
+            ir.emit(OP_JUMP, top)
+            ir.emit(OP_LABEL, end)
+
+    def block(self, node):
+        for stmt in node.stmts:
+            self.statement(stmt)
+
+    # --- Expressions ---
+
+    def expression(self, node, want_value=True):
+        """Emits quads for node and returns the value ID holding its result."""
+        ir = self.current
+        if isinstance(node, Num):
+            return ir.constant(node.value, node.ctype)
+
+        if isinstance(node, Name):
+            return self.value_of(node.symbol, node.name)
+
+        if self.ordered and isinstance(node, (Binary, Unary)) and is_pure(node):
+            return self.evaluate(node)
+
+        if isinstance(node, Binary):
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            temp = ir.new_temp(node.ctype)
+            ir.emit(BINARY_OPCODES[node.op], temp, left, right)
+            return temp
+
+        if isinstance(node, Unary):
+            operand = self.expression(node.operand)
+            temp = ir.new_temp(node.ctype)
+            ir.emit(UNARY_OPCODES[node.op], temp, operand)
+            return temp
+
+        if isinstance(node, Assign):
+            target = self.value_of(node.target.symbol, node.target.name)
+            ir.emit(OP_COPY, target, self.expression(node.value))
+            return target
+
+        if isinstance(node, IncDec):
+            target = self.value_of(node.target.symbol, node.target.name)
+            result = target
+            if want_value and not node.prefix:
+                result = ir.new_temp(node.ctype)
+                ir.emit(OP_COPY, result, target)
+            ir.emit(OP_ADD if node.op == '+' else OP_SUB, target, target, ir.constant('1', 'int'))
+            return result
+
+        if isinstance(node, Call):
+            args = [self.expression(arg) for arg in node.args]
+            symbol = self.table.symbols[node.symbol] if node.symbol >= 0 else None
+            if symbol is not None and symbol.kind == FUNCTION:
+                # Arguments are converted to the parameter types, as by assignment
+                params = [param.type for param in symbol.params]
+                args = [self.convert(arg, ctype) for arg, ctype in zip(args, params)] + args[len(params):]
+            for arg in args:
+                ir.emit(OP_PARAM, src1=arg)
+            callee = ir.global_value(node.name, node.ctype, node.symbol)
+            temp = ir.new_temp(node.ctype) if want_value else -1
+            ir.emit(OP_CALL, temp, callee, len(args))
+            return temp
+
+        raise TypeError(f"Unexpected expression node {type(node).__name__}")
+
+    def evaluate(self, node):
+        """Emits a side-effect-free expression from its DAG, in Sethi-Ullman order."""
+        ir = self.current
+        dag = ExpressionDAG()
+        root = self.build(dag, node)
+        for operation in dag.order(root):
+            operation.value = ir.new_temp(operation.ctype)
+            ir.emit(operation.op, operation.value, operation.left.value,
+                    -1 if operation.right is None else operation.right.value)
+        return root.value
+
+    def build(self, dag, node):
+        if isinstance(node, Num):
+            return dag.leaf(self.current.constant(node.value, node.ctype))
+        if isinstance(node, Name):
+            return dag.leaf(self.value_of(node.symbol, node.name))
+        if isinstance(node, Binary):
+            return dag.operation(BINARY_OPCODES[node.op], node.ctype,
+                                 self.build(dag, node.left), self.build(dag, node.right))
+        return dag.operation(UNARY_OPCODES[node.op], node.ctype, self.build(dag, node.operand))
+
+
+def global_tac(node, symbol_table):
+    """TAC for a top-level declaration: one static initializer per declarator."""
+    code = []
+    for decl in node.decls:
+        value = symbol_table.symbols[decl.symbol].initial_value
+        if value is not None:
+            code.append(f"{decl.name} = {value}")
+    return code
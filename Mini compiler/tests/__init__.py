@@ -0,0 +1,3 @@
+# tests - Unit and differential tests for the compiler phases
+#
+# Run from the "Mini compiler" directory: python -m unittest discover tests
@@ -0,0 +1,42 @@
+# support.py - Helpers shared by the tests
+
+from main import CompilationUnit, build_symbol_table, compile_unit, generate_tac, optimize_tac, syntax_analysis
+
+
+def compile_source(c_code, file_path="<test>"):
+    """Runs every phase over c_code and returns the CompilationUnit."""
+    return compile_unit(CompilationUnit(file_path, c_code))
+
+
+def analyzed(c_code):
+    """A unit parsed and with its symbol table built, ready for TAC generation."""
+    unit = CompilationUnit("<test>", c_code)
+    syntax_analysis(unit)
+    build_symbol_table(unit)
+    return unit
+
+
+def optimized(c_code, inline=True):
+    """A unit whose functions have been translated to TAC and optimized."""
+    unit = analyzed(c_code)
+    generate_tac(unit)
+    optimize_tac(unit, inline)
+    return unit
+
+
+def function_named(unit, name):
+    return next(item['function'] for item in unit.items
+                if item['function'] is not None and item['function'].name == name)
+
+
+def run_vm(unit):
+    """What main() returns in the bytecode VM."""
+    from vm import Program
+    return Program.from_unit(unit).run()
+
+
+def run_x86(unit):
+    """(what main() returns, the Machine it ran on) for the unit's assembly."""
+    from tests.x86 import Machine
+    machine = Machine(unit.assembly)
+    return machine.run(), machine
@@ -0,0 +1,129 @@
+import unittest
+
+import codegen
+from codegen import StackFrame, constant_pool, pool_constant
+from regalloc import CALLEE_SAVED, argument_registers, memory_allocation
+from tests.support import compile_source, function_named, optimized, run_vm, run_x86
+from tests.x86 import STACK_TOP, Machine
+
+
+def function_text(unit, name):
+    """The lines of unit's assembly from name's label to the next function's."""
+    text = unit.assembly['text']
+    start = text.index(f"{name}:")
+    end = next((i for i in range(start + 1, len(text)) if text[i].endswith(':') and not text[i].startswith('.')),
+               len(text))
+    return text[start:end]
+
+
+class ConstantPoolTest(unittest.TestCase):
+    SOURCE = """float scale(float v) { return v * 0.1; }
+float exact(float v) { return v * 0.10000000149011612; }
+int main() { return scale(100.0) + exact(200.0) + 0.1 * 50.0; }
+"""
+
+    def test_same_bits_written_two_ways_share_one_entry(self):
+        self.assertEqual(pool_constant('0.1', 'float')[0], pool_constant('0.10000000149011612', 'float')[0])
+        unit = compile_source(self.SOURCE)
+        labels = [line.split()[0] for line in unit.assembly['rodata'] if not line.split()[0] == 'align']
+        self.assertEqual(len(labels), len(set(labels)))
+        self.assertIn('float@3DCCCCCD', labels)
+
+    def test_two_functions_sharing_a_constant_run(self):
+        unit = compile_source(self.SOURCE)
+        self.assertEqual(run_x86(unit)[0], run_vm(unit))
+
+    def test_pool_is_aligned_largest_first(self):
+        pool = dict(pool_constant(text, ctype) for text, ctype in (('1.5', 'float'), ('2.5', 'double')))
+        section = constant_pool(pool)
+        self.assertEqual(section[0].split(), ['align', '8'])
+        self.assertTrue(section[1].split()[0].startswith('double@'))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class CallingConventionTest(unittest.TestCase):
+    SOURCE = """int g;
+int add3(int a, int b, int c) { return a + b * c; }
+int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+int busy(int a, int b) {
+    int c = a * b, d = a + b, e = a - b, f = c * d, h = d * e;
+    return c + d + e + f + h + c * h - d * f;
+}
+float half(int a, int b, float x) { return x * 0.5 + a - b; }
+int main() { g = add3(1, 2, 3); return g + fact(5) + busy(3, 4) + half(9, 2, 5.0); }
+"""
+
+    def test_argument_registers(self):
+        self.assertEqual(argument_registers(['int', 'float', 'char', 'int']), ['ECX', None, 'EDX', None])
+
+    def test_leaf_in_registers_has_no_frame(self):
+        code = [line.split(';')[0].strip() for line in function_text(compile_source(self.SOURCE), 'add3')]
+        self.assertNotIn('PUSH EBP', code)
+        # a and b arrive in ECX and EDX, c past the return address and the saved EBX
+        self.assertIn('MOV EBX, EDX', code)
+        self.assertIn('MOV EAX, ECX', code)
+        self.assertIn('MOV EAX, [ESP+8]', code)
+
+    def test_functions_have_no_data_of_their_own(self):
+        unit = compile_source(self.SOURCE)
+        self.assertEqual([line.split()[0] for line in unit.assembly['data'] if 'align' not in line], ['g'])
+
+    def test_results_match_the_vm(self):
+        unit = compile_source(self.SOURCE)
+        result, machine = run_x86(unit)
+        self.assertEqual(result, run_vm(unit))
+        self.assertEqual(machine.global_value('g'), 7)
+        # Every value in memory: each function with a value has a frame
+        original = codegen.allocate_registers
+        codegen.allocate_registers = codegen.memory_allocation
+        try:
+            self.assertEqual(run_x86(compile_source(self.SOURCE))[0], result)
+        finally:
+            codegen.allocate_registers = original
+
+    def test_callee_saved_registers_and_stack_are_preserved(self):
+        unit = compile_source(self.SOURCE)
+        machine = Machine(unit.assembly)
+        saved = {register: 1000 + n for n, register in enumerate(CALLEE_SAVED)}
+        machine.registers.update(saved, ECX=3, EDX=4)
+        # c, d, e, f, h = 12, 7, -1, 84, -7
+        self.assertEqual(machine.run('busy'), 12 + 7 - 1 + 84 - 7 + 12 * -7 - 7 * 84)
+        self.assertEqual({register: machine.registers[register] for register in CALLEE_SAVED}, saved)
+        self.assertEqual(machine.registers['ESP'], STACK_TOP)
+
+
+class StackFrameTest(unittest.TestCase):
+    SOURCE = """int blocks(int n) {
+    int r = 0;
+    if (n > 0) { int x = n * 2; r = x + 1; } else { int y = n - 3; r = y * 5; }
+    return r;
+}
+int five(int a, int b, int c, int d, float e) { return a + b + c + d + e; }
+int main() { return blocks(4) + five(1, 2, 3, 4, 1.5); }
+"""
+
+    def frame(self, name, symbols=True):
+        unit = optimized(self.SOURCE, inline=False)
+        function = function_named(unit, name)
+        frame = StackFrame(function, memory_allocation(function).registers, unit.symbol_table if symbols else None)
+        return frame, {function.values[value].name: operand for value, operand in frame.operands.items()}
+
+    def test_sibling_blocks_share_slots(self):
+        frame, operands = self.frame('blocks')
+        self.assertEqual(operands['x'], operands['y'])
+        self.assertEqual(frame.size, 16)
+        self.assertTrue(frame.framed)
+
+    def test_without_scopes_every_value_has_a_slot(self):
+        frame, operands = self.frame('blocks', symbols=False)
+        self.assertNotEqual(operands['x'], operands['y'])
+        self.assertEqual(frame.size, 20)
+
+    def test_arguments_past_the_registers_come_on_the_stack(self):
+        frame, operands = self.frame('five')
+        self.assertEqual([register for _, register in frame.arguments], ['ECX', 'EDX'])
+        self.assertEqual([offset for _, offset in frame.incoming], [0, 4, 8])
+        self.assertEqual((operands['c'], operands['d'], operands['e']), ('[EBP+8]', '[EBP+12]', '[EBP+16]'))
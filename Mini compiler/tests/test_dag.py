@@ -0,0 +1,48 @@
+import unittest
+
+from dag import ExpressionDAG
+from ir import OP_ADD, OP_MUL
+from main import generate_tac
+from tests.support import analyzed, function_named
+
+
+class ExpressionDAGTest(unittest.TestCase):
+    def test_repeated_subtree_is_shared(self):
+        dag = ExpressionDAG()
+        a, b, c = dag.leaf(0), dag.leaf(1), dag.leaf(2)
+        chain = dag.operation(OP_ADD, 'int', dag.operation(OP_ADD, 'int', a, b), c)
+        again = dag.operation(OP_ADD, 'int', dag.operation(OP_ADD, 'int', a, b), c)
+        self.assertIs(chain, again)
+        self.assertEqual(chain.need, 1)
+
+    def test_operation_on_two_leaves_is_rebuilt(self):
+        dag = ExpressionDAG()
+        a, b = dag.leaf(0), dag.leaf(1)
+        first, second = dag.operation(OP_ADD, 'int', a, b), dag.operation(OP_ADD, 'int', a, b)
+        self.assertIsNot(first, second)
+        self.assertEqual(first.number, second.number)
+
+    def test_order_puts_the_deeper_operand_first(self):
+        dag = ExpressionDAG()
+        a, b, c, d = (dag.leaf(n) for n in range(4))
+        shallow = dag.operation(OP_ADD, 'int', a, b)
+        deep = dag.operation(OP_MUL, 'int', dag.operation(OP_ADD, 'int', a, c), dag.operation(OP_ADD, 'int', b, d))
+        root = dag.operation(OP_ADD, 'int', shallow, deep)
+        ordered = dag.order(root)
+        self.assertEqual(ordered[-1], root)
+        self.assertLess(ordered.index(deep), ordered.index(shallow))
+
+
+class SharedExpressionTest(unittest.TestCase):
+    def test_repeated_chain_is_emitted_once(self):
+        unit = analyzed("int f(int a, int b, int c, int d, int e) "
+                        "{ return (a + b + c + d + e) * (a + b + c + d + e); }\n")
+        generate_tac(unit)
+        function = function_named(unit, 'f')
+        opcodes = [quad.op for quad in function.quads]
+        self.assertEqual(opcodes.count(OP_ADD), 4)
+        self.assertEqual(opcodes.count(OP_MUL), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
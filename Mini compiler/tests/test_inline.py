@@ -0,0 +1,63 @@
+import unittest
+
+from inline import MAX_CALLEE_SIZE, CallGraph
+from tests.support import compile_source, function_named, optimized, run_vm
+
+PROGRAM = """int sq(int v) { return v * v; }
+int fact(int n) { if (n < 2) { return 1; } return n * fact(n - 1); }
+int even(int n);
+int odd(int n) { if (n == 0) { return 0; } return even(n - 1); }
+int even(int n) { if (n == 0) { return 1; } return odd(n - 1); }
+int main() { int a = 7; return sq(a) + sq(3) + fact(5) + even(4); }
+"""
+
+
+def sites(unit, name):
+    return [(site.callee, site.site) for site in next(item['inlined_sites'] for item in unit.items
+                                                      if item['function'] is not None
+                                                      and item['function'].name == name)]
+
+
+class CallGraphTest(unittest.TestCase):
+    def test_components_come_callees_first(self):
+        unit = optimized(PROGRAM, inline=False)
+        graph = CallGraph([item['function'] for item in unit.items if item['function'] is not None])
+        self.assertEqual(graph.components, [['sq'], ['fact'], ['even', 'odd'], ['main']])
+        self.assertEqual(graph.recursive, {'fact', 'even', 'odd'})
+
+
+class InliningTest(unittest.TestCase):
+    def test_small_leaf_is_inlined_and_folded(self):
+        unit = optimized(PROGRAM)
+        self.assertEqual(sites(unit, 'main'), [('sq', 1), ('sq', 2)])
+        # 7 * 7 + 3 * 3, folded once the arguments reach the copied bodies
+        self.assertIn('t2 = 58 + t1', function_named(unit, 'main').dump())
+
+    def test_recursive_functions_are_not_inlined(self):
+        unit = optimized(PROGRAM)
+        dump = function_named(unit, 'main').dump()
+        self.assertIn('t1 = call fact, 1', dump)
+        self.assertIn('t3 = call even, 1', dump)
+        self.assertEqual(sites(unit, 'odd'), [])
+
+    def test_callee_becomes_a_leaf_once_its_calls_are_inlined(self):
+        unit = optimized("""int inner(int v) { return v + 1; }
+int outer(int v) { return inner(v) * 2; }
+int main() { return outer(7); }
+""")
+        self.assertEqual(sites(unit, 'outer'), [('inner', 1)])
+        self.assertEqual(sites(unit, 'main'), [('outer', 1)])
+        self.assertEqual(function_named(unit, 'main').dump(), ['main:', 'return 16'])
+
+    def test_large_callee_is_called(self):
+        body = " ".join(f"s = s * 3 + {k};" for k in range(MAX_CALLEE_SIZE))
+        unit = optimized(f"int big(int s) {{ {body} return s; }}\nint main() {{ return big(7); }}\n")
+        self.assertEqual(sites(unit, 'main'), [])
+
+    def test_results_match_without_inlining(self):
+        self.assertEqual(run_vm(optimized(PROGRAM)), run_vm(optimized(PROGRAM, inline=False)))
+        self.assertEqual(run_vm(compile_source(PROGRAM)), 49 + 9 + 120 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
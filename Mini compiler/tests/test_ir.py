@@ -0,0 +1,46 @@
+import unittest
+
+from ir import (CONST, GLOBAL, LOCAL, OP_ADD, OP_COPY, OP_IFFALSE, OP_JUMP, OP_LABEL, OP_RETURN, IRFunction, Quad,
+                basic_blocks, quad_def, quad_uses, replace_uses)
+from main import generate_tac
+from tests.support import analyzed, function_named
+
+
+class IRFunctionTest(unittest.TestCase):
+    def test_constants_and_globals_are_interned(self):
+        function = IRFunction('f')
+        self.assertEqual(function.constant('2', 'int'), function.constant('2', 'int'))
+        self.assertNotEqual(function.constant('2', 'int'), function.constant('3', 'int'))
+        self.assertEqual(function.global_value('g', 'int'), function.global_value('g', 'int'))
+        self.assertEqual([value.kind for value in function.values], [CONST, CONST, GLOBAL])
+
+    def test_operand_access(self):
+        function = IRFunction('f')
+        a = function.new_local('a', 'int', 0)
+        t = function.new_temp('int')
+        add = Quad(OP_ADD, t, a, function.constant('1', 'int'))
+        self.assertEqual(quad_uses(add), (a, add.src2))
+        self.assertEqual(quad_def(add), t)
+        self.assertEqual(quad_def(Quad(OP_IFFALSE, 1, t)), -1)
+        replace_uses(add, {a: t})
+        self.assertEqual(add.src1, t)
+        self.assertEqual(function.values[a].kind, LOCAL)
+
+    def test_basic_blocks_split_at_labels_and_jumps(self):
+        quads = [Quad(OP_COPY, 0, 1), Quad(OP_IFFALSE, 1, 0), Quad(OP_COPY, 0, 1), Quad(OP_JUMP, 2),
+                 Quad(OP_LABEL, 1), Quad(OP_RETURN, src1=0)]
+        self.assertEqual(basic_blocks(quads), [(0, 2), (2, 4), (4, 6)])
+
+
+class TranslationTest(unittest.TestCase):
+    def test_statements_become_quads(self):
+        unit = analyzed("int g;\nint f(int a, int b) { int c = a * b + 2; g = c - a; return c; }\n")
+        generate_tac(unit)
+        function = function_named(unit, 'f')
+        self.assertEqual(function.dump(), ['f:', 't1 = a * b', 't2 = t1 + 2', 'c = t2', 't3 = c - a', 'g = t3',
+                                           'return c'])
+        self.assertEqual([function.values[param].name for param in function.params], ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
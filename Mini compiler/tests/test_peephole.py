@@ -0,0 +1,45 @@
+import unittest
+
+from peephole import peephole
+
+
+def rewrite(*lines):
+    text, fired = peephole([f"  {line}" if not line.endswith(':') else line for line in lines])
+    return [line.strip() for line in text], fired
+
+
+class RuleTest(unittest.TestCase):
+    def test_store_then_load_reuses_the_register(self):
+        text, fired = rewrite("MOV [x], EAX", "MOV EBX, [x]")
+        self.assertEqual(text, ["MOV [x], EAX", "MOV EBX, EAX"])
+        self.assertEqual(fired['store_load'], 1)
+
+    def test_self_move_is_removed(self):
+        self.assertEqual(rewrite("MOV EAX, EAX", "RET")[0], ["RET"])
+
+    def test_unconditional_jump_to_next_label(self):
+        text, fired = rewrite("JMP .L1", ".L1:", "RET")
+        self.assertEqual(text, [".L1:", "RET"])
+        self.assertEqual(fired['jump_to_next'], 1)
+
+    def test_conditional_jump_to_next_label(self):
+        text, fired = rewrite("CMP EAX, 0", "JE .L2", ".L2:", "RET")
+        self.assertEqual(text, ["CMP EAX, 0", ".L2:", "RET"])
+        self.assertEqual(fired['jump_to_next'], 1)
+
+    def test_jump_to_another_label_stays(self):
+        lines = ["CMP EAX, 0", "JNE .L3", ".L2:", "RET", ".L3:", "RET"]
+        self.assertEqual(rewrite(*lines)[0], lines)
+
+    def test_branch_over_jump_is_inverted(self):
+        text, _ = rewrite("CMP EAX, 1", "JL .L1", "JMP .L2", ".L1:", "RET", ".L2:", "RET")
+        self.assertEqual(text, ["CMP EAX, 1", "JGE .L2", ".L1:", "RET", ".L2:", "RET"])
+
+    def test_float_equality_is_not_folded_into_one_branch(self):
+        lines = ["UCOMISS XMM0, XMM1", "SETE AL", "SETNP CL", "AND AL, CL", "MOVZX EAX, AL", "CMP EAX, 0",
+                 "JE .L1", "RET", ".L1:", "RET"]
+        self.assertEqual(rewrite(*lines)[0], lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
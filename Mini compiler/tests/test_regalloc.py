@@ -0,0 +1,84 @@
+import unittest
+
+import codegen
+from codegen import assembly_for_tac
+from regalloc import CALLEE_SAVED, REGISTERS, allocate_registers, build_intervals, liveness
+from tests.support import compile_source, function_named, optimized, run_vm, run_x86
+
+PROGRAMS = [
+    # Straight-line arithmetic with more live values than registers
+    """int mix(int a, int b, int c, int d, int e, int f, int g, int h) {
+    int s = a * b + c * d - e * f + g * h;
+    return s + a + b + c + d + e + f + g + h;
+}
+int main() { return mix(3, 5, 7, 11, 13, 17, 19, 23); }
+""",
+    # Values live across calls and loops
+    """int total = 0;
+int scale(int v, int k) { return v * k - 1; }
+int main() {
+    int kept = 4;
+    for (int i = 0; i < 10; i++) {
+        total = total + scale(i, kept) + kept;
+        if (total > 50) { kept = kept - 1; }
+    }
+    return total * 3 + kept;
+}
+""",
+    # Division, which pins EAX and EDX
+    """int main() {
+    int n = 1000, d = 7, q = 0;
+    while (n > 0) { q = q + n / d + n / 3; n = n - 97; }
+    return q;
+}
+""",
+]
+
+
+class AllocationTest(unittest.TestCase):
+    def test_overlapping_intervals_get_different_registers(self):
+        function = function_named(optimized(PROGRAMS[0], inline=False), 'mix')
+        allocation = allocate_registers(function)
+        intervals = build_intervals(function, liveness(function))
+        for first in intervals:
+            for second in intervals:
+                if first is not second and first.start <= second.end and second.start <= first.end:
+                    register = allocation.registers[first.value]
+                    if register is not None:
+                        self.assertNotEqual(register, allocation.registers[second.value])
+
+    def test_values_live_across_a_call_avoid_clobbered_registers(self):
+        function = function_named(optimized(PROGRAMS[1], inline=False), 'main')
+        allocation = allocate_registers(function)
+        for interval in build_intervals(function, liveness(function)):
+            register = allocation.registers[interval.value]
+            self.assertNotIn(register, interval.forbidden)
+        self.assertTrue(set(allocation.saved) <= set(CALLEE_SAVED))
+        self.assertTrue(set(allocation.registers) <= set(REGISTERS) | {None})
+
+
+class DifferentialTest(unittest.TestCase):
+    """The generated code computes what the VM computes, with allocation on and off."""
+
+    def test_programs(self):
+        for source in PROGRAMS:
+            unit = compile_source(source)
+            expected = run_vm(unit)
+            with self.subTest(source=source.splitlines()[0]):
+                self.assertEqual(run_x86(unit)[0], expected)
+                original = codegen.allocate_registers
+                codegen.allocate_registers = codegen.memory_allocation
+                try:
+                    self.assertEqual(run_x86(compile_source(source))[0], expected)
+                finally:
+                    codegen.allocate_registers = original
+
+    def test_allocation_removes_memory_operands(self):
+        function = function_named(optimized(PROGRAMS[1], inline=False), 'main')
+        memory = codegen.memory_operands(assembly_for_tac(function, allocate=False)['text'])
+        registers = codegen.memory_operands(assembly_for_tac(function)['text'])
+        self.assertLess(registers, memory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from cfg import CFG
+from main import generate_tac
+from ssa import SSAForm, dominators, optimize_ssa
+from tests.support import analyzed, compile_source, function_named, optimized, run_vm
+
+BRANCHES = """int pick(int a) { int y; if (a > 0) { y = 1; } else { y = 2; } return y; }
+int known(int a) { int x = 3; int y; if (x > 2) { y = 10; } else { y = a; } return y + 1; }
+int settles(int n) { int i = 0; int k = 5; while (i < n) { k = 10 - k; i = i + 1; } return k; }
+int main() { return pick(-1) * 100 + known(4) + settles(7); }
+"""
+
+
+def translated(name):
+    unit = analyzed(BRANCHES)
+    generate_tac(unit)
+    return function_named(unit, name)
+
+
+class SSAFormTest(unittest.TestCase):
+    def test_join_dominated_by_entry(self):
+        function = translated('pick')
+        idom = dominators(CFG(function.quads))
+        # entry, then-arm, else-arm, join: both arms and the join hang off the entry
+        self.assertEqual(idom[1:], [0, 0, 0])
+
+    def test_phi_only_where_definitions_meet(self):
+        function = translated('pick')
+        y = next(index for index, value in enumerate(function.values) if value.name == 'y')
+        ssa = SSAForm(function)
+        self.assertEqual([[(phi.original, phi.block) for phi in phis] for phis in ssa.phis],
+                         [[], [], [], [(y, 3)]])
+
+
+class ConstantPropagationTest(unittest.TestCase):
+    def test_branch_on_a_constant_is_decided(self):
+        unit = optimized(BRANCHES, inline=False)
+        self.assertEqual(function_named(unit, 'known').dump(), ['known:', 'return 11'])
+
+    def test_value_settling_in_a_loop_is_constant(self):
+        # k is 5 on entry and 10 - 5 around the back edge
+        unit = optimized(BRANCHES, inline=False)
+        self.assertEqual(function_named(unit, 'settles').dump()[-1], 'return 5')
+
+    def test_unknown_branch_keeps_both_arms(self):
+        unit = optimized(BRANCHES, inline=False)
+        self.assertIn('ifFalse t1 goto L1', function_named(unit, 'pick').dump())
+
+    def test_pass_alone_folds_across_the_back_edge(self):
+        function = translated('settles')
+        self.assertGreater(optimize_ssa(function), 0)
+        self.assertEqual(function.dump()[-1], 'return 5')
+
+    def test_optimized_program_result(self):
+        self.assertEqual(run_vm(compile_source(BRANCHES)), 200 + 11 + 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
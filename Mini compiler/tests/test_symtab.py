@@ -0,0 +1,32 @@
+import unittest
+
+from symtab import FUNCTION, VARIABLE, SymbolTable
+from tests.support import analyzed
+
+
+class DeclarationTest(unittest.TestCase):
+    def test_shadowing_is_allowed_and_redeclaration_is_reported(self):
+        table = SymbolTable()
+        outer = table.declare('x', 'int', VARIABLE)
+        table.push()
+        inner = table.declare('x', 'float', VARIABLE)
+        self.assertIs(table.lookup('x'), inner)
+        table.declare('x', 'int', VARIABLE)
+        table.pop()
+        self.assertIs(table.lookup('x'), outer)
+        self.assertEqual(len(table.errors), 1)
+
+    def test_prototype_then_definition(self):
+        table = SymbolTable()
+        prototype = table.declare('f', 'int', FUNCTION)
+        self.assertIs(table.declare('f', 'int', FUNCTION, definition=True), prototype)
+        self.assertIs(table.declare('f', 'int', FUNCTION), prototype)
+        self.assertEqual(table.errors, [])
+
+    def test_second_function_body_is_a_redefinition(self):
+        unit = analyzed("int f() { return 1; }\nint f() { return 2; }\nint main() { return f(); }\n")
+        self.assertEqual(unit.symbol_table.errors, ["Redefinition of function 'f' in scope 'global'"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+# x86.py - A small interpreter for the assembly the code generator emits
+#
+# It covers the integer and single-precision instructions codegen uses,
+# enough to run a compiled unit and compare its result with the VM's.
+# Memory is a dict of dwords; a double is not supported.
+
+import math
+import re
+import struct
+
+REGISTERS = ('EAX', 'EBX', 'ECX', 'EDX', 'ESI', 'EDI', 'ESP', 'EBP')
+LOW_BYTE = {'AL': 'EAX', 'BL': 'EBX', 'CL': 'ECX', 'DL': 'EDX'}
+CALLEE_SAVED = ('EBX', 'ESI', 'EDI', 'EBP')
+STACK_TOP = 0x100000
+# The return address main() is entered with; RET to it ends the run
+EXIT = -1
+
+
+def wrap(value):
+    value = int(value) & 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def single(value):
+    try:
+        return struct.unpack('<f', struct.pack('<f', value))[0]
+    except OverflowError:
+        return math.copysign(math.inf, value)
+
+
+def float_bits(value):
+    return struct.unpack('<i', struct.pack('<f', value))[0]
+
+
+def bits_float(bits):
+    return struct.unpack('<f', struct.pack('<i', wrap(bits)))[0]
+
+
+def truncate(value):
+    """CVTTSS2SI: toward zero, INT_MIN when out of range or NaN."""
+    if math.isnan(value) or not -2.0 ** 31 <= value < 2.0 ** 31:
+        return -2 ** 31
+    return int(value)
+
+
+def divide_single(a, b):
+    if b == 0:
+        return math.nan if a == 0 or math.isnan(a) else math.copysign(math.inf, a) * math.copysign(1, b)
+    return single(a / b)
+
+
+class MachineError(Exception):
+    pass
+
+
+class Machine:
+    """Runs a unit's assembly ({'data', 'rodata', 'text'}) from main().
+
+    Calls return with ECX, EDX and XMM1-7 scrambled, so code that expects
+    a caller-saved register to survive a call goes wrong here as it would
+    on hardware.
+    """
+
+    def __init__(self, assembly):
+        self.memory = {}
+        self.addresses = {}
+        address = 0x1000
+        for line in assembly['data'] + assembly['rodata']:
+            code = line.split(';')[0].split()
+            if not code or code[0] == 'align':
+                continue
+            name, directive, value = code
+            if directive not in ('db', 'dd'):
+                raise MachineError(f"Unsupported data: {line.strip()}")
+            if name in self.addresses:
+                raise MachineError(f"Label '{name}' redefined")
+            self.addresses[name] = address
+            self.memory[address] = float_bits(float(value)) if '.' in value else wrap(int(value, 0))
+            address += 4
+        self.code = []
+        self.labels = {}
+        function = None
+        for line in assembly['text']:
+            code = line.split(';')[0].strip()
+            if code.endswith(':'):
+                label = code[:-1]
+                if not label.startswith('.'):
+                    function = label
+                key = function + label if label.startswith('.') else label
+                if key in self.labels:
+                    raise MachineError(f"Label '{label}' redefined")
+                self.labels[key] = len(self.code)
+            elif code:
+                mnemonic, _, operands = code.partition(' ')
+                self.code.append((function, mnemonic, [operand.strip() for operand in operands.split(',')]
+                                  if operands else []))
+        self.registers = {register: 0 for register in REGISTERS}
+        self.xmm = {f"XMM{n}": 0.0 for n in range(8)}
+        self.flags = (0, 0)
+        self.steps = 0
+
+    # --- Operands ---
+
+    def address(self, expression):
+        total = 0
+        for sign, term in re.findall(r'([+-]?)([^+-]+)', expression.replace(' ', '')):
+            if '*' in term:
+                register, scale = term.split('*')
+                value = self.registers[register] * int(scale)
+            elif term in self.registers:
+                value = self.registers[term]
+            elif term in self.addresses:
+                value = self.addresses[term]
+            else:
+                value = int(term, 0)
+            total += -value if sign == '-' else value
+        return total
+
+    def read(self, operand):
+        operand = operand.replace('DWORD ', '')
+        if operand in self.registers:
+            return self.registers[operand]
+        if operand in LOW_BYTE:
+            return self.registers[LOW_BYTE[operand]] & 0xFF
+        if operand.startswith('['):
+            return self.memory.get(self.address(operand[1:-1]), 0)
+        return wrap(int(operand, 0))
+
+    def write(self, operand, value):
+        operand = operand.replace('DWORD ', '')
+        if operand in self.registers:
+            self.registers[operand] = wrap(value)
+        elif operand in LOW_BYTE:
+            register = LOW_BYTE[operand]
+            self.registers[register] = wrap(self.registers[register] & ~0xFF | value & 0xFF)
+        else:
+            self.memory[self.address(operand[1:-1])] = wrap(value)
+
+    def read_single(self, operand):
+        return self.xmm[operand] if operand in self.xmm else bits_float(self.read(operand))
+
+    def write_single(self, operand, value):
+        if operand in self.xmm:
+            self.xmm[operand] = value
+        else:
+            self.write(operand, float_bits(value))
+
+    def push(self, value):
+        self.registers['ESP'] -= 4
+        self.memory[self.registers['ESP']] = wrap(value)
+
+    def pop(self):
+        value = self.memory[self.registers['ESP']]
+        self.registers['ESP'] += 4
+        return value
+
+    def condition(self, code):
+        if self.flags[0] == 'float':
+            _, a, b = self.flags
+            unordered = math.isnan(a) or math.isnan(b)
+            return {'E': unordered or a == b, 'NE': not unordered and a != b, 'A': not unordered and a > b,
+                    'AE': not unordered and a >= b, 'B': unordered or a < b, 'BE': unordered or a <= b,
+                    'P': unordered, 'NP': not unordered}[code]
+        a, b = self.flags
+        return {'E': a == b, 'Z': a == b, 'NE': a != b, 'NZ': a != b, 'L': a < b, 'G': a > b, 'LE': a <= b,
+                'GE': a >= b, 'B': a & 0xFFFFFFFF < b & 0xFFFFFFFF, 'A': a & 0xFFFFFFFF > b & 0xFFFFFFFF,
+                'AE': a & 0xFFFFFFFF >= b & 0xFFFFFFFF, 'BE': a & 0xFFFFFFFF <= b & 0xFFFFFFFF}[code]
+
+    def global_value(self, name):
+        return self.memory[self.addresses[name]]
+
+    # --- Execution ---
+
+    def run(self, entry='main', limit=1000000):
+        """Runs entry to its return and gives back EAX."""
+        self.registers['ESP'] = STACK_TOP
+        self.push(EXIT)
+        pc = self.labels[entry]
+        scramble = 12345
+        while True:
+            self.steps += 1
+            if self.steps > limit:
+                raise MachineError("Step limit exceeded")
+            function, mnemonic, args = self.code[pc]
+            pc += 1
+            read, write = self.read, self.write
+            if mnemonic == 'MOV':
+                write(args[0], read(args[1]))
+            elif mnemonic == 'MOVZX':
+                write(args[0], read(args[1]) & 0xFF)
+            elif mnemonic == 'LEA':
+                write(args[0], self.address(args[1][1:-1]))
+            elif mnemonic == 'IMUL' and len(args) == 3:
+                write(args[0], read(args[1]) * read(args[2]))
+            elif mnemonic == 'IMUL' and len(args) == 1:
+                product = self.registers['EAX'] * read(args[0])
+                self.registers['EAX'], self.registers['EDX'] = wrap(product), wrap(product >> 32)
+            elif mnemonic in ('ADD', 'SUB', 'IMUL', 'AND', 'OR', 'XOR'):
+                a, b = read(args[0]), read(args[1])
+                result = {'ADD': a + b, 'SUB': a - b, 'IMUL': a * b, 'AND': a & b, 'OR': a | b, 'XOR': a ^ b}
+                write(args[0], result[mnemonic])
+                self.flags = (wrap(result[mnemonic]), 0)
+            elif mnemonic in ('SHL', 'SAR', 'SHR'):
+                a, count = read(args[0]), read(args[1])
+                result = {'SHL': a << count, 'SAR': a >> count, 'SHR': (a & 0xFFFFFFFF) >> count}[mnemonic]
+                write(args[0], result)
+                self.flags = (wrap(result), 0)
+            elif mnemonic == 'NEG':
+                write(args[0], -read(args[0]))
+            elif mnemonic == 'CMP':
+                self.flags = (read(args[0]), read(args[1]))
+            elif mnemonic == 'TEST':
+                self.flags = (read(args[0]) & read(args[1]), 0)
+            elif mnemonic.startswith('SET'):
+                write(args[0], int(self.condition(mnemonic[3:])))
+            elif mnemonic == 'CDQ':
+                self.registers['EDX'] = -1 if self.registers['EAX'] < 0 else 0
+            elif mnemonic == 'IDIV':
+                divisor = read(args[0])
+                dividend = self.registers['EDX'] << 32 | self.registers['EAX'] & 0xFFFFFFFF
+                quotient = abs(dividend) // abs(divisor) * (-1 if (dividend < 0) != (divisor < 0) else 1)
+                self.registers['EAX'], self.registers['EDX'] = wrap(quotient), wrap(dividend - quotient * divisor)
+            elif mnemonic == 'XCHG':
+                a, b = read(args[0]), read(args[1])
+                write(args[0], b)
+                write(args[1], a)
+            elif mnemonic == 'PUSH':
+                self.push(read(args[0]))
+            elif mnemonic == 'POP':
+                write(args[0], self.pop())
+            elif mnemonic == 'LEAVE':
+                self.registers['ESP'] = self.registers['EBP']
+                self.registers['EBP'] = self.pop()
+            elif mnemonic == 'CALL':
+                self.push(pc)
+                pc = self.labels[args[0]]
+            elif mnemonic == 'RET':
+                for register in ('ECX', 'EDX'):
+                    scramble = scramble * 1103515245 + 12345 & 0x7FFFFFFF
+                    self.registers[register] = wrap(scramble)
+                for n in range(1, 8):
+                    self.xmm[f"XMM{n}"] = float(n) * 1000.5
+                target = self.pop()
+                if target == EXIT:
+                    return self.registers['EAX']
+                pc = target
+            elif mnemonic == 'JMP' or mnemonic.startswith('J') and self.condition(mnemonic[1:]):
+                pc = self.labels[function + args[0] if args[0].startswith('.') else args[0]]
+            elif mnemonic.startswith('J'):
+                pass
+            elif mnemonic == 'MOVSS':
+                self.write_single(args[0], self.read_single(args[1]))
+            elif mnemonic in ('ADDSS', 'SUBSS', 'MULSS', 'DIVSS'):
+                a, b = self.read_single(args[0]), self.read_single(args[1])
+                result = {'ADDSS': lambda: single(a + b), 'SUBSS': lambda: single(a - b),
+                          'MULSS': lambda: single(a * b), 'DIVSS': lambda: divide_single(a, b)}[mnemonic]()
+                self.write_single(args[0], result)
+            elif mnemonic == 'CVTSI2SS':
+                self.write_single(args[0], single(read(args[1])))
+            elif mnemonic == 'CVTTSS2SI':
+                write(args[0], truncate(self.read_single(args[1])))
+            elif mnemonic == 'XORPS':
+                a, b = float_bits(self.read_single(args[0])), float_bits(self.read_single(args[1]))
+                self.write_single(args[0], bits_float(a ^ b))
+            elif mnemonic == 'UCOMISS':
+                self.flags = ('float', self.read_single(args[0]), self.read_single(args[1]))
+            else:
+                raise MachineError(f"Unsupported instruction: {mnemonic} {', '.join(args)}")
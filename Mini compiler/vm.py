@@ -0,0 +1,463 @@
+# vm.py - Register-based bytecode for the TAC IR, and the interpreter that runs it
+
+import math
+import sys
+from array import array
+
+from folding import single, wrap_int
+from ir import (CONST, GLOBAL, OP_ADD, OP_CALL, OP_COPY, OP_DIV, OP_EQ, OP_GE, OP_GT, OP_IFFALSE, OP_JUMP, OP_LABEL,
+                OP_LE, OP_LT, OP_MUL, OP_NE, OP_NEG, OP_NOT, OP_PARAM, OP_RETURN, OP_SUB, TEMP, quad_uses)
+
+# --- Bytecode ---
+# An instruction is four ints in its function's code array: the opcode
+# and three operands a, b, c. Operands are frame slots unless noted. A
+# function's frame has one slot per IR value (constants preloaded), then
+# scratch slots for globals and conversions, then constants retyped for
+# the operations that read them.
+#   MOVE     a=dest  b=source
+#   CONVERT  a=dest  b=source  c=kind to convert to
+#   IADD..   a=dest  b c               int arithmetic, wrapped to 32 bits
+#   FADD..   a=dest  b c               float, rounded to single precision
+#   DADD..   a=dest  b c               double
+#   EQ..GE   a=dest  b c               1 or 0
+#   INEG/FNEG/NOT  a=dest  b
+#   JUMP     a=target                  (an index into the code array)
+#   IFFALSE  a=condition  b=target
+#   JNLT..   a b c=target              jump unless slot a < slot b, etc.
+#   GLOAD    a=dest  b=global          (an index into the globals)
+#   GSTORE   a=global  b=source
+#   PARAM    a=argument
+#   CALL     a=dest or -1  b=function  c=argument count
+#   RETURN   a=value or -1
+(B_MOVE, B_CONVERT, B_IADD, B_ISUB, B_IMUL, B_IDIV, B_FADD, B_FSUB, B_FMUL, B_FDIV, B_DADD, B_DSUB, B_DMUL, B_DDIV,
+ B_EQ, B_NE, B_LT, B_GT, B_LE, B_GE, B_INEG, B_FNEG, B_NOT, B_JUMP, B_IFFALSE,
+ B_JNEQ, B_JNNE, B_JNLT, B_JNGT, B_JNLE, B_JNGE, B_GLOAD, B_GSTORE, B_PARAM, B_CALL, B_RETURN) = range(36)
+
+OPCODE_NAMES = ('MOVE', 'CONVERT', 'IADD', 'ISUB', 'IMUL', 'IDIV', 'FADD', 'FSUB', 'FMUL', 'FDIV',
+                'DADD', 'DSUB', 'DMUL', 'DDIV', 'EQ', 'NE', 'LT', 'GT', 'LE', 'GE', 'INEG', 'FNEG', 'NOT',
+                'JUMP', 'IFFALSE', 'JNEQ', 'JNNE', 'JNLT', 'JNGT', 'JNLE', 'JNGE',
+                'GLOAD', 'GSTORE', 'PARAM', 'CALL', 'RETURN')
+
+# What a slot holds: a Python int kept in 32-bit range, a float rounded
+# to single precision, or a double
+INT, FLOAT, DOUBLE = range(3)
+
+ARITHMETIC = {
+    INT: {OP_ADD: B_IADD, OP_SUB: B_ISUB, OP_MUL: B_IMUL, OP_DIV: B_IDIV},
+    FLOAT: {OP_ADD: B_FADD, OP_SUB: B_FSUB, OP_MUL: B_FMUL, OP_DIV: B_FDIV},
+    DOUBLE: {OP_ADD: B_DADD, OP_SUB: B_DSUB, OP_MUL: B_DMUL, OP_DIV: B_DDIV},
+}
+COMPARE = {OP_EQ: B_EQ, OP_NE: B_NE, OP_LT: B_LT, OP_GT: B_GT, OP_LE: B_LE, OP_GE: B_GE}
+# A compare whose only use is the branch right after it jumps directly
+COMPARE_BRANCH = {OP_EQ: B_JNEQ, OP_NE: B_JNNE, OP_LT: B_JNLT, OP_GT: B_JNGT, OP_LE: B_JNLE, OP_GE: B_JNGE}
+
+INT_MIN = -0x80000000
+INT_MAX = 0x7FFFFFFF
+
+
+class VMError(Exception):
+    """A program that cannot be loaded or stopped at run time."""
+
+
+def kind_of(ctype):
+    return FLOAT if ctype == 'float' else DOUBLE if ctype == 'double' else INT
+
+
+def convert(number, kind):
+    """number as a value of kind, as the target's conversion instructions do."""
+    if kind == FLOAT:
+        return single(float(number))
+    if kind == DOUBLE:
+        return float(number)
+    if isinstance(number, float):
+        # CVTTSS2SI truncates; NaN and out of range give the "integer indefinite"
+        return int(number) if -2.0 ** 31 <= number < 2.0 ** 31 else INT_MIN
+    return number
+
+
+def initial_value(text, ctype):
+    """The starting value of a global declared with initializer text (None: zero)."""
+    kind = kind_of(ctype)
+    if text is None:
+        return 0.0 if kind != INT else 0
+    number = float(text) if '.' in str(text) else int(text)
+    return convert(number, kind) if kind != INT or isinstance(number, float) else wrap_int(number)
+
+
+class BytecodeFunction:
+    __slots__ = ('name', 'code', 'frame', 'params')
+
+    def __init__(self, name, code, frame, params):
+        self.name = name
+        self.code = code
+        self.frame = frame          # the initial frame, copied on every call
+        self.params = params
+
+    def disassemble(self):
+        """The instructions as text, one line each, prefixed with their code index."""
+        code = self.code
+        return [f"{pc:5} {OPCODE_NAMES[code[pc]]:<8} {code[pc + 1]} {code[pc + 2]} {code[pc + 3]}"
+                for pc in range(0, len(code), 4)]
+
+
+# --- Encoding ---
+
+class FunctionEncoder:
+    """Translates one IRFunction's quads into a BytecodeFunction.
+
+    Value IDs are used as slot numbers directly. Each operation is encoded
+    for the type it computes in (its destination's, or for a compare the
+    wider of its operands'), and an operand of another type is converted
+    into a scratch slot first, as the code generator does with CVTSI2SS
+    and CVTTSS2SI. Globals are read and written through the scratch slots
+    with GLOAD and GSTORE.
+    """
+
+    def __init__(self, function, global_index):
+        self.function = function
+        self.values = values = function.values
+        self.global_index = global_index
+        self.code = array('i')
+        self.labels = {}
+        self.fixups = []            # (code index, label) to patch once every label is known
+        self.frame = []
+        for value in values:
+            if value.kind == CONST:
+                self.frame.append(convert(float(value.name) if '.' in value.name else int(value.name),
+                                          kind_of(value.ctype)))
+            else:
+                self.frame.append(0.0 if kind_of(value.ctype) != INT else 0)
+        count = len(values)
+        self.left, self.right, self.result = count, count + 1, count + 2
+        self.frame.extend((0, 0, 0))
+        self.retyped = {}           # (constant ID, kind) -> slot
+        self.uses = [0] * count
+        for quad in function.quads:
+            for value_id in quad_uses(quad):
+                self.uses[value_id] += 1
+
+    def emit(self, op, a=-1, b=-1, c=-1):
+        self.code.extend((op, a, b, c))
+
+    def jump_operand(self, label, operand):
+        """Records that operand (1 to 3) of the last instruction must become label's code index."""
+        self.fixups.append((len(self.code) - 4 + operand, label))
+
+    def global_slot(self, value):
+        index = self.global_index.get(value.name)
+        if index is None:
+            raise VMError(f"'{value.name}' in {self.function.name} is not a global variable")
+        return index
+
+    # --- Operands ---
+
+    def operand(self, value_id, kind, scratch):
+        """The slot holding value_id as a kind value, loading or converting it into scratch if needed."""
+        value = self.values[value_id]
+        if value.kind == CONST:
+            if kind_of(value.ctype) == kind:
+                return value_id
+            slot = self.retyped.get((value_id, kind))
+            if slot is None:
+                # A float literal in an int operation is truncated, like the generated code's immediates
+                number = float(value.name) if '.' in value.name else int(value.name)
+                slot = self.retyped[(value_id, kind)] = len(self.frame)
+                self.frame.append(convert(number, kind))
+            return slot
+        source = value_id
+        if value.kind == GLOBAL:
+            self.emit(B_GLOAD, scratch, self.global_slot(value))
+            source = scratch
+        if kind_of(value.ctype) != kind:
+            self.emit(B_CONVERT, scratch, source, kind)
+            return scratch
+        return source
+
+    def own(self, value_id, scratch):
+        """The slot holding value_id as a value of its own type."""
+        return self.operand(value_id, kind_of(self.values[value_id].ctype), scratch)
+
+    def target(self, dest, kind):
+        """The slot an operation producing a kind value should write for dest."""
+        value = self.values[dest]
+        if value.kind != GLOBAL and kind_of(value.ctype) == kind:
+            return dest
+        return self.result
+
+    def store(self, dest, slot, kind):
+        """Moves a kind value computed in slot into dest, converting it to dest's type."""
+        if slot == dest:
+            return
+        value = self.values[dest]
+        if kind_of(value.ctype) != kind:
+            self.emit(B_CONVERT, slot, slot, kind_of(value.ctype))
+        if value.kind == GLOBAL:
+            self.emit(B_GSTORE, self.global_slot(value), slot)
+        else:
+            self.emit(B_MOVE, dest, slot)
+
+    # --- Quads ---
+
+    def encode(self, functions):
+        quads = self.function.quads
+        values = self.values
+        skip = False
+        for i, quad in enumerate(quads):
+            if skip:
+                skip = False
+                continue
+            op = quad.op
+            if op == OP_LABEL:
+                self.labels[quad.dest] = len(self.code)
+            elif op == OP_JUMP:
+                self.emit(B_JUMP, 0)
+                self.jump_operand(quad.dest, 1)
+            elif op == OP_IFFALSE:
+                self.emit(B_IFFALSE, self.own(quad.src1, self.left), 0)
+                self.jump_operand(quad.dest, 2)
+            elif op == OP_COPY:
+                kind = kind_of(values[quad.dest].ctype)
+                into = self.target(quad.dest, kind)
+                self.store(quad.dest, self.operand(quad.src1, kind, into), kind)
+            elif op in COMPARE:
+                types = (values[quad.src1].ctype, values[quad.src2].ctype)
+                kind = DOUBLE if 'double' in types else FLOAT if 'float' in types else INT
+                left = self.operand(quad.src1, kind, self.left)
+                right = self.operand(quad.src2, kind, self.right)
+                following = quads[i + 1] if i + 1 < len(quads) else None
+                if following is not None and following.op == OP_IFFALSE and following.src1 == quad.dest \
+                        and values[quad.dest].kind == TEMP and self.uses[quad.dest] == 1:
+                    self.emit(COMPARE_BRANCH[op], left, right, 0)
+                    self.jump_operand(following.dest, 3)
+                    skip = True
+                    continue
+                slot = self.target(quad.dest, INT)
+                self.emit(COMPARE[op], slot, left, right)
+                self.store(quad.dest, slot, INT)
+            elif op in (OP_ADD, OP_SUB, OP_MUL, OP_DIV):
+                kind = kind_of(values[quad.dest].ctype)
+                left = self.operand(quad.src1, kind, self.left)
+                right = self.operand(quad.src2, kind, self.right)
+                slot = self.target(quad.dest, kind)
+                self.emit(ARITHMETIC[kind][op], slot, left, right)
+                self.store(quad.dest, slot, kind)
+            elif op == OP_NEG:
+                kind = kind_of(values[quad.dest].ctype)
+                source = self.operand(quad.src1, kind, self.left)
+                slot = self.target(quad.dest, kind)
+                self.emit(B_INEG if kind == INT else B_FNEG, slot, source)
+                self.store(quad.dest, slot, kind)
+            elif op == OP_NOT:
+                source = self.own(quad.src1, self.left)
+                slot = self.target(quad.dest, INT)
+                self.emit(B_NOT, slot, source)
+                self.store(quad.dest, slot, INT)
+            elif op == OP_PARAM:
+                self.emit(B_PARAM, self.own(quad.src1, self.left))
+            elif op == OP_CALL:
+                name = values[quad.src1].name
+                if name not in functions:
+                    raise VMError(f"call to undefined function '{name}' in {self.function.name}")
+                if quad.dest < 0:
+                    self.emit(B_CALL, -1, functions[name], quad.src2)
+                else:
+                    kind = kind_of(values[quad.dest].ctype)
+                    slot = self.target(quad.dest, kind)
+                    self.emit(B_CALL, slot, functions[name], quad.src2)
+                    self.store(quad.dest, slot, kind)
+            elif op == OP_RETURN:
+                self.emit(B_RETURN, -1 if quad.src1 < 0 else self.own(quad.src1, self.left))
+        # Falling off the end returns nothing
+        self.emit(B_RETURN, -1)
+
+        code = self.code
+        for index, label in self.fixups:
+            code[index] = self.labels[label]
+        return BytecodeFunction(self.function.name, code, self.frame, list(self.function.params))
+
+
+# --- Programs ---
+
+class Program:
+    """The bytecode for every function of a compiled unit, and its globals.
+
+    run() calls a function by name and returns its result. Globals keep
+    their values between runs; reset() restores the initial ones.
+    """
+
+    def __init__(self, functions, global_names, global_values):
+        self.functions = functions
+        self.index = {function.name: i for i, function in enumerate(functions)}
+        self.global_names = global_names
+        self.initial_globals = global_values
+        self.globals = list(global_values)
+        self.steps = 0              # instructions executed by the last run
+
+    @classmethod
+    def from_unit(cls, unit):
+        """Encodes the functions and globals of a compiled CompilationUnit."""
+        names = []
+        values = []
+        for item in unit.items:
+            for symbol in item['globals']:
+                names.append(symbol.name)
+                values.append(initial_value(symbol.initial_value, symbol.type))
+        global_index = {name: i for i, name in enumerate(names)}
+        functions = [item['function'] for item in unit.items if item['function'] is not None]
+        function_index = {function.name: i for i, function in enumerate(functions)}
+        encoded = [FunctionEncoder(function, global_index).encode(function_index) for function in functions]
+        return cls(encoded, names, values)
+
+    def global_values(self):
+        """The current value of every global, by name."""
+        return dict(zip(self.global_names, self.globals))
+
+    def reset(self):
+        self.globals = list(self.initial_globals)
+
+    def run(self, entry='main', args=(), max_steps=None):
+        """Calls function entry with args; returns what it returns (0 for nothing).
+
+        Raises VMError for an unknown entry, a division by zero, or when
+        more than max_steps instructions have run.
+        """
+        if entry not in self.index:
+            raise VMError(f"no function named '{entry}'")
+        return execute(self, self.index[entry], args, max_steps)
+
+
+def execute(program, entry, args, max_steps=None):
+    """The dispatch loop: runs function number entry of program to its return.
+
+    Calls push the caller's code, frame, resume point and result slot on
+    an explicit stack rather than recursing in Python, so a deep recursion
+    in the program does not hit Python's limit. The step limit is checked
+    only at jumps and calls, which every loop passes through.
+    """
+    functions = program.functions
+    glob = program.globals
+    function = functions[entry]
+    code = function.code
+    slots = function.frame[:]
+    for slot, arg in zip(function.params, args):
+        slots[slot] = arg
+    frames = []
+    arguments = []
+    rounding = array('f', [0.0])    # storing a float here rounds it to single precision
+    limit = max_steps if max_steps is not None else sys.maxsize
+    steps = 0
+    pc = 0
+    while True:
+        op = code[pc]
+        steps += 1
+        # The most frequent instructions are tested first
+        if op == B_MOVE:
+            slots[code[pc + 1]] = slots[code[pc + 2]]
+        elif op == B_IADD:
+            result = slots[code[pc + 2]] + slots[code[pc + 3]]
+            slots[code[pc + 1]] = result if INT_MIN <= result <= INT_MAX else wrap_int(result)
+        elif op == B_ISUB:
+            result = slots[code[pc + 2]] - slots[code[pc + 3]]
+            slots[code[pc + 1]] = result if INT_MIN <= result <= INT_MAX else wrap_int(result)
+        elif op == B_GLOAD:
+            slots[code[pc + 1]] = glob[code[pc + 2]]
+        elif op == B_JNLT:
+            if not slots[code[pc + 1]] < slots[code[pc + 2]]:
+                pc = code[pc + 3]
+                if steps > limit:
+                    break
+                continue
+        elif op == B_JUMP:
+            pc = code[pc + 1]
+            if steps > limit:
+                break
+            continue
+        elif op == B_GSTORE:
+            glob[code[pc + 1]] = slots[code[pc + 2]]
+        elif op == B_IMUL:
+            result = slots[code[pc + 2]] * slots[code[pc + 3]]
+            slots[code[pc + 1]] = result if INT_MIN <= result <= INT_MAX else wrap_int(result)
+        elif op == B_IFFALSE:
+            if slots[code[pc + 1]] == 0:
+                pc = code[pc + 2]
+                if steps > limit:
+                    break
+                continue
+        elif op == B_PARAM:
+            arguments.append(slots[code[pc + 1]])
+        elif op == B_CALL:
+            count = code[pc + 3]
+            frames.append((code, slots, pc + 4, code[pc + 1]))
+            function = functions[code[pc + 2]]
+            code = function.code
+            slots = function.frame[:]
+            if count:
+                for slot, arg in zip(function.params, arguments[-count:]):
+                    slots[slot] = arg
+                del arguments[-count:]
+            pc = 0
+            if steps > limit:
+                break
+            continue
+        elif op == B_RETURN:
+            source = code[pc + 1]
+            result = slots[source] if source >= 0 else 0
+            if not frames:
+                program.steps = steps
+                return result
+            code, slots, pc, dest = frames.pop()
+            if dest >= 0:
+                slots[dest] = result
+            continue
+        elif B_JNEQ <= op <= B_JNGE:
+            left, right = slots[code[pc + 1]], slots[code[pc + 2]]
+            if not (left == right if op == B_JNEQ else left != right if op == B_JNNE else
+                    left > right if op == B_JNGT else left <= right if op == B_JNLE else left >= right):
+                pc = code[pc + 3]
+                if steps > limit:
+                    break
+                continue
+        elif B_FADD <= op <= B_FDIV:
+            left, right = slots[code[pc + 2]], slots[code[pc + 3]]
+            rounding[0] = (left + right if op == B_FADD else left - right if op == B_FSUB else
+                           left * right if op == B_FMUL else divide(left, right))
+            slots[code[pc + 1]] = rounding[0]
+        elif B_EQ <= op <= B_GE:
+            left, right = slots[code[pc + 2]], slots[code[pc + 3]]
+            slots[code[pc + 1]] = int(left == right if op == B_EQ else left != right if op == B_NE else
+                                      left < right if op == B_LT else left > right if op == B_GT else
+                                      left <= right if op == B_LE else left >= right)
+        elif op == B_IDIV:
+            left, right = slots[code[pc + 2]], slots[code[pc + 3]]
+            if right == 0:
+                raise VMError("integer division by zero")
+            # Exact for 32-bit operands: the quotient's rounding error is below 1/|right|
+            result = int(left / right)
+            slots[code[pc + 1]] = result if result <= INT_MAX else wrap_int(result)
+        elif op == B_CONVERT:
+            slots[code[pc + 1]] = convert(slots[code[pc + 2]], code[pc + 3])
+        elif op == B_INEG:
+            result = -slots[code[pc + 2]]
+            slots[code[pc + 1]] = result if result <= INT_MAX else wrap_int(result)
+        elif op == B_FNEG:
+            slots[code[pc + 1]] = -slots[code[pc + 2]]
+        elif op == B_NOT:
+            slots[code[pc + 1]] = int(slots[code[pc + 2]] == 0)
+        elif B_DADD <= op <= B_DDIV:
+            left, right = slots[code[pc + 2]], slots[code[pc + 3]]
+            slots[code[pc + 1]] = (left + right if op == B_DADD else left - right if op == B_DSUB else
+                                   left * right if op == B_DMUL else divide(left, right))
+        else:
+            raise VMError(f"bad opcode {op} at {pc}")
+        pc += 4
+    program.steps = steps
+    raise VMError(f"stopped after {max_steps} instructions")
+
+
+def divide(left, right):
+    """IEEE division: a zero divisor gives an infinity, or NaN for 0/0."""
+    if right:
+        return left / right
+    if left != left or left == 0:
+        return math.nan
+    return math.copysign(math.inf, left) * math.copysign(1.0, right)